@@ -1,29 +1,70 @@
 from __future__ import annotations
 
-from asyncio import sleep
-from collections.abc import Generator
+from abc import abstractmethod
+from asyncio import CancelledError, Future, Queue, Semaphore, TaskGroup
+from asyncio import gather, get_running_loop, shield, sleep, to_thread
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Generator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AbstractContextManager, contextmanager, nullcontext, suppress
 from dataclasses import dataclass
+from dataclasses import field
 from datetime import datetime, timedelta
+from functools import lru_cache
+from time import monotonic, perf_counter
+from types import ModuleType
 from typing import Self
 
+import argparse
+import asyncio
+import csv
+import importlib.util
+import json
 import os
+import random
+import re
 import sys
+import threading
+import uuid
 
 import mysql.connector
 import mysql.connector.errorcode as errorcode
+from mysql.connector import pooling
+from mysql.connector.conversion import MySQLConverter
 
 from textual import work
 from textual.app import App, ComposeResult
+from textual.binding import Binding
 from textual.containers import Container
 from textual.content import Content
 from textual.reactive import reactive
 from textual.screen import Screen, ModalScreen
-from textual.widgets import DataTable, Static, ProgressBar
+from textual.widgets import DataTable
 from textual.widgets import Header, Footer
 from textual.widgets import Button, Input
 
-import pylast
-import pyparsing as pp
+
+# NOTE: imports name the first time one of its attributes is used rather than
+# now, so sessions that never need it don't pay for it at startup. None if it
+# isn't installed.
+def lazy_import(name: str) -> ModuleType | None:
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return None
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+# NOTE: Last.FM is only reached once a client logs in, NumPy is only used
+# once their history is loaded and pyarrow only to export to Parquet.
+pylast = lazy_import("pylast")
+np = lazy_import("numpy")
+pa = lazy_import("pyarrow")
 
 
 # GLOBAL VARIABLES
@@ -35,21 +76,639 @@ DATABSE_NAME = os.getenv("DATABASE_NAME")
 CLIENT_DATABASE_USER = "client"
 CLIENT_DATABASE_PASSWORD = "client"
 
+WRITER_DATABASE_USER = "writer"
+WRITER_DATABASE_PASSWORD = "writer"
+
 ADMIN_DATABASE_USER = "admin"
 ADMIN_DATABASE_PASSWORD = "admin"
 
+# NOTE: the number of connections kept open for reading and for writing. a
+# checkout waits up to DATABASE_CHECKOUT_TIMEOUT seconds for a free one.
+DATABASE_READERS = int(os.getenv("DATABASE_READERS", "4"))
+DATABASE_WRITERS = int(os.getenv("DATABASE_WRITERS", "2"))
+DATABASE_CHECKOUT_TIMEOUT = float(os.getenv("DATABASE_CHECKOUT_TIMEOUT", "30"))
+
+# NOTE: when set, statements run through mysql_execute are prepared on the
+# server once per connection. each connection keeps the most recently used
+# PREPARED_STATEMENT_CACHE of them.
+PREPARED_STATEMENTS = os.getenv("PREPARED_STATEMENTS", "1") != "0"
+PREPARED_STATEMENT_CACHE = int(os.getenv("PREPARED_STATEMENT_CACHE", "64"))
+
+# NOTE: an import buffer is flushed once it holds this many scrobbles or once
+# this many seconds have passed since the last flush, whichever comes first.
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+IMPORT_FLUSH_INTERVAL = float(os.getenv("IMPORT_FLUSH_INTERVAL", "5"))
+
+# NOTE: histories are synced with Last.FM in the background every SYNC_INTERVAL
+# seconds while new scrobbles keep turning up, backing off to at most every
+# SYNC_MAX_INTERVAL seconds while they don't.
+SYNC_INTERVAL = float(os.getenv("SYNC_INTERVAL", "60"))
+SYNC_MAX_INTERVAL = float(os.getenv("SYNC_MAX_INTERVAL", "900"))
+
+# NOTE: app.py sync makes sure scrobbles has a partition for every year up to
+# SCROBBLE_PARTITIONS_AHEAD years from now when it starts.
+SCROBBLE_PARTITIONS_AHEAD = int(os.getenv("SCROBBLE_PARTITIONS_AHEAD", "1"))
+
+# NOTE: screens are filled a chunk of rows at a time. the first chunk is kept
+# small so there is something to look at while the rest is still loading.
+STREAM_FIRST_CHUNK = 100
+STREAM_CHUNK = 2000
+
+# NOTE: exports read and write this many rows at a time, which is also the
+# size of each row group of a Parquet export.
+EXPORT_CHUNK = int(os.getenv("EXPORT_CHUNK", "65536"))
+
+# NOTE: the pages the screens read are kept in memory up to about
+# RESULT_CACHE_BYTES, reckoned at RESULT_CACHE_ROW_BYTES a row, which is about
+# what a row read from MySQL takes. 0 turns the cache off.
+RESULT_CACHE_BYTES = int(os.getenv("RESULT_CACHE_BYTES", str(64 * 1024 * 1024)))
+RESULT_CACHE_ROW_BYTES = 1024
+
+# NOTE: paged tables keep at most PAGED_TABLE_PAGES pages of rows around the
+# cursor.
+PAGE_SIZE = 200
+PAGED_TABLE_PAGES = 3
+
+# NOTE: Last.FM asks API clients not to make more than 5 requests per second
+# averaged over 5 minutes.
+LASTFM_CONCURRENCY = int(os.getenv("LASTFM_CONCURRENCY", "4"))
+LASTFM_RATE = float(os.getenv("LASTFM_RATE", "5"))
+LASTFM_RETRIES = 5
+LASTFM_PAGE_SIZE = 200
+
+# NOTE: when set, filters are matched against the distinct names in Python and
+# pushed down to MySQL as sets of MBIDs instead of being evaluated with RLIKE.
+FILTER_PUSHDOWN = os.getenv("FILTER_PUSHDOWN", "1") != "0"
+# NOTE: filters matching more names than this are left to RLIKE rather than
+# sent as a list of MBIDs that could outgrow max_allowed_packet.
+FILTER_PUSHDOWN_LIMIT = int(os.getenv("FILTER_PUSHDOWN_LIMIT", "10000"))
+
+# NOTE: when set and NumPy is installed, a user's history is loaded into a
+# ScrobbleStore at login and the screens are served from memory.
+COLUMN_STORE = os.getenv("COLUMN_STORE", "1") != "0"
+
+# NOTE: recommendations of new tracks come from the SIMILAR_NEIGHBOURS most
+# similar tracks and artists of each track and artist. similar artists count
+# for SIMILAR_ARTIST_WEIGHT as much as similar tracks.
+RECOMMENDATIONS = os.getenv("RECOMMENDATIONS", "1") != "0"
+SIMILAR_NEIGHBOURS = int(os.getenv("SIMILAR_NEIGHBOURS", "20"))
+SIMILAR_ARTIST_WEIGHT = float(os.getenv("SIMILAR_ARTIST_WEIGHT", "0.5"))
+
+# NOTE: the number of track durations fetched from Last.FM kept in memory.
+DURATION_CACHE_SIZE = int(os.getenv("DURATION_CACHE_SIZE", "4096"))
+
+# NOTE: the half-life of CRF scores in seconds. replaced with the one in
+# score_settings by mysql_score_half_life once connected.
+SCORE_HALF_LIFE = 60 * 60 * 24 * 30
+
+# NOTE: when set, statements, Last.FM requests, imports and screen loads are
+# timed and counted. the metrics are written in the Prometheus text format to
+# METRICS_FILE every METRICS_INTERVAL seconds and served over HTTP on
+# METRICS_PORT, when either is set, which also turns metrics on.
+METRICS_FILE = os.getenv("METRICS_FILE")
+METRICS_PORT = os.getenv("METRICS_PORT")
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", "10"))
+METRICS_ENABLED = (
+    os.getenv("METRICS", "0") != "0"
+    or METRICS_FILE is not None
+    or METRICS_PORT is not None
+)
+
+
+# METRICS
+# ------------------------------------------------------------------------------
+# NOTE: counters and timers keyed by name and then by their sorted labels. a
+# timer holds the number of observations and the seconds they add up to.
+@dataclass
+class Metrics:
+    counters: dict[str, dict[tuple, float]] = field(default_factory=dict)
+    timers: dict[str, dict[tuple, list[float]]] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def count(self: Self, name: str, value: float, labels: dict[str, str]) -> None:
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    # NOTE: for counters kept elsewhere, copied in before exporting.
+    def set(self: Self, name: str, value: float, labels: dict[str, str]) -> None:
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.counters.setdefault(name, {})[key] = value
+
+    def observe(self: Self, name: str, seconds: float, labels: dict[str, str]) -> None:
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            timer = self.timers.setdefault(name, {}).setdefault(key, [0, 0.0])
+            timer[0] += 1
+            timer[1] += seconds
+
+    @contextmanager
+    def timer(self: Self, name: str, labels: dict[str, str]) -> Generator[None]:
+        start = perf_counter()
+        try:
+            yield None
+        finally:
+            self.observe(name, perf_counter() - start, labels)
+
+    def prometheus(self: Self) -> str:
+        def series(name: str, key: tuple, value: float) -> str:
+            if len(key) == 0:
+                return f"{name} {value}"
+            labels = ",".join(f'{k}="{prometheus_escape(v)}"' for k, v in key)
+            return f"{name}{{{labels}}} {value}"
+
+        lines = []
+        with self.lock:
+            for name, values in sorted(self.counters.items()):
+                lines.append(f"# TYPE scrobbles_{name}_total counter")
+                for key, value in sorted(values.items()):
+                    lines.append(series(f"scrobbles_{name}_total", key, value))
+            for name, values in sorted(self.timers.items()):
+                lines.append(f"# TYPE scrobbles_{name}_seconds summary")
+                for key, (count, total) in sorted(values.items()):
+                    lines.append(series(f"scrobbles_{name}_seconds_count", key, count))
+                    lines.append(series(f"scrobbles_{name}_seconds_sum", key, total))
+        return "\n".join(lines) + "\n"
+
+    # NOTE: (name, labels, count, seconds) for every series, with seconds None
+    # for counters.
+    def snapshot(self: Self) -> list[tuple[str, str, float, float | None]]:
+        def labels(key: tuple) -> str:
+            return ", ".join(f"{k}={v}" for k, v in key)
+
+        with self.lock:
+            rows = [
+                (name, labels(key), value, None)
+                for name, values in sorted(self.counters.items())
+                for key, value in sorted(values.items())
+            ]
+            rows += [
+                (name, labels(key), count, total)
+                for name, values in sorted(self.timers.items())
+                for key, (count, total) in sorted(values.items())
+            ]
+        return rows
+
+
+def prometheus_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+METRICS = Metrics() if METRICS_ENABLED else None
+METRICS_STOP = threading.Event()
+NULL_TIMER = nullcontext()
+
+
+# NOTE: the helpers below are all that is left on a path when metrics are off,
+# so they check for that before doing anything else.
+def metrics_count(name: str, value: float = 1, **labels: str) -> None:
+    if METRICS is not None:
+        METRICS.count(name, value, labels)
+
+
+def metrics_timer(name: str, **labels: str) -> AbstractContextManager[None]:
+    if METRICS is None:
+        return NULL_TIMER
+    return METRICS.timer(name, labels)
+
+
+STATEMENT_TARGET = re.compile(r"\b(?:FROM|INTO|UPDATE|CALL|TABLE)\s+`?(\w+)", re.I)
+STATEMENT_FUNCTION = re.compile(r"(\w+)\s*\(")
+
+
+# NOTE: a label for the statements run by operation, e.g. "SELECT scrobbles" or
+# "CALL sp_user_add_scrobble", from its verb and the first thing it names.
+@lru_cache(maxsize=1024)
+def statement_label(operation: str) -> str:
+    verb = operation.split(maxsplit=1)[0].upper()
+    target = STATEMENT_TARGET.search(operation) or STATEMENT_FUNCTION.search(operation)
+    return f"{verb} {target[1]}" if target else verb
+
+
+# NOTE: stands in for a connection while metrics are on so every statement run
+# through its cursors is timed, along with the rows it read or changed.
+@dataclass
+class TimedConnection:
+    connection: pooling.PooledMySQLConnection
+
+    def cursor(self: Self, *args: any, **kwargs: any) -> TimedCursor:
+        return TimedCursor(self.connection.cursor(*args, **kwargs))
+
+    def __getattr__(self: Self, name: str) -> any:
+        return getattr(self.connection, name)
+
+
+@dataclass
+class TimedCursor:
+    cursor: any
+    label: str = ""
+
+    # NOTE: prepared cursors outlive checkouts, so metrics may have been turned
+    # off since this one was made.
+    def run(self: Self, name: str, fn: Callable, *args: any) -> any:
+        if METRICS is None:
+            return fn(*args)
+        with METRICS.timer(name, {"statement": self.label}):
+            return fn(*args)
+
+    def rows(self: Self, count: int) -> None:
+        if METRICS is not None:
+            METRICS.count("db_rows", count, {"statement": self.label})
+
+    def execute(self: Self, operation: str, params: any = ()) -> None:
+        self.label = statement_label(operation)
+        self.run("db", self.cursor.execute, operation, params)
+        if self.cursor.description is None:
+            self.rows(max(self.cursor.rowcount, 0))
+
+    def executemany(self: Self, operation: str, seq_params: list) -> None:
+        self.label = statement_label(operation)
+        self.run("db", self.cursor.executemany, operation, seq_params)
+        self.rows(max(self.cursor.rowcount, 0))
+
+    def fetchone(self: Self) -> any:
+        row = self.run("db_fetch", self.cursor.fetchone)
+        self.rows(0 if row is None else 1)
+        return row
+
+    def fetchmany(self: Self, size: int = 1) -> list:
+        rows = self.run("db_fetch", self.cursor.fetchmany, size)
+        self.rows(len(rows))
+        return rows
+
+    def fetchall(self: Self) -> list:
+        rows = self.run("db_fetch", self.cursor.fetchall)
+        self.rows(len(rows))
+        return rows
+
+    # NOTE: the time spent fetching is added up and recorded once at the end
+    # rather than for every row.
+    def __iter__(self: Self) -> Generator[any]:
+        count, seconds = 0, 0.0
+        rows = iter(self.cursor)
+        try:
+            while True:
+                start = perf_counter()
+                row = next(rows, None)
+                seconds += perf_counter() - start
+                if row is None:
+                    break
+                count += 1
+                yield row
+        finally:
+            if METRICS is not None:
+                METRICS.observe("db_fetch", seconds, {"statement": self.label})
+            self.rows(count)
+
+    def __enter__(self: Self) -> Self:
+        return self
+
+    def __exit__(self: Self, *exc: any) -> None:
+        self.cursor.close()
+
+    def __getattr__(self: Self, name: str) -> any:
+        return getattr(self.cursor, name)
+
+
+# NOTE: writes the metrics to METRICS_FILE every METRICS_INTERVAL seconds and
+# serves them on METRICS_PORT, when set. the file is replaced in one step so a
+# scraper never reads half of it.
+def metrics_export() -> None:
+    if METRICS_FILE is not None:
+        temporary = f"{METRICS_FILE}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(metrics_render())
+        os.replace(temporary, METRICS_FILE)
+
+
+def metrics_render() -> str:
+    for source, count in (
+        ("recent", TRACK_DURATIONS.hits),
+        ("stored", TRACK_DURATIONS.stored_hits),
+        ("coalesced", TRACK_DURATIONS.coalesced),
+        ("lastfm", TRACK_DURATIONS.misses),
+    ):
+        METRICS.set("import_duration_lookups", count, {"source": source})
+    METRICS.set("db_prepared", STATEMENTS.prepared, {})
+    METRICS.set("result_cache_bytes", RESULT_CACHE.size, {})
+    return METRICS.prometheus()
+
+
+def metrics_start() -> None:
+    if METRICS_FILE is not None:
+
+        def write() -> None:
+            while not METRICS_STOP.wait(METRICS_INTERVAL):
+                metrics_export()
+
+        threading.Thread(target=write, name="metrics-file", daemon=True).start()
+
+    if METRICS_PORT is not None:
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                body = metrics_render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: any) -> None:
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", int(METRICS_PORT)), Handler)
+        threading.Thread(
+            target=server.serve_forever, name="metrics-http", daemon=True
+        ).start()
+
+
+# DATABASE CONNECTIONS
+# ------------------------------------------------------------------------------
+# NOTE: connections are checked out for a single task and handed back when it
+# is done, so a long import on a write connection never holds up the screens
+# reading on another. a checkout waits for a free connection instead of
+# failing, and pings it first so one dropped by the server is reopened.
+@dataclass
+class ConnectionPool:
+    name: str
+    user: str
+    password: str
+    size: int
+    pool: pooling.MySQLConnectionPool | None = None
+    slots: threading.BoundedSemaphore | None = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def open(self: Self) -> None:
+        with self.lock:
+            if self.pool is not None:
+                return None
+            self.pool = pooling.MySQLConnectionPool(
+                pool_name=self.name,
+                pool_size=self.size,
+                # NOTE: sessions are kept between checkouts so prepared
+                # statements survive. checkouts end their own transactions.
+                pool_reset_session=False,
+                host="localhost",
+                port="3306",
+                user=self.user,
+                password=self.password,
+                database=DATABSE_NAME,
+                # NOTE: streamed results may be abandoned part way through when
+                # a screen reloads, so silently drop whatever is left unread.
+                consume_results=True,
+            )
+            self.slots = threading.BoundedSemaphore(self.size)
+
+    @contextmanager
+    def checkout(self: Self) -> Generator[pooling.PooledMySQLConnection]:
+        self.open()
+        start = perf_counter()
+        if not self.slots.acquire(timeout=DATABASE_CHECKOUT_TIMEOUT):
+            raise pooling.PoolError(f"No {self.name} connection available")
+        try:
+            connection = self.pool.get_connection()
+            query = getattr(RUNNING_QUERY, "query", None)
+            connection_id = None
+            try:
+                connection.ping(reconnect=True, attempts=3, delay=1)
+                if METRICS is not None:
+                    METRICS.observe(
+                        "db_checkout", perf_counter() - start, {"pool": self.name}
+                    )
+                    connection = TimedConnection(connection)
+                if query is not None:
+                    connection_id = connection.connection_id
+                    query.attach(self, connection_id)
+                yield connection
+            finally:
+                # NOTE: a killed statement may have left its result half read,
+                # so the connection is opened again rather than reused as is.
+                if connection_id is not None and query.detach(connection_id):
+                    STATEMENTS.forget(connection_id)
+                    try:
+                        connection.reconnect()
+                    except mysql.connector.Error:
+                        pass
+                # NOTE: ends the transaction so a reader does not keep seeing
+                # the snapshot taken by its first query on the next checkout.
+                if connection.is_connected():
+                    connection.rollback()
+                connection.close()
+        finally:
+            self.slots.release()
+
+    # NOTE: stops the statement running on a connection checked out from this
+    # pool. it's sent over a connection of its own since every one in the pool
+    # may be busy.
+    def kill(self: Self, connection_id: int) -> None:
+        try:
+            connection = mysql.connector.connect(
+                host="localhost",
+                port="3306",
+                user=self.user,
+                password=self.password,
+                database=DATABSE_NAME,
+            )
+        except mysql.connector.Error:
+            return None
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"KILL QUERY {int(connection_id)}")
+        except mysql.connector.Error:
+            # NOTE: the connection may have finished and been closed since.
+            pass
+        finally:
+            connection.close()
+
+
+POOLS = {
+    "read": ConnectionPool(
+        "read", CLIENT_DATABASE_USER, CLIENT_DATABASE_PASSWORD, DATABASE_READERS
+    ),
+    "write": ConnectionPool(
+        "write", WRITER_DATABASE_USER, WRITER_DATABASE_PASSWORD, DATABASE_WRITERS
+    ),
+    "admin": ConnectionPool("admin", ADMIN_DATABASE_USER, ADMIN_DATABASE_PASSWORD, 1),
+}
+
+
+def mysql_read() -> AbstractContextManager[pooling.PooledMySQLConnection]:
+    return POOLS["read"].checkout()
+
+
+def mysql_write() -> AbstractContextManager[pooling.PooledMySQLConnection]:
+    return POOLS["write"].checkout()
+
+
+def mysql_admin() -> AbstractContextManager[pooling.PooledMySQLConnection]:
+    return POOLS["admin"].checkout()
+
+
+# QUERIES OFF THE EVENT LOOP
+# ------------------------------------------------------------------------------
+# NOTE: screens run their queries with run_query, on threads of their own so
+# drawing and input carry on while a query runs. the connections a query checks
+# out are tracked so that when the task awaiting it is cancelled, e.g. because
+# the filters changed, whatever it's running is stopped on the server with
+# KILL QUERY instead of running to completion.
+@dataclass
+class RunningQuery:
+    connections: dict[int, ConnectionPool] = field(default_factory=dict)
+    killed: set[int] = field(default_factory=set)
+    cancelled: bool = False
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def attach(self: Self, pool: ConnectionPool, connection_id: int) -> None:
+        with self.lock:
+            if self.cancelled:
+                raise CancelledError
+            self.connections[connection_id] = pool
+
+    # NOTE: returns whether a statement on the connection was killed. holding
+    # the lock while killing means a connection is never handed back to its
+    # pool, to be used for something else, before a kill meant for it lands.
+    def detach(self: Self, connection_id: int) -> bool:
+        with self.lock:
+            self.connections.pop(connection_id, None)
+            return connection_id in self.killed
+
+    def cancel(self: Self) -> None:
+        with self.lock:
+            self.cancelled = True
+            for connection_id, pool in self.connections.items():
+                pool.kill(connection_id)
+                self.killed.add(connection_id)
+                metrics_count("db_killed", pool=pool.name)
+
+
+RUNNING_QUERY = threading.local()
+QUERY_EXECUTOR = ThreadPoolExecutor(DATABASE_READERS, "query")
+KILL_EXECUTOR = ThreadPoolExecutor(1, "kill")
+
+
+async def run_query(fn: Callable, *args: any) -> any:
+    query = RunningQuery()
+
+    def run() -> any:
+        RUNNING_QUERY.query = query
+        try:
+            return fn(*args)
+        finally:
+            RUNNING_QUERY.query = None
+
+    try:
+        return await get_running_loop().run_in_executor(QUERY_EXECUTOR, run)
+    except CancelledError:
+        KILL_EXECUTOR.submit(query.cancel)
+        raise
+
+
+# PREPARED STATEMENTS
+# ------------------------------------------------------------------------------
+# NOTE: a prepared cursor only skips preparing again when it is handed the very
+# same string it ran last, so the registry keeps the string it was first given
+# and the caller runs that instead. statements are kept per server connection
+# id, so a connection that was reopened by a health check starts over.
+@dataclass
+class StatementRegistry:
+    size: int = PREPARED_STATEMENT_CACHE
+    cursors: dict[int, OrderedDict] = field(default_factory=dict)
+    prepared: int = 0
+
+    def forget(self: Self, connection_id: int) -> None:
+        self.cursors.pop(connection_id, None)
+
+    def cursor(
+        self: Self,
+        connection: pooling.PooledMySQLConnection,
+        operation: str,
+        dictionary: bool,
+    ) -> tuple[str, any]:
+        cursors = self.cursors.setdefault(connection.connection_id, OrderedDict())
+        key = (operation, dictionary)
+        if key in cursors:
+            cursors.move_to_end(key)
+            return cursors[key]
+
+        cursor = connection.cursor(prepared=True, dictionary=dictionary)
+        cursors[key] = (operation, cursor)
+        self.prepared += 1
+        if len(cursors) > self.size:
+            _, (_, evicted) = cursors.popitem(last=False)
+            evicted.close()
+        return operation, cursor
+
+
+STATEMENTS = StatementRegistry()
+
+
+# NOTE: runs operation on connection and yields the cursor holding its result,
+# which must not be used once the block is left.
+@contextmanager
+def mysql_execute(
+    connection: pooling.PooledMySQLConnection,
+    operation: str,
+    params: tuple = (),
+    dictionary: bool = False,
+) -> Generator[any]:
+    if not PREPARED_STATEMENTS:
+        with connection.cursor(dictionary=dictionary) as cursor:
+            cursor.execute(operation, params)
+            yield cursor
+        return None
+
+    operation, cursor = STATEMENTS.cursor(connection, operation, dictionary)
+    cursor.execute(operation, params)
+    yield cursor
+
 
 # MYSQL UTIL FUNCTIONS
 # ------------------------------------------------------------------------------
+# NOTE: MBIDs are stored as the 16 bytes of their UUID, see sql/setup.sql, and
+# are kept that way everywhere they only go between queries. they are turned
+# into text where they come from or leave for the outside: Last.FM, the
+# durations looked up there and exports.
+def mbid_bytes(mbid: str) -> bytes:
+    return bytes.fromhex(mbid.replace("-", ""))
+
+
+def mbid_text(mbid: bytes) -> str:
+    digits = mbid.hex()
+    return "-".join(
+        (digits[:8], digits[8:12], digits[12:16], digits[16:20], digits[20:])
+    )
+
+
+def sql_placeholders(values: list) -> str:
+    return ", ".join(["%s"] * len(values))
+
+
+def chunks(values: list, size: int) -> Generator[list]:
+    for i in range(0, len(values), size):
+        yield values[i : i + size]
+
+
 def mysql_user_exists(username: str) -> bool:
-    with mysql_connection.cursor() as cursor:
-        cursor.execute("SELECT sf_user_exists(%s)", (username,))
+    with (
+        mysql_read() as connection,
+        mysql_execute(connection, "SELECT sf_user_exists(%s)", (username,)) as cursor,
+    ):
         return cursor.fetchone()[0] == 1
 
 
 def mysql_user_authenticate(username: str, password: str) -> bool | None:
-    with mysql_connection.cursor() as cursor:
-        cursor.execute("SELECT sf_user_authenticate(%s, %s)", (username, password))
+    with (
+        mysql_read() as connection,
+        mysql_execute(
+            connection,
+            "SELECT sf_user_authenticate(%s, %s)",
+            (username, password),
+        ) as cursor,
+    ):
         result = cursor.fetchone()[0]
         if result is None:
             return None
@@ -57,80 +716,398 @@ def mysql_user_authenticate(username: str, password: str) -> bool | None:
             return result == 1
 
 
-def mysql_user_last_update(username: str) -> int:
-    with mysql_connection.cursor() as cursor:
+def mysql_mbid_names() -> list[tuple[bytes, str, str]]:
+    with mysql_read() as connection, connection.cursor() as cursor:
+        cursor.execute("SELECT mbid, mbid_name, mbid_type FROM mbids")
+        return cursor.fetchall()
+
+
+def mysql_track_lengths() -> dict[str, timedelta]:
+    with mysql_read() as connection, connection.cursor() as cursor:
+        cursor.execute("SELECT mbid, length FROM tracks")
+        return {mbid_text(mbid): length for mbid, length in cursor}
+
+
+def mysql_score_half_life() -> int:
+    with mysql_read() as connection, connection.cursor() as cursor:
+        cursor.execute("SELECT sf_score_half_life()")
+        return cursor.fetchone()[0]
+
+
+# NOTE: every user with whether they are an admin and how many scrobbles they
+# have, for the admin screen.
+def mysql_user_stats() -> list[tuple[str, str, int]]:
+    with mysql_admin() as connection, connection.cursor() as cursor:
         cursor.execute(
-            "SELECT user_last_update FROM users WHERE user_name = %s", (username,)
+            """
+            SELECT user_name,
+                   IF(user_admin, 'Admin', 'Client') AS user_status,
+                   COUNT(mbid) as user_scrobbles
+            FROM users LEFT JOIN scrobbles USING (user_name)
+            GROUP BY user_name
+            """
         )
-        return cursor.fetchone()[0]
+        return cursor.fetchall()
 
 
-def mysql_user_scrobble_count(username: str) -> int:
-    with mysql_connection.cursor() as cursor:
+# NOTE: the clients with a Last.FM session, whose histories are synced by
+# app.py sync.
+def mysql_sync_users() -> list[str]:
+    with mysql_admin() as connection, connection.cursor() as cursor:
         cursor.execute(
-            "SELECT COUNT(*) FROM scrobbles WHERE user_name = %s", (username,)
+            """
+            SELECT user_name
+            FROM users
+            WHERE user_session IS NOT NULL
+              AND NOT user_admin
+            ORDER BY user_name
+            """
         )
-        return cursor.fetchone()[0]
+        return [name for (name,) in cursor]
 
 
 # MYSQL UTIL PROCEDURES
 # ------------------------------------------------------------------------------
 def mysql_user_create(username: str, password: str, session_key: str) -> None:
-    with mysql_connection.cursor() as cursor:
+    with mysql_write() as connection, connection.cursor() as cursor:
         cursor.execute(
             "CALL sp_user_create_client(%s, %s, %s)", (username, password, session_key)
         )
-        mysql_connection.commit()
-    mysql_connection.commit()
+        connection.commit()
 
 
 def mysql_user_update_session_key(username: str, session_key: str) -> None:
-    with mysql_connection.cursor() as cursor:
+    with mysql_write() as connection, connection.cursor() as cursor:
         cursor.execute(
             "CALL sp_user_update_session_key(%s, %s)", (username, session_key)
         )
-    mysql_connection.commit()
+        connection.commit()
 
 
 def mysql_artist_add(mbid: str, name: str) -> None:
-    with mysql_connection.cursor() as cursor:
-        cursor.execute("CALL sp_artist_add(%s, %s)", (mbid, name))
-    mysql_connection.commit()
+    with (
+        mysql_write() as connection,
+        mysql_execute(
+            connection, "CALL sp_artist_add(%s, %s)", (mbid_bytes(mbid), name)
+        ),
+    ):
+        connection.commit()
 
 
 def mysql_album_add(mbid: str, name: str, artist: str) -> None:
-    with mysql_connection.cursor() as cursor:
-        cursor.execute("CALL sp_album_add(%s, %s, %s)", (mbid, name, artist))
-    mysql_connection.commit()
+    with (
+        mysql_write() as connection,
+        mysql_execute(
+            connection,
+            "CALL sp_album_add(%s, %s, %s)",
+            (mbid_bytes(mbid), name, mbid_bytes(artist)),
+        ),
+    ):
+        connection.commit()
 
 
 def mysql_track_add(
     mbid: str, name: str, artist: str, album: str | None, length: timedelta
 ) -> None:
-    with mysql_connection.cursor() as cursor:
-        cursor.execute(
+    with (
+        mysql_write() as connection,
+        mysql_execute(
+            connection,
             "CALL sp_track_add(%s, %s, %s, %s, %s)",
-            (mbid, name, artist, album, length),
-        )
-    mysql_connection.commit()
+            (
+                mbid_bytes(mbid),
+                name,
+                mbid_bytes(artist),
+                album and mbid_bytes(album),
+                length,
+            ),
+        ),
+    ):
+        connection.commit()
 
 
 def mysql_scrobble_add(username: str, time: int, track: str) -> None:
-    with mysql_connection.cursor() as cursor:
-        cursor.execute(
+    with (
+        mysql_write() as connection,
+        mysql_execute(
+            connection,
             "CALL sp_user_add_scrobble(%s, %s, %s)",
-            (username, time, track),
-        )
-    mysql_connection.commit()
+            (username, time, mbid_bytes(track)),
+        ),
+    ):
+        connection.commit()
+    RESULT_CACHE.invalidate(username)
 
 
 def mysql_score_update(username: str, time: int, mbid: str) -> None:
-    with mysql_connection.cursor() as cursor:
-        cursor.execute(
+    with (
+        mysql_write() as connection,
+        mysql_execute(
+            connection,
             "CALL sp_score_update(%s, %s, %s)",
-            (username, time, mbid),
+            (username, time, mbid_bytes(mbid)),
+        ),
+    ):
+        connection.commit()
+    RESULT_CACHE.invalidate(username)
+
+
+def mysql_scores_rebuild(username: str | None) -> None:
+    with mysql_write() as connection, connection.cursor() as cursor:
+        cursor.execute("CALL sp_scores_rebuild(%s)", (username,))
+        connection.commit()
+    RESULT_CACHE.invalidate(username)
+
+
+def mysql_scrobbles_partition(ahead: int) -> None:
+    with mysql_admin() as connection, connection.cursor() as cursor:
+        cursor.execute("CALL sp_scrobbles_partition(%s)", (ahead,))
+
+
+# MYSQL BULK IMPORT
+# ------------------------------------------------------------------------------
+def score_F(delta: float) -> float:
+    return 0.5 ** (delta / SCORE_HALF_LIFE)
+
+
+# NOTE: scrobbles already stored, say by an import that was interrupted before
+# it recorded its pages, are dropped along with their accesses so a replayed
+# batch changes neither the scrobbles nor the scores. they are read on the
+# connection the batch is written on after locking the user's row, so a sync
+# and an import writing the same scrobbles take turns and the second one sees
+# what the first committed.
+def mysql_import_seen(
+    connection: pooling.PooledMySQLConnection,
+    username: str,
+    entries: list[ImportEntry],
+) -> set[tuple[int, bytes]]:
+    if len(entries) == 0:
+        return set()
+
+    with mysql_execute(
+        connection,
+        "SELECT user_name FROM users WHERE user_name = %s FOR UPDATE",
+        (username,),
+    ) as cursor:
+        cursor.fetchall()
+    with mysql_execute(
+        connection,
+        """
+        SELECT scrobble_time, mbid FROM scrobbles
+        WHERE user_name = %s AND scrobble_time BETWEEN %s AND %s
+        FOR UPDATE
+        """,
+        (username, min(e.time for e in entries), max(e.time for e in entries)),
+    ) as cursor:
+        return set(cursor)
+
+
+# NOTE: the rows entries add to the mbids, artists, albums, tracks, scores and
+# scrobbles tables, leaving out the scrobbles in seen.
+def import_rows(
+    username: str, entries: list[ImportEntry], seen: set[tuple[int, bytes]]
+) -> tuple[list[tuple], ...]:
+    mbids = {}
+    artists = {}
+    albums = {}
+    tracks = {}
+    accesses = {}
+    scrobbles = []
+
+    for e in entries:
+        artist_mbid = mbid_bytes(e.artist_mbid)
+        album_mbid = e.album_mbid and mbid_bytes(e.album_mbid)
+        track_mbid = e.track_mbid and mbid_bytes(e.track_mbid)
+        if (e.time, track_mbid) in seen:
+            metrics_count("import_skipped", reason="duplicate")
+            continue
+
+        mbids.setdefault(artist_mbid, (artist_mbid, e.artist, "artist"))
+        artists[artist_mbid] = (artist_mbid,)
+
+        if album_mbid is not None:
+            mbids.setdefault(album_mbid, (album_mbid, e.album, "album"))
+            albums[album_mbid, artist_mbid] = (album_mbid, artist_mbid)
+
+        # NOTE: an entry that isn't stored as a scrobble can't be told apart
+        # from its replay later, so it adds no accesses at all. This also keeps
+        # the scores the same as sp_scores_rebuild makes from the scrobbles.
+        if track_mbid is None or not e.length:
+            metrics_count("import_skipped", reason="no_track")
+            continue
+
+        mbids.setdefault(track_mbid, (track_mbid, e.track, "track"))
+        tracks[track_mbid, artist_mbid] = (
+            track_mbid,
+            artist_mbid,
+            album_mbid,
+            e.length,
         )
-    mysql_connection.commit()
+        for mbid in (artist_mbid, album_mbid, track_mbid):
+            if mbid is not None:
+                accesses.setdefault(mbid, []).append(e.time)
+        scrobbles.append((e.time, track_mbid, username))
+        seen.add((e.time, track_mbid))
+
+    # NOTE: a CRF score is a sum of decayed accesses, so the accesses in a batch
+    # can be folded into a single score relative to the latest one and then
+    # merged with the stored score regardless of the order they arrived in.
+    scores = []
+    for mbid, times in accesses.items():
+        last = max(times)
+        scores.append((username, mbid, last, sum(score_F(last - t) for t in times)))
+
+    return (
+        list(mbids.values()),
+        list(artists.values()),
+        list(albums.values()),
+        list(tracks.values()),
+        scores,
+        scrobbles,
+    )
+
+
+# NOTE: writes entries and records pages of the import of username as written,
+# all in one transaction. user_last_update is left to mysql_import_finish since
+# pages before these may not be written yet. pages already recorded, say by a
+# sync and an import that both fetched them, are left as they are.
+def mysql_import_batch(
+    username: str, entries: list[ImportEntry], pages: list[int] | None = None
+) -> None:
+    pages = pages or []
+    if len(entries) == 0 and len(pages) == 0:
+        return None
+
+    with mysql_write() as connection:
+        try:
+            seen = mysql_import_seen(connection, username, entries)
+            mbids, artists, albums, tracks, scores, scrobbles = import_rows(
+                username, entries, seen
+            )
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    """
+                    INSERT INTO mbids VALUES (%s, %s, %s)
+                    ON DUPLICATE KEY UPDATE mbid = mbid
+                    """,
+                    mbids,
+                )
+                cursor.executemany(
+                    """
+                    INSERT INTO artists VALUES (%s)
+                    ON DUPLICATE KEY UPDATE mbid = mbid
+                    """,
+                    artists,
+                )
+                cursor.executemany(
+                    """
+                    INSERT INTO albums VALUES (%s, %s)
+                    ON DUPLICATE KEY UPDATE artist = VALUES(artist)
+                    """,
+                    albums,
+                )
+                cursor.executemany(
+                    """
+                    INSERT INTO tracks VALUES (%s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                      artist = VALUES(artist),
+                      album = VALUES(album),
+                      length = VALUES(length)
+                    """,
+                    tracks,
+                )
+                cursor.executemany(
+                    """
+                    INSERT INTO scores (user_name, mbid, last_access, last_crf)
+                    VALUES (%s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                      last_crf = VALUES(last_crf) * sf_score_F(
+                          GREATEST(last_access, VALUES(last_access))
+                          - VALUES(last_access))
+                        + last_crf * sf_score_F(
+                          GREATEST(last_access, VALUES(last_access)) - last_access),
+                      last_access = GREATEST(last_access, VALUES(last_access))
+                    """,
+                    scores,
+                )
+                cursor.executemany(
+                    """
+                    INSERT INTO scrobbles (scrobble_time, mbid, user_name)
+                    VALUES (%s, %s, %s)
+                    """,
+                    scrobbles,
+                )
+                cursor.executemany(
+                    "INSERT IGNORE INTO import_pages (user_name, page) VALUES (%s, %s)",
+                    [(username, page) for page in pages],
+                )
+            connection.commit()
+            metrics_count("import_commits")
+            metrics_count("import_inserted", len(scrobbles), table="scrobbles")
+            metrics_count("import_inserted", len(scores), table="scores")
+        except mysql.connector.Error:
+            connection.rollback()
+            raise
+
+
+# NOTE: resumes the import of username left unfinished, or starts one of the
+# scrobbles made since the last one finished up to until.
+def mysql_import_start(username: str, until: int) -> ImportJob:
+    with mysql_write() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT IGNORE INTO import_state (user_name, window_from, window_to)
+                SELECT user_name, IFNULL(user_last_update, 0), %s
+                FROM users
+                WHERE user_name = %s
+                """,
+                (until, username),
+            )
+            cursor.execute(
+                """
+                SELECT window_from, window_to, total_pages
+                FROM import_state
+                WHERE user_name = %s
+                """,
+                (username,),
+            )
+            window_from, window_to, total_pages = cursor.fetchone()
+            cursor.execute(
+                "SELECT page FROM import_pages WHERE user_name = %s", (username,)
+            )
+            pages = {page for (page,) in cursor}
+        connection.commit()
+    return ImportJob(username, window_from, window_to, total_pages, pages)
+
+
+def mysql_import_total_pages(job: ImportJob) -> None:
+    with (
+        mysql_write() as connection,
+        mysql_execute(
+            connection,
+            "UPDATE import_state SET total_pages = %s WHERE user_name = %s",
+            (job.total_pages, job.username),
+        ),
+    ):
+        connection.commit()
+
+
+def mysql_import_finish(job: ImportJob) -> None:
+    with mysql_write() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE users
+                  SET user_last_update = GREATEST(user_last_update, %s)
+                WHERE user_name = %s
+                """,
+                (job.window_to, job.username),
+            )
+            cursor.execute(
+                "DELETE FROM import_state WHERE user_name = %s", (job.username,)
+            )
+        connection.commit()
 
 
 # LASTFM UTIL FUNCTIONS
@@ -148,14 +1125,159 @@ def lastfm_init() -> pylast.LastFMNetwork:
         return None
 
 
+# NOTE: the network is set up the first time it is needed rather than at
+# startup, since creating it is what imports pylast.
 def lastfm_network() -> pylast.LastFMNetwork:
+    global LASTFM_NETWORK
+
+    if LASTFM_NETWORK is None:
+        LASTFM_NETWORK = lastfm_init()
     if LASTFM_NETWORK is None:
         raise pylast.PyLastError
     return LASTFM_NETWORK
 
 
+# NOTE: errors that are worth retrying. pylast reports HTTP 5xx responses as a
+# WSError with the HTTP status code as its id.
+def lastfm_transient(e: Exception) -> bool:
+    if isinstance(e, pylast.WSError):
+        return int(e.get_id()) in (
+            pylast.STATUS_OPERATION_FAILED,
+            pylast.STATUS_OFFLINE,
+            pylast.STATUS_TEMPORARILY_UNAVAILABLE,
+            pylast.STATUS_RATE_LIMIT_EXCEEDED,
+            500,
+            502,
+            503,
+            504,
+        )
+    return True
+
+
+def lastfm_recent_tracks_page(user: pylast.User, params: dict, page: int) -> tuple:
+    doc = user._request(
+        user.ws_prefix + ".getRecentTracks", True, params | {"page": str(page)}
+    )
+    main = pylast.cleanup_nodes(doc).documentElement.childNodes[0]
+    total_pages = int(main.getAttribute("totalPages") or 1)
+    nodes = [n for n in main.childNodes if n.nodeType == n.ELEMENT_NODE]
+    return nodes, total_pages
+
+
+def lastfm_track_info(artist: str, track: str):
+    return pylast._Request(
+        lastfm_network(),
+        "track.getInfo",
+        {"artist": artist, "track": track},
+    ).execute(True)
+
+
+async def lastfm_track_duration(artist: str, track: str) -> timedelta | None:
+    # NOTE: ideally we would just use MBIDs here, but since Last.FM's API is
+    # broken and using MBIDs doesn't work 99% of the time here we are.
+    # NOTE: Last.FM answers with "invalid parameters" for a track it doesn't
+    # know, which is as good as it having no duration. any other error, once the
+    # fetcher has given up retrying it, means the duration is still unknown, so
+    # it's raised to leave the scrobbles waiting on it unwritten.
+    try:
+        duration = await LASTFM_FETCHER.call(lastfm_track_info, artist, track)
+    except pylast.WSError as e:
+        if int(e.get_id()) == pylast.STATUS_INVALID_PARAMS:
+            return None
+        raise
+
+    duration = pylast.cleanup_nodes(duration)
+    duration = pylast._extract(duration, "duration")
+    duration = duration and (int(duration) // 1000)
+
+    if duration:
+        return timedelta(seconds=duration)
+    else:
+        return None
+
+
+# LASTFM FETCHING
+# ------------------------------------------------------------------------------
+@dataclass
+class TokenBucket:
+    rate: float
+    capacity: float
+    tokens: float = 0
+    updated: float = field(default_factory=monotonic)
+
+    async def acquire(self: Self) -> None:
+        while True:
+            now = monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return None
+
+            await sleep((1 - self.tokens) / self.rate)
+
+
+@dataclass
+class LastFMFetcher:
+    concurrency: int = LASTFM_CONCURRENCY
+    rate: float = LASTFM_RATE
+    retries: int = LASTFM_RETRIES
+    # NOTE: backoff before retry n is drawn uniformly from
+    # [0, min(backoff_cap, backoff_base * 2^n)].
+    backoff_base: float = 0.5
+    backoff_cap: float = 30
+
+    def __post_init__(self: Self) -> None:
+        burst = max(1, self.rate)
+        self.limiter = TokenBucket(self.rate, burst, burst)
+        self.slots = Semaphore(self.concurrency)
+        self.executor = ThreadPoolExecutor(self.concurrency, "lastfm")
+
+    async def call(self: Self, fn: Callable, *args: any) -> any:
+        async with self.slots:
+            for attempt in range(self.retries):
+                with metrics_timer("lastfm_throttle"):
+                    await self.limiter.acquire()
+                try:
+                    with metrics_timer("lastfm", method=fn.__name__):
+                        return await get_running_loop().run_in_executor(
+                            self.executor, fn, *args
+                        )
+                except Exception as e:
+                    metrics_count("lastfm_errors", method=fn.__name__)
+                    if attempt + 1 >= self.retries or not lastfm_transient(e):
+                        raise
+
+                backoff = min(self.backoff_cap, self.backoff_base * 2**attempt)
+                await sleep(random.uniform(0, backoff))
+
+
+LASTFM_FETCHER = LastFMFetcher()
+
+
 # TYPES
 # ------------------------------------------------------------------------------
+# NOTE: a filter flag followed by its argument, either a word or a quoted string
+# without its quotes. escapes in quoted strings are kept as they are, to be read
+# as part of the regex. the quantifiers are possessive so a quoted string ends
+# at the first quote that can end it.
+FILTER_SPACE = " \t\n\r"
+FILTER_FLAG = re.compile(
+    rf"""
+    [{FILTER_SPACE}]*\+(track|album|artist):
+    [{FILTER_SPACE}]*(?:
+        ([A-Za-z]+)
+      | "((?:[^"\n\r\\]|""|\\(?:[^x]|x[0-9a-fA-F]+))*+)"
+      | '((?:[^'\n\r\\]|''|\\(?:[^x]|x[0-9a-fA-F]+))*+)'
+    )
+    """,
+    re.VERBOSE,
+)
+
+
 @dataclass
 class Filter:
     name: str
@@ -163,30 +1285,226 @@ class Filter:
 
     # +x:arg1,arg2,arg3
     @classmethod
-    def parse(cls, input_str: str) -> list[Self]:
-        arg = pp.Word(pp.alphas) | pp.quoted_string.set_parse_action(pp.remove_quotes)
-        name = pp.Regex(
-            "\\+(track|album|artist):", as_group_list=True
-        ).set_parse_action(lambda x: x[0][0])
-
-        flag = pp.Group(name + arg).set_parse_action(
-            lambda xs: [cls(x[0].lower(), x[1]) for x in xs]
-        )
-
-        try:
-            return pp.ZeroOrMore(flag).parse_string(input_str, parse_all=True)
-        except pp.ParseException:
+    def parse(cls, input_str: str) -> list[Self] | None:
+        filters, pos = [], 0
+        while match := FILTER_FLAG.match(input_str, pos):
+            name, *args = match.groups()
+            filters.append(cls(name, next(a for a in args if a is not None)))
+            pos = match.end()
+        if input_str[pos:].strip(FILTER_SPACE):
             return None
+        return filters
 
     def to_sql(self) -> str:
-        escaped = mysql_connection._cmysql.escape_string(self.regex)
-        return f"{self.name}_name RLIKE '{escaped.decode()}'"
+        if FILTER_PUSHDOWN and (condition := NAME_INDEX.match(self.name, self.regex)):
+            return condition
+        return rlike(self.name, self.regex)
+
+    @staticmethod
+    def conditions(filters: list[Filter]) -> str:
+        return "\n".join(map(lambda x: "AND " + x.to_sql(), filters))
+
+    # NOTE: filters all have to match, so the same ones in any order or repeated
+    # select the same rows and get the same key.
+    @staticmethod
+    def key(filters: list[Filter]) -> tuple:
+        return tuple(sorted({(f.name, f.regex) for f in filters}))
+
+
+# NOTE: an index over the distinct names of every MBID. since there are only a
+# few thousand of them it is much cheaper to match a filter against each name
+# once than to have MySQL run RLIKE on every row of a user's history. literal
+# patterns are looked up through a trigram index instead of a full scan.
+REGEX_META = set(".^$*+?{}[]\\|()")
+# NOTE: ASCII punctuation that stands for itself in and out of brackets.
+REGEX_PUNCTUATION = set(" !\"#%',-/:;<=>@_`")
+REGEX_QUANTIFIER = re.compile(r"\{\d+(?:,\d*)?\}")
+# NOTE: the characters Python matches case insensitively with an ASCII letter.
+# PCRE does too for the last two and not at all for the first two, so names
+# are folded to agree with it before they are matched.
+REGEX_FOLD = str.maketrans(
+    {"\u0130": "\u012b", "\u0131": "\u012b", "\u017f": "s", "\u212a": "k"}
+)
+
+
+def rlike(kind: str, regex: str) -> str:
+    return f"{kind}_name RLIKE '{MySQLConverter.escape(regex)}'"
+
+
+def regex_fold(name: str) -> str:
+    return name.translate(REGEX_FOLD).lower()
+
+
+def regex_literal(c: str) -> bool:
+    return c.isascii() and (c.isalnum() or c in REGEX_PUNCTUATION)
+
+
+# NOTE: whether regex only uses syntax that Python's re and the PCRE behind
+# RLIKE read the same way: ASCII literals, escaped metacharacters, ., ^, $,
+# quantifiers, alternation, plain groups and bracket expressions of those.
+# anything else, say [[:alpha:]], [[:<:]], \b, backreferences or (?i), is
+# left to RLIKE.
+def regex_portable(regex: str) -> bool:
+    i = 0
+    while i < len(regex):
+        c = regex[i]
+        if c == "\\":
+            if regex[i + 1 : i + 2] not in REGEX_META:
+                return False
+            i += 2
+        elif c == "[":
+            i += 1
+            if regex[i : i + 1] == "^":
+                i += 1
+            start = i
+            while i < len(regex) and regex[i] != "]":
+                if regex[i] == "\\" and regex[i + 1 : i + 2] in REGEX_META:
+                    i += 2
+                elif regex_literal(regex[i]) or regex[i] in ".^$*+?{}()":
+                    i += 1
+                else:
+                    return False
+            if i == start or i == len(regex):
+                return False
+            i += 1
+        elif c == "(":
+            if regex[i + 1 : i + 2] == "?":
+                return False
+            i += 1
+        elif c == "{":
+            if (quantifier := REGEX_QUANTIFIER.match(regex, i)) is None:
+                return False
+            i = quantifier.end()
+        elif c in REGEX_META or regex_literal(c):
+            i += 1
+        else:
+            return False
+    return True
+
+
+# NOTE: the regex a portable filter is matched with against folded names, or
+# None if it doesn't compile. literal patterns are returned as a string to be
+# looked for with in instead.
+def regex_compile(regex: str) -> re.Pattern | str | None:
+    if REGEX_META.isdisjoint(regex):
+        return regex.lower()
+    try:
+        return re.compile(regex, re.IGNORECASE)
+    except re.error:
+        return None
+
+
+# NOTE: names with a line break may match ., ^ and $ differently in RLIKE.
+def regex_breaks(name: str) -> bool:
+    return "\n" in name or "\r" in name
+
+
+def mbids_in(kind: str, mbids: list[bytes]) -> str:
+    if len(mbids) == 0:
+        return "FALSE"
+    values = ", ".join(f"X'{mbid.hex()}'" for mbid in mbids)
+    return f"{kind} IN ({values})"
+
+
+def trigrams(text: str) -> set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+@dataclass
+class NameIndex:
+    # NOTE: (mbid, folded name) pairs for each MBID type, see regex_fold.
+    names: dict[str, list[tuple[bytes, str]]] = field(default_factory=dict)
+    # NOTE: positions in names of every name containing a trigram.
+    grams: dict[str, dict[str, set[int]]] = field(default_factory=dict)
+    # NOTE: positions in names of every name with a line break.
+    breaks: dict[str, set[int]] = field(default_factory=dict)
+    # NOTE: SQL conditions for filters that have already been matched.
+    matches: dict[tuple[str, str], str | None] = field(default_factory=dict)
+    stale: bool = True
+    # NOTE: held while loading and matching, since filters are turned into SQL
+    # on the query threads while a sync marks the index stale.
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def load(self: Self) -> None:
+        # NOTE: cleared first so names written while loading mark it stale again.
+        self.stale = False
+        self.names = {"artist": [], "album": [], "track": []}
+        self.grams = {"artist": {}, "album": {}, "track": {}}
+        self.breaks = {"artist": set(), "album": set(), "track": set()}
+        self.matches = {}
+
+        for mbid, name, kind in mysql_mbid_names():
+            names = self.names[kind]
+            if regex_breaks(name):
+                self.breaks[kind].add(len(names))
+            name = regex_fold(name)
+            for gram in trigrams(name):
+                self.grams[kind].setdefault(gram, set()).add(len(names))
+            names.append((mbid, name))
+
+    # NOTE: positions in names of every name that may contain literal.
+    def candidates(self: Self, kind: str, literal: str) -> list[int]:
+        grams = trigrams(literal)
+        if len(grams) == 0:
+            return list(range(len(self.names[kind])))
+
+        found = None
+        for gram in grams:
+            hits = self.grams[kind].get(gram, set())
+            found = hits if found is None else found & hits
+            if len(found) == 0:
+                break
+        return sorted(found)
+
+    # NOTE: returns a condition restricting the kind column to the MBIDs whose
+    # names match regex or None if the regex is left to RLIKE.
+    def match(self: Self, kind: str, regex: str) -> str | None:
+        if not regex_portable(regex):
+            return None
+
+        with self.lock:
+            if self.stale:
+                self.load()
+            if (kind, regex) not in self.matches:
+                self.matches[kind, regex] = self.condition(kind, regex)
+            return self.matches[kind, regex]
+
+    def condition(self: Self, kind: str, regex: str) -> str | None:
+        names = self.names[kind]
+        pattern = regex_compile(regex)
+        if pattern is None:
+            return None
+        if isinstance(pattern, str):
+            found = [
+                i for i in self.candidates(kind, pattern) if pattern in names[i][1]
+            ]
+        else:
+            found = [i for i, (_, name) in enumerate(names) if pattern.search(name)]
+
+        # NOTE: the names with line breaks are still matched by RLIKE, but only
+        # on the rows of their own MBIDs.
+        unsure = []
+        if not set(".^$").isdisjoint(regex):
+            unsure = sorted(self.breaks[kind])
+            found = [i for i in found if i not in self.breaks[kind]]
+
+        if len(found) + len(unsure) > FILTER_PUSHDOWN_LIMIT:
+            return None
+
+        condition = mbids_in(kind, [names[i][0] for i in found])
+        if len(unsure) > 0:
+            unsure_in = mbids_in(kind, [names[i][0] for i in unsure])
+            condition = f"({condition} OR ({unsure_in} AND {rlike(kind, regex)}))"
+        return condition
+
+
+NAME_INDEX = NameIndex()
 
 
 @dataclass
 class MBEntry:
     name: str
-    mbid: str
+    mbid: bytes
 
 
 @dataclass
@@ -212,10 +1530,79 @@ class Scrobble:
     time: datetime
 
 
+# NOTE: the columns each of User's *_rows methods select, in order.
+TRACK_COLUMNS = [
+    "track",
+    "album",
+    "artist",
+    "track_name",
+    "album_name",
+    "artist_name",
+    "track_length",
+]
+SCROBBLE_COLUMNS = TRACK_COLUMNS + ["scrobble_time", "scrobble_id"]
+REPORT_COLUMNS = TRACK_COLUMNS + ["scrobble_count"]
+FIND_COLUMNS = TRACK_COLUMNS + ["last_access"]
+
+
+def display_track(row: dict) -> Track:
+    artist = Artist(row["artist_name"], row["artist"])
+    if album := row["album"]:
+        album = Album(row["album_name"], row["album"], artist)
+    return Track(row["track_name"], row["track"], album, artist, row["track_length"])
+
+
+# NOTE: builds a keyset condition and ORDER BY clause over columns (a, b, ...)
+# for results displayed in descending (or ascending) order. the columns have to
+# be unique together for no rows to be skipped between pages. rows after key in
+# display order are selected, or rows before key if reverse is set. the caller
+# is expected to flip the rows of a reversed page back into display order.
+def keyset(
+    columns: tuple[str, ...], key: tuple | None, descending: bool, reverse: bool
+) -> tuple[str, tuple, str]:
+    a = columns[0]
+    smaller = descending != reverse
+    op = "<" if smaller else ">"
+    order = "DESC" if smaller else "ASC"
+
+    # NOTE: the bound on a alone is implied by the rest but spelled out so the
+    # range read from a's index, and the partitions of scrobbles, don't depend
+    # on the optimizer taking it apart.
+    if key is None:
+        condition, params = "TRUE", ()
+    else:
+        condition, params = f"{columns[-1]} {op} %s", (key[-1],)
+        for column, value in zip(columns[-2::-1], key[-2::-1]):
+            condition = f"{column} {op} %s OR ({column} = %s AND {condition})"
+            params = (value, value, *params)
+        condition = f"({a} {op}= %s AND ({condition}))"
+        params = (key[0], *params)
+
+    return condition, params, ", ".join(f"{c} {order}" for c in columns)
+
+
+# NOTE: reports read play counts from the rollups maintained by
+# sql/setup-rollups.sql, either over all time or for the current day, week or
+# month. returns the rollup table, extra conditions and their parameters.
+REPORT_PERIODS = [None, "month", "week", "day"]
+
+
+def report_counts(period: str | None) -> tuple[str, str, tuple]:
+    if period is None:
+        return "user_track_counts", "", ()
+    else:
+        return (
+            "user_period_counts",
+            "AND period = %s AND bucket = sf_period_bucket(%s, UNIX_TIMESTAMP())",
+            (period, period),
+        )
+
+
 @dataclass
 class User:
     name: str
     admin: bool = False
+    store: ScrobbleStore | None = None
 
     @classmethod
     def login(cls: any, username: str, password: str) -> Self | None:
@@ -223,18 +1610,239 @@ class User:
         if is_admin is None:
             return None
         else:
-            if is_admin:
-                mysql_connection.cmd_change_user(
-                    ADMIN_DATABASE_USER, ADMIN_DATABASE_PASSWORD, DATABSE_NAME
-                )
             return cls(username, is_admin)
 
     def lastfm(self: Self) -> pylast.User:
         return lastfm_network().get_user(self.name)
 
     def scrobbles(self: Self, filters: list[Filter]) -> Generator[Scrobble]:
-        with mysql_connection.cursor(dictionary=True) as cursor:
-            cursor.execute(
+        for chunk in self.scrobble_chunks(filters):
+            yield from chunk
+
+    # NOTE: rows are streamed from the server a chunk at a time so callers never
+    # need to hold the whole history in memory.
+    def scrobble_chunks(
+        self: Self,
+        filters: list[Filter],
+        first: int = STREAM_FIRST_CHUNK,
+        size: int = STREAM_CHUNK,
+    ) -> Generator[list[Scrobble]]:
+        for rows in self.scrobble_rows(filters, first, size, True):
+            yield [
+                Scrobble(
+                    display_track(row),
+                    datetime.fromtimestamp(row["scrobble_time"]),
+                )
+                for row in rows
+            ]
+
+    # NOTE: the *_rows methods stream the rows behind the method they're named
+    # after a chunk at a time, as tuples in the order of the matching *_COLUMNS
+    # unless dictionary is set.
+    def scrobble_rows(
+        self: Self,
+        filters: list[Filter],
+        first: int = STREAM_FIRST_CHUNK,
+        size: int = STREAM_CHUNK,
+        dictionary: bool = False,
+    ) -> Generator[list]:
+        with (
+            mysql_read() as connection,
+            mysql_execute(
+                connection,
+                f"""
+                SELECT {", ".join(SCROBBLE_COLUMNS)}
+                FROM track_display
+                  JOIN scrobbles ON (mbid = track)
+                WHERE user_name = %s
+                  {Filter.conditions(filters)}
+                ORDER BY scrobble_time DESC
+                """,
+                (self.name,),
+                dictionary=dictionary,
+            ) as cursor,
+        ):
+            while rows := cursor.fetchmany(first):
+                yield rows
+                first = size
+
+    def report(
+        self: Self, filters: list[Filter], period: str | None = None
+    ) -> Generator[tuple[Track, int]]:
+        for rows in self.report_rows(filters, period, STREAM_CHUNK, True):
+            for row in rows:
+                yield display_track(row), row["scrobble_count"]
+
+    def report_rows(
+        self: Self,
+        filters: list[Filter],
+        period: str | None = None,
+        size: int = STREAM_CHUNK,
+        dictionary: bool = False,
+    ) -> Generator[list]:
+        counts, condition, params = report_counts(period)
+
+        with (
+            mysql_read() as connection,
+            mysql_execute(
+                connection,
+                f"""
+                SELECT {", ".join(REPORT_COLUMNS)}
+                FROM track_display
+                  JOIN {counts} ON (mbid = track)
+                WHERE user_name = %s
+                  AND scrobble_count > 0
+                  {condition}
+                  {Filter.conditions(filters)}
+                ORDER BY scrobble_count DESC;
+                """,
+                (self.name, *params),
+                dictionary=dictionary,
+            ) as cursor,
+        ):
+            while rows := cursor.fetchmany(size):
+                yield rows
+
+    # NOTE: when decayed is set tracks are ranked by their scores as of now
+    # instead of as of the last time they were played.
+    def find_tracks(
+        self: Self, filters: list[Filter], decayed: bool = True
+    ) -> Generator[Scrobble]:
+        for rows in self.find_rows(filters, decayed, STREAM_CHUNK, True):
+            for row in rows:
+                yield Scrobble(
+                    display_track(row),
+                    datetime.fromtimestamp(row["last_access"]),
+                )
+
+    def find_rows(
+        self: Self,
+        filters: list[Filter],
+        decayed: bool = True,
+        size: int = STREAM_CHUNK,
+        dictionary: bool = False,
+    ) -> Generator[list]:
+        score = "log_crf" if decayed else "last_crf"
+
+        with (
+            mysql_read() as connection,
+            mysql_execute(
+                connection,
+                f"""
+                SELECT {", ".join(FIND_COLUMNS)}
+                FROM track_display
+                  JOIN scores ON (mbid = track)
+                WHERE user_name = %s
+                  {Filter.conditions(filters)}
+                ORDER BY {score} ASC
+                """,
+                (self.name,),
+                dictionary=dictionary,
+            ) as cursor,
+        ):
+            while rows := cursor.fetchmany(size):
+                yield rows
+
+    # NOTE: the *_page methods return a page of at most limit rows after (or
+    # before, if reverse is set) key in display order, each paired with the key
+    # of that row. a key of None starts from the first (or last) row. pages are
+    # served from RESULT_CACHE when they can be and read by the matching read_*
+    # method when they can't, and mustn't be changed by the caller.
+    def scrobble_page(
+        self: Self,
+        filters: list[Filter],
+        key: tuple | None,
+        limit: int,
+        reverse: bool = False,
+    ) -> list[tuple[tuple, Scrobble]]:
+        return RESULT_CACHE.get(
+            self.name,
+            ("view", Filter.key(filters), key, limit, reverse),
+            self.read_scrobble_page,
+            filters,
+            key,
+            limit,
+            reverse,
+        )
+
+    def report_page(
+        self: Self,
+        filters: list[Filter],
+        key: tuple | None,
+        limit: int,
+        reverse: bool = False,
+        period: str | None = None,
+    ) -> list[tuple[tuple, tuple[Track, int]]]:
+        # NOTE: a report for this day, week or month is a different one once the
+        # period has moved on.
+        start = period and period_start(period, datetime.now())
+        return RESULT_CACHE.get(
+            self.name,
+            ("report", start, Filter.key(filters), key, limit, reverse),
+            self.read_report_page,
+            filters,
+            key,
+            limit,
+            reverse,
+            period,
+        )
+
+    def find_page(
+        self: Self,
+        filters: list[Filter],
+        key: tuple | None,
+        limit: int,
+        reverse: bool = False,
+        decayed: bool = True,
+    ) -> list[tuple[tuple, Scrobble]]:
+        return RESULT_CACHE.get(
+            self.name,
+            ("find", decayed, Filter.key(filters), key, limit, reverse),
+            self.read_find_page,
+            filters,
+            key,
+            limit,
+            reverse,
+            decayed,
+        )
+
+    def similar_page(
+        self: Self,
+        filters: list[Filter],
+        key: tuple | None,
+        limit: int,
+        reverse: bool = False,
+    ) -> list[tuple[tuple, tuple[Track, float]]]:
+        return RESULT_CACHE.get(
+            self.name,
+            ("similar", Filter.key(filters), key, limit, reverse),
+            self.read_similar_page,
+            filters,
+            key,
+            limit,
+            reverse,
+        )
+
+    def read_scrobble_page(
+        self: Self,
+        filters: list[Filter],
+        key: tuple | None,
+        limit: int,
+        reverse: bool = False,
+    ) -> list[tuple[tuple, Scrobble]]:
+        if self.store is not None:
+            page = self.store.scrobble_page(filters, key, limit, reverse)
+            if page is not None:
+                return page
+
+        condition, params, order = keyset(
+            ("scrobble_time", "scrobble_id"), key, True, reverse
+        )
+
+        with (
+            mysql_read() as connection,
+            mysql_execute(
+                connection,
                 f"""
                 SELECT track,
                        album,
@@ -245,93 +1853,1548 @@ class User:
                        scrobble_time,
                        track_length,
                        scrobble_id
-                FROM display_tracks
+                FROM track_display
                   JOIN scrobbles ON (mbid = track)
                 WHERE user_name = %s
-                  {"\n".join(map(lambda x: "AND " + x.to_sql(), filters))}
-                ORDER BY scrobble_time DESC
+                  {Filter.conditions(filters)}
+                  AND {condition}
+                ORDER BY {order}
+                LIMIT %s
                 """,
-                (self.name,),
+                (self.name, *params, limit),
+                dictionary=True,
+            ) as cursor,
+        ):
+            page = [
+                (
+                    (row["scrobble_time"], row["scrobble_id"]),
+                    Scrobble(
+                        display_track(row),
+                        datetime.fromtimestamp(row["scrobble_time"]),
+                    ),
+                )
+                for row in cursor
+            ]
+
+        return page[::-1] if reverse else page
+
+    def read_report_page(
+        self: Self,
+        filters: list[Filter],
+        key: tuple | None,
+        limit: int,
+        reverse: bool = False,
+        period: str | None = None,
+    ) -> list[tuple[tuple, tuple[Track, int]]]:
+        if self.store is not None:
+            page = self.store.report_page(filters, key, limit, reverse, period)
+            if page is not None:
+                return page
+
+        counts, period_condition, period_params = report_counts(period)
+        condition, params, order = keyset(
+            ("scrobble_count", "mbid", "artist"), key, True, reverse
+        )
+
+        with (
+            mysql_read() as connection,
+            mysql_execute(
+                connection,
+                f"""
+                SELECT track,
+                       album,
+                       artist,
+                       track_name,
+                       album_name,
+                       artist_name,
+                       track_length,
+                       mbid,
+                       scrobble_count
+                FROM track_display
+                  JOIN {counts} ON (mbid = track)
+                WHERE user_name = %s
+                  AND scrobble_count > 0
+                  {period_condition}
+                  {Filter.conditions(filters)}
+                  AND {condition}
+                ORDER BY {order}
+                LIMIT %s
+                """,
+                (self.name, *period_params, *params, limit),
+                dictionary=True,
+            ) as cursor,
+        ):
+            page = [
+                (
+                    (row["scrobble_count"], row["mbid"], row["artist"]),
+                    (display_track(row), row["scrobble_count"]),
+                )
+                for row in cursor
+            ]
+
+        return page[::-1] if reverse else page
+
+    def read_find_page(
+        self: Self,
+        filters: list[Filter],
+        key: tuple | None,
+        limit: int,
+        reverse: bool = False,
+        decayed: bool = True,
+    ) -> list[tuple[tuple, Scrobble]]:
+        if self.store is not None:
+            page = self.store.find_page(filters, key, limit, reverse, decayed)
+            if page is not None:
+                return page
+
+        score = "log_crf" if decayed else "last_crf"
+        condition, params, order = keyset(
+            (score, "mbid", "artist"), key, False, reverse
+        )
+
+        with (
+            mysql_read() as connection,
+            mysql_execute(
+                connection,
+                f"""
+                SELECT track,
+                       album,
+                       artist,
+                       track_name,
+                       album_name,
+                       artist_name,
+                       track_length,
+                       last_access,
+                       {score},
+                       mbid
+                FROM track_display
+                  JOIN scores ON (mbid = track)
+                WHERE user_name = %s
+                  {Filter.conditions(filters)}
+                  AND {condition}
+                ORDER BY {order}
+                LIMIT %s
+                """,
+                (self.name, *params, limit),
+                dictionary=True,
+            ) as cursor,
+        ):
+            page = [
+                (
+                    (row[score], row["mbid"], row["artist"]),
+                    Scrobble(
+                        display_track(row),
+                        datetime.fromtimestamp(row["last_access"]),
+                    ),
+                )
+                for row in cursor
+            ]
+
+        return page[::-1] if reverse else page
+
+    def read_similar_page(
+        self: Self,
+        filters: list[Filter],
+        key: tuple | None,
+        limit: int,
+        reverse: bool = False,
+    ) -> list[tuple[tuple, tuple[Track, float]]]:
+        condition, params, order = keyset(
+            ("score", "mbid", "artist"), key, True, reverse
+        )
+
+        with (
+            mysql_read() as connection,
+            mysql_execute(
+                connection,
+                f"""
+                SELECT track,
+                       album,
+                       artist,
+                       track_name,
+                       album_name,
+                       artist_name,
+                       track_length,
+                       score,
+                       mbid
+                FROM track_display
+                  JOIN user_recommendations ON (mbid = track)
+                WHERE user_name = %s
+                  {Filter.conditions(filters)}
+                  AND {condition}
+                ORDER BY {order}
+                LIMIT %s
+                """,
+                (self.name, *params, limit),
+                dictionary=True,
+            ) as cursor,
+        ):
+            page = [
+                (
+                    (row["score"], row["mbid"], row["artist"]),
+                    (display_track(row), row["score"]),
+                )
+                for row in cursor
+            ]
+
+        return page[::-1] if reverse else page
+
+
+# RESULT CACHE
+# ------------------------------------------------------------------------------
+# NOTE: pages the screens have read, most recently used last. switching modes or
+# going back to an earlier filter reads the same pages again, which are then
+# served from memory instead of MySQL or the store. each user has a generation
+# that every write to their scrobbles or scores bumps, and an epoch bumped by
+# writes that affect every user. a page is kept along with the generation as
+# of before it was read, so a page read while a write lands is never served
+# once it has.
+@dataclass
+class ResultCache:
+    capacity: int = RESULT_CACHE_BYTES
+    pages: OrderedDict[tuple, tuple[tuple[int, int], list, int]] = field(
+        default_factory=OrderedDict
+    )
+    generations: dict[str, int] = field(default_factory=dict)
+    epoch: int = 0
+    size: int = 0
+    hits: int = 0
+    misses: int = 0
+    stale: int = 0
+    evictions: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def generation(self: Self, username: str) -> tuple[int, int]:
+        return self.epoch, self.generations.get(username, 0)
+
+    # NOTE: drops every page of username, or of every user if it's None.
+    def invalidate(self: Self, username: str | None = None) -> None:
+        with self.lock:
+            if username is None:
+                self.epoch += 1
+            else:
+                self.generations[username] = self.generations.get(username, 0) + 1
+
+    def get(
+        self: Self, username: str, key: tuple, read: Callable[..., list], *args: any
+    ) -> list:
+        if self.capacity <= 0:
+            return read(*args)
+
+        key = (username, *key)
+        with self.lock:
+            generation = self.generation(username)
+            entry = self.pages.get(key)
+            if entry is not None and entry[0] == generation:
+                self.pages.move_to_end(key)
+                self.hits += 1
+                metrics_count("result_cache_lookups", outcome="hit")
+                return entry[1]
+            if entry is not None:
+                self.stale += 1
+                self.size -= entry[2]
+                del self.pages[key]
+            else:
+                self.misses += 1
+        metrics_count(
+            "result_cache_lookups", outcome="miss" if entry is None else "stale"
+        )
+
+        page = read(*args)
+        self.put(key, generation, page)
+        return page
+
+    def put(self: Self, key: tuple, generation: tuple[int, int], page: list) -> None:
+        size = RESULT_CACHE_ROW_BYTES * max(1, len(page))
+        if size > self.capacity:
+            return
+        with self.lock:
+            if key in self.pages:
+                self.size -= self.pages.pop(key)[2]
+            self.pages[key] = (generation, page, size)
+            self.size += size
+            while self.size > self.capacity:
+                _, (_, _, evicted) = self.pages.popitem(last=False)
+                self.size -= evicted
+                self.evictions += 1
+
+
+RESULT_CACHE = ResultCache()
+
+
+# COLUMN STORE
+# ------------------------------------------------------------------------------
+# NOTE: the start of the day, week or month containing now in local time. must
+# match sf_period_bucket.
+def period_start(period: str, now: datetime) -> int:
+    day = now.date()
+    if period == "week":
+        day -= timedelta(days=day.weekday())
+    elif period == "month":
+        day = day.replace(day=1)
+    return int(datetime(day.year, day.month, day.day).timestamp())
+
+
+# NOTE: the position of key in the pairs (a[i], b[i]) sorted in ascending
+# order. side is as for np.searchsorted.
+def lex_position(a: np.ndarray, b: np.ndarray, key: tuple, side: str) -> int:
+    lo = np.searchsorted(a, key[0], "left")
+    hi = np.searchsorted(a, key[0], "right")
+    return int(lo + np.searchsorted(b[lo:hi], key[1], side))
+
+
+@dataclass
+class Ordering:
+    """Items sorted in display order by the pairs (a, b) in ascending order."""
+
+    items: np.ndarray
+    a: np.ndarray
+    b: np.ndarray
+
+    # NOTE: the same contract as the User.*_page methods, with key already
+    # translated into (a, b).
+    def page(self: Self, key: tuple | None, limit: int, reverse: bool) -> np.ndarray:
+        if reverse:
+            end = len(self.items)
+            if key is not None:
+                end = lex_position(self.a, self.b, key, "left")
+            return self.items[max(0, end - limit) : end]
+
+        start = 0
+        if key is not None:
+            start = lex_position(self.a, self.b, key, "right")
+        return self.items[start : start + limit]
+
+
+# NOTE: the columns ScrobbleStore reads for each row of track_display.
+STORE_COLUMNS = ", ".join(TRACK_COLUMNS + ["last_access", "last_crf", "log_crf"])
+
+
+@dataclass
+class ScrobbleStore:
+    """An in-memory copy of a user's history in columns.
+
+    Each row of track_display the user has scrobbled or scored gets a code.
+    Scrobbles are kept as arrays of times, ids and codes joined with
+    track_display the same way the queries in User are, in ascending
+    (time, id) order. Names are dictionary encoded so a filter is matched once
+    per distinct name and then applied to every scrobble as an array lookup.
+    """
+
+    username: str
+    tracks: list[Track] = field(default_factory=list)
+    codes: dict[tuple[bytes, bytes], int] = field(default_factory=dict)
+    # NOTE: the codes of the rows of track_display for each track MBID.
+    track_codes: dict[bytes, list[int]] = field(default_factory=dict)
+    # NOTE: the distinct folded names of each kind and, for each code, the
+    # position of its name or -1 for a missing album. see regex_fold.
+    names: dict[str, list[str]] = field(
+        default_factory=lambda: {"artist": [], "album": [], "track": []}
+    )
+    name_positions: dict[str, dict[str, int]] = field(
+        default_factory=lambda: {"artist": {}, "album": {}, "track": {}}
+    )
+    name_codes: dict[str, list[int]] = field(
+        default_factory=lambda: {"artist": [], "album": [], "track": []}
+    )
+    # NOTE: scores of each code or NaN if there is no score.
+    crf: np.ndarray | None = None
+    log_crf: np.ndarray | None = None
+    access: np.ndarray | None = None
+    # NOTE: the position of each code's (track, artist) pair in sorted order,
+    # which breaks ties between rows the same way the queries in User do.
+    ranks: dict[bytes, int] = field(default_factory=dict)
+    rank: np.ndarray | None = None
+    times: np.ndarray | None = None
+    ids: np.ndarray | None = None
+    track: np.ndarray | None = None
+    # NOTE: the version of the user loaded so far, see sql/setup-versions.sql.
+    version: int = -1
+    # NOTE: results that have already been computed for a filter.
+    masks: dict[tuple, np.ndarray | None] = field(default_factory=dict)
+    orderings: dict[tuple, Ordering] = field(default_factory=dict)
+    # NOTE: held while refreshing and paging so the screens never see a
+    # refresh half done while a sync writes.
+    lock: threading.RLock = field(default_factory=threading.RLock)
+
+    def add_track(self: Self, row: dict) -> int:
+        code = self.codes[row["track"], row["artist"]] = len(self.tracks)
+        self.tracks.append(display_track(row))
+        self.track_codes.setdefault(row["track"], []).append(code)
+
+        for kind in ("artist", "album", "track"):
+            name = row[f"{kind}_name"]
+            if name is None:
+                self.name_codes[kind].append(-1)
+                continue
+            name = regex_fold(name)
+            positions = self.name_positions[kind]
+            if name not in positions:
+                positions[name] = len(self.names[kind])
+                self.names[kind].append(name)
+            self.name_codes[kind].append(positions[name])
+        return code
+
+    def rerank(self: Self) -> None:
+        self.ranks = {pair: i for i, pair in enumerate(sorted(self.codes))}
+        self.rank = np.array([self.ranks[pair] for pair in self.codes], dtype=np.int64)
+
+    # NOTE: loads the scores and scrobbles written since the last call, along
+    # with the rows of track_display they bring in. the first call loads the
+    # whole history.
+    def refresh(self: Self) -> None:
+        with self.lock:
+            # NOTE: every query shares a checkout, and rows are only read up to
+            # the version read first so a write landing in between is left
+            # whole to the next call.
+            with mysql_read() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT user_version FROM user_versions WHERE user_name = %s",
+                        (self.username,),
+                    )
+                    version = (cursor.fetchone() or (0,))[0]
+                if version == self.version:
+                    return None
+
+                with connection.cursor(dictionary=True) as cursor:
+                    cursor.execute(
+                        f"""
+                        SELECT {STORE_COLUMNS}
+                        FROM scores JOIN track_display ON (track = mbid)
+                        WHERE user_name = %s
+                          AND score_version > %s AND score_version <= %s
+                        """,
+                        (self.username, self.version, version),
+                    )
+                    rows = cursor.fetchall()
+
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        """
+                        SELECT scrobble_id, scrobble_time, mbid
+                        FROM scrobbles
+                        WHERE user_name = %s
+                          AND scrobble_version > %s AND scrobble_version <= %s
+                        """,
+                        (self.username, self.version, version),
+                    )
+                    scrobbles = cursor.fetchall()
+
+                # NOTE: scrobbled tracks are normally brought in by their
+                # scores, but a scrobble written without one still needs its
+                # rows.
+                scored = {row["track"] for row in rows}
+                missing = sorted(
+                    {mbid for _, _, mbid in scrobbles}
+                    - scored
+                    - self.track_codes.keys()
+                )
+                with connection.cursor(dictionary=True) as cursor:
+                    for chunk in chunks(missing, 1000):
+                        cursor.execute(
+                            f"""
+                            SELECT {STORE_COLUMNS}
+                            FROM track_display
+                              LEFT JOIN scores ON (mbid = track AND user_name = %s)
+                            WHERE track IN ({sql_placeholders(chunk)})
+                            """,
+                            (self.username, *chunk),
+                        )
+                        rows.extend(cursor.fetchall())
+
+            tracks = len(self.tracks)
+            for row in rows:
+                if (row["track"], row["artist"]) not in self.codes:
+                    self.add_track(row)
+
+            added = len(self.tracks) - tracks
+            if self.crf is None:
+                self.crf = np.full(added, np.nan)
+                self.log_crf = np.full(added, np.nan)
+                self.access = np.zeros(added, dtype=np.int64)
+            elif added > 0:
+                self.crf = np.concatenate((self.crf, np.full(added, np.nan)))
+                self.log_crf = np.concatenate((self.log_crf, np.full(added, np.nan)))
+                self.access = np.concatenate(
+                    (self.access, np.zeros(added, dtype=np.int64))
+                )
+            for row in rows:
+                if row["last_crf"] is not None:
+                    code = self.codes[row["track"], row["artist"]]
+                    self.crf[code] = row["last_crf"]
+                    self.log_crf[code] = row["log_crf"]
+                    self.access[code] = row["last_access"]
+
+            # NOTE: a new row moves the rank of every one after it.
+            if added > 0:
+                self.rerank()
+
+            ids, times, codes = [], [], []
+            for scrobble_id, scrobble_time, mbid in scrobbles:
+                for code in self.track_codes.get(mbid, ()):
+                    ids.append(scrobble_id)
+                    times.append(scrobble_time)
+                    codes.append(code)
+
+            ids = np.array(ids, dtype=np.int64)
+            times = np.array(times, dtype=np.int64)
+            codes = np.array(codes, dtype=np.int32)
+            if self.times is not None:
+                ids = np.concatenate((self.ids, ids))
+                times = np.concatenate((self.times, times))
+                codes = np.concatenate((self.track, codes))
+
+            order = np.lexsort((ids, times))
+            self.ids, self.times, self.track = ids[order], times[order], codes[order]
+            self.version = version
+            self.masks = {}
+            self.orderings = {}
+
+    # NOTE: which names of a kind match regex in the same way as NameIndex,
+    # followed by False for missing names. None if the regex is left to RLIKE,
+    # or may match a name with a line break differently from it.
+    def match(self: Self, kind: str, regex: str) -> np.ndarray | None:
+        names = self.names[kind]
+        if not regex_portable(regex) or (pattern := regex_compile(regex)) is None:
+            return None
+        if not set(".^$").isdisjoint(regex) and any(map(regex_breaks, names)):
+            return None
+        if isinstance(pattern, str):
+            found = [pattern in name for name in names]
+        else:
+            found = [pattern.search(name) is not None for name in names]
+        return np.array(found + [False], dtype=bool)
+
+    # NOTE: which codes pass every filter.
+    def mask(self: Self, filters: list[Filter]) -> np.ndarray | None:
+        key = Filter.key(filters)
+        if key not in self.masks:
+            mask = np.ones(len(self.tracks), dtype=bool)
+            for f in filters:
+                found = self.match(f.name, f.regex)
+                if found is None:
+                    mask = None
+                    break
+                mask &= found[np.array(self.name_codes[f.name], dtype=np.int64)]
+            self.masks[key] = mask
+        return self.masks[key]
+
+    def ordering(
+        self: Self, mode: str, filters: list[Filter], period: str | None
+    ) -> Ordering | None:
+        key = (mode, period, Filter.key(filters))
+        if key in self.orderings:
+            return self.orderings[key]
+
+        mask = self.mask(filters)
+        if mask is None:
+            return None
+
+        if mode == "view":
+            rows = np.flatnonzero(mask[self.track])[::-1]
+            ordering = Ordering(rows, -self.times[rows], -self.ids[rows])
+        elif mode == "report":
+            rows = np.flatnonzero(mask[self.track])
+            if period is not None:
+                start = period_start(period, datetime.now())
+                rows = rows[np.searchsorted(self.times[rows], start) :]
+            counts = np.bincount(self.track[rows], minlength=len(self.tracks))
+            codes = np.flatnonzero(counts)
+            order = np.lexsort((-self.rank[codes], -counts[codes]))
+            codes = codes[order]
+            ordering = Ordering(
+                np.stack((codes, counts[codes]), axis=1),
+                -counts[codes],
+                -self.rank[codes],
             )
+        else:
+            scores = self.log_crf if mode == "decayed" else self.crf
+            codes = np.flatnonzero(mask & ~np.isnan(scores))
+            codes = codes[np.lexsort((self.rank[codes], scores[codes]))]
+            ordering = Ordering(codes, scores[codes], self.rank[codes])
+
+        self.orderings[key] = ordering
+        return ordering
+
+    # NOTE: the *_page methods return the same results as the ones on User or
+    # None if the filters have to be evaluated by MySQL.
+    def scrobble_page(
+        self: Self,
+        filters: list[Filter],
+        key: tuple | None,
+        limit: int,
+        reverse: bool = False,
+    ) -> list[tuple[tuple, Scrobble]] | None:
+        with self.lock:
+            if (ordering := self.ordering("view", filters, None)) is None:
+                return None
+            key = key and (-key[0], -key[1])
+
+            page = []
+            for row in ordering.page(key, limit, reverse):
+                time = int(self.times[row])
+                page.append(
+                    (
+                        (time, int(self.ids[row])),
+                        Scrobble(
+                            self.tracks[self.track[row]], datetime.fromtimestamp(time)
+                        ),
+                    )
+                )
+            return page
+
+    def report_page(
+        self: Self,
+        filters: list[Filter],
+        key: tuple | None,
+        limit: int,
+        reverse: bool = False,
+        period: str | None = None,
+    ) -> list[tuple[tuple, tuple[Track, int]]] | None:
+        with self.lock:
+            if (ordering := self.ordering("report", filters, period)) is None:
+                return None
+            key = key and (-key[0], -self.ranks[key[1:]])
+
+            page = []
+            for code, count in ordering.page(key, limit, reverse):
+                track = self.tracks[code]
+                page.append(
+                    (
+                        (int(count), track.mbid, track.artist.mbid),
+                        (track, int(count)),
+                    )
+                )
+            return page
+
+    def find_page(
+        self: Self,
+        filters: list[Filter],
+        key: tuple | None,
+        limit: int,
+        reverse: bool = False,
+        decayed: bool = True,
+    ) -> list[tuple[tuple, Scrobble]] | None:
+        with self.lock:
+            mode = "decayed" if decayed else "find"
+            if (ordering := self.ordering(mode, filters, None)) is None:
+                return None
+            key = key and (key[0], self.ranks[key[1:]])
+            scores = self.log_crf if decayed else self.crf
+
+            page = []
+            for code in ordering.page(key, limit, reverse):
+                track = self.tracks[code]
+                page.append(
+                    (
+                        (float(scores[code]), track.mbid, track.artist.mbid),
+                        Scrobble(track, datetime.fromtimestamp(int(self.access[code]))),
+                    )
+                )
+            return page
+
+
+# RECOMMENDATIONS
+# ------------------------------------------------------------------------------
+# NOTE: for each kind of MBID with neighbours, the rollup holding its play
+# counts and a query for those of some tracks.
+NEIGHBOUR_SOURCES = {
+    "track": (
+        "user_track_counts",
+        "SELECT mbid FROM tracks WHERE mbid IN ({})",
+    ),
+    "artist": (
+        "user_artist_counts",
+        "SELECT DISTINCT artist FROM tracks WHERE mbid IN ({})",
+    ),
+}
+# NOTE: the most products of entries Recommender.similarities forms at once,
+# each of which takes about 60 bytes until they are summed.
+SIMILAR_PRODUCTS = 1 << 20
+
+
+# NOTE: the positions from each start up to its end, one range after another.
+def ranges(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    lengths = ends - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return np.arange(lengths.sum()) + offsets
+
+
+@dataclass
+class SparseRows:
+    """A matrix in compressed sparse row form.
+
+    The entries of row i are data[indptr[i] : indptr[i + 1]], in the columns at
+    the same positions of indices.
+    """
+
+    indptr: np.ndarray
+    indices: np.ndarray
+    data: np.ndarray
+
+    @classmethod
+    def build(
+        cls, rows: np.ndarray, columns: np.ndarray, data: np.ndarray, n: int
+    ) -> Self:
+        order = np.lexsort((columns, rows))
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+        return cls(indptr, columns[order], data[order])
+
+    def transpose(self: Self, n: int) -> Self:
+        rows = np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr))
+        return SparseRows.build(self.indices, rows, self.data, n)
+
+
+@dataclass
+class Recommender:
+    """Keeps mbid_neighbours and user_recommendations up to date.
+
+    Each MBID is a row of a sparse matrix with a column per user holding the
+    log of how often that user played it, normalized so the product of two
+    rows is their cosine similarity. Similarities are computed a piece of rows
+    at a time from the users they share with every other row, keeping only the
+    nonzero ones, and only the top neighbours of each row are kept.
+
+    A refresh only recomputes the lists of MBIDs scrobbled since the last one,
+    since the similarity of two MBIDs only changes when one of their rows
+    does, and of MBIDs that had one of those as a neighbour. Each of those is
+    then offered to the lists of the other MBIDs, which take it if it is now
+    more similar than their least similar neighbour. Only the recommendations
+    of users who scrobbled, or who played an MBID whose list changed, are
+    recomputed.
+    """
+
+    neighbours: int = SIMILAR_NEIGHBOURS
+    artist_weight: float = SIMILAR_ARTIST_WEIGHT
+
+    # NOTE: the MBIDs of kind with their rows by user and the transpose.
+    def matrix(
+        self: Self, connection: pooling.PooledMySQLConnection, kind: str
+    ) -> tuple[list[bytes], SparseRows, SparseRows]:
+        counts, _ = NEIGHBOUR_SOURCES[kind]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT user_name, mbid, scrobble_count
+                FROM {counts}
+                WHERE scrobble_count > 0
+                """
+            )
+            rows = cursor.fetchall()
+
+        if len(rows) == 0:
+            empty = SparseRows(
+                np.zeros(1, dtype=np.int64),
+                np.zeros(0, dtype=np.int64),
+                np.zeros(0, dtype=np.float32),
+            )
+            return [], empty, empty
+
+        users, mbids, counts = zip(*rows)
+        # NOTE: an array of fixed size bytes would drop the trailing zeros of
+        # an MBID, so they are kept as objects.
+        mbids, items = np.unique(np.array(mbids, dtype=object), return_inverse=True)
+        _, users = np.unique(np.array(users), return_inverse=True)
+
+        x = SparseRows.build(
+            items, users, np.log1p(np.array(counts, dtype=np.float32)), len(mbids)
+        )
+        norms = np.sqrt(np.add.reduceat(x.data**2, x.indptr[:-1]))
+        x.data /= np.repeat(norms, np.diff(x.indptr))
+        return mbids.tolist(), x, x.transpose(users.max() + 1)
+
+    # NOTE: the nonzero similarities of rows of x to every row, through the
+    # users they share, as (row, column, similarity) arrays for one piece of rows
+    # at a time. a piece forms no more than SIMILAR_PRODUCTS products, which are
+    # summed by sorting them on their cell rather than into a piece x N array,
+    # so memory follows how many rows share users rather than N.
+    def similarities(
+        self: Self, x: SparseRows, xt: SparseRows, rows: np.ndarray
+    ) -> Generator[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        n = len(x.indptr) - 1
+        lengths = np.diff(x.indptr)[rows]
+        degrees = np.diff(xt.indptr)
+        totals = np.cumsum(
+            np.add.reduceat(
+                degrees[x.indices[ranges(x.indptr[rows], x.indptr[rows + 1])]],
+                np.cumsum(lengths) - lengths,
+            )
+        )
+
+        start = 0
+        while start < len(rows):
+            formed = totals[start - 1] if start > 0 else 0
+            end = max(
+                start + 1,
+                np.searchsorted(totals, formed + SIMILAR_PRODUCTS, "right"),
+            )
+            piece = rows[start:end]
+            entries = ranges(x.indptr[piece], x.indptr[piece + 1])
+            owner = np.repeat(piece, np.diff(x.indptr)[piece])
+            users = x.indices[entries]
+
+            shared = ranges(xt.indptr[users], xt.indptr[users + 1])
+            counts = np.diff(xt.indptr)[users]
+            weights = np.repeat(x.data[entries], counts) * xt.data[shared]
+            cells = np.repeat(owner, counts) * n + xt.indices[shared]
+
+            order = np.argsort(cells)
+            cells = cells[order]
+            first = np.flatnonzero(np.diff(cells, prepend=-1))
+            sims = np.add.reduceat(weights[order], first, dtype=np.float64)
+            cells = cells[first]
+            yield cells // n, cells % n, sims.astype(np.float32)
+            start = end
+
+    # NOTE: the similarity of the least similar neighbour of each MBID, or 0 if
+    # it has room for more, and the MBIDs with one of dirty as a neighbour.
+    def current(
+        self: Self,
+        connection: pooling.PooledMySQLConnection,
+        kind: str,
+        index: dict[bytes, int],
+        dirty: list[bytes],
+    ) -> tuple[np.ndarray, set[bytes]]:
+        threshold = np.zeros(len(index), dtype=np.float32)
+        listing = set()
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT mbid, MIN(similarity), COUNT(*)
+                FROM mbid_neighbours JOIN mbids USING (mbid)
+                WHERE mbid_type = %s
+                GROUP BY mbid
+                """,
+                (kind,),
+            )
+            for mbid, similarity, count in cursor:
+                if mbid in index and count >= self.neighbours:
+                    threshold[index[mbid]] = similarity
+
+            for chunk in chunks(dirty, 1000):
+                cursor.execute(
+                    f"""
+                    SELECT DISTINCT mbid
+                    FROM mbid_neighbours
+                    WHERE neighbour IN ({sql_placeholders(chunk)})
+                    """,
+                    chunk,
+                )
+                listing.update(row[0] for row in cursor if row[0] in index)
+
+        return threshold, listing
+
+    def lists(
+        self: Self, connection: pooling.PooledMySQLConnection, mbids: list[bytes]
+    ) -> dict[bytes, dict[bytes, float]]:
+        lists = {mbid: {} for mbid in mbids}
+        with connection.cursor() as cursor:
+            for chunk in chunks(mbids, 1000):
+                cursor.execute(
+                    f"""
+                    SELECT mbid, neighbour, similarity
+                    FROM mbid_neighbours
+                    WHERE mbid IN ({sql_placeholders(chunk)})
+                    """,
+                    chunk,
+                )
+                for mbid, neighbour, similarity in cursor:
+                    lists[mbid][neighbour] = similarity
+        return lists
+
+    # NOTE: recomputes the neighbours of every MBID of kind if full is set and
+    # otherwise of those that could have changed with the tracks scrobbled.
+    # returns the new lists.
+    def refresh_kind(
+        self: Self,
+        connection: pooling.PooledMySQLConnection,
+        kind: str,
+        tracks: list[bytes],
+        full: bool,
+    ) -> dict[bytes, dict[bytes, float]]:
+        mbids, x, xt = self.matrix(connection, kind)
+        index = {mbid: i for i, mbid in enumerate(mbids)}
+        k = min(self.neighbours, len(mbids) - 1)
+
+        if full:
+            dirty = mbids
+        else:
+            dirty = set()
+            with connection.cursor() as cursor:
+                for chunk in chunks(tracks, 1000):
+                    cursor.execute(
+                        NEIGHBOUR_SOURCES[kind][1].format(sql_placeholders(chunk)),
+                        chunk,
+                    )
+                    dirty.update(row[0] for row in cursor if row[0] in index)
+            dirty = sorted(dirty)
+        if k <= 0 or len(dirty) == 0:
+            return {}
+
+        # NOTE: a list with a dirty neighbour may have lost it to an MBID it
+        # doesn't know about, so it is recomputed along with the dirty ones.
+        # every other list only needs to be offered the dirty MBIDs.
+        is_dirty = np.zeros(len(mbids), dtype=bool)
+        is_dirty[[index[m] for m in dirty]] = True
+        if full:
+            threshold, listing = None, set()
+        else:
+            threshold, listing = self.current(connection, kind, index, dirty)
+        stale = is_dirty.copy()
+        stale[[index[m] for m in listing]] = True
+
+        rows = np.flatnonzero(stale)
+        lists = {mbids[row]: {} for row in rows}
+        offers = {}
+        for row, column, sims in self.similarities(x, xt, rows):
+            keep = row != column
+            row, column, sims = row[keep], column[keep], sims[keep]
+
+            # NOTE: the k most similar columns of each row, from its entries
+            # sorted by descending similarity.
+            order = np.lexsort((-sims, row))
+            first = np.flatnonzero(np.diff(row[order], prepend=-1))
+            place = np.arange(len(order)) - np.repeat(
+                first, np.diff(first, append=len(order))
+            )
+            for i in order[place < k]:
+                lists[mbids[row[i]]][mbids[column[i]]] = float(sims[i])
+
+            if threshold is None:
+                continue
+
+            offer = is_dirty[row] & ~stale[column] & (sims > threshold[column])
+            for i in np.flatnonzero(offer):
+                offers.setdefault(mbids[column[i]], {})[mbids[row[i]]] = float(sims[i])
+
+        for mbid, merged in self.lists(connection, list(offers)).items():
+            merged.update(offers[mbid])
+            best = sorted(merged.items(), key=lambda item: item[1], reverse=True)
+            lists[mbid] = dict(best[:k])
+
+        return lists
+
+    def write(
+        self: Self,
+        connection: pooling.PooledMySQLConnection,
+        kind: str,
+        lists: dict[bytes, dict[bytes, float]],
+        full: bool,
+    ) -> None:
+        with connection.cursor() as cursor:
+            if full:
+                cursor.execute(
+                    """
+                    DELETE mbid_neighbours
+                    FROM mbid_neighbours JOIN mbids USING (mbid)
+                    WHERE mbid_type = %s
+                    """,
+                    (kind,),
+                )
+            else:
+                for chunk in chunks(list(lists), 1000):
+                    cursor.execute(
+                        f"""
+                        DELETE FROM mbid_neighbours
+                        WHERE mbid IN ({sql_placeholders(chunk)})
+                        """,
+                        chunk,
+                    )
+            cursor.executemany(
+                "INSERT INTO mbid_neighbours VALUES (%s, %s, %s)",
+                [
+                    (mbid, neighbour, similarity)
+                    for mbid, neighbours in lists.items()
+                    for neighbour, similarity in neighbours.items()
+                ],
+            )
+
+    # NOTE: the users who played an MBID with one of lists.
+    def players(
+        self: Self,
+        connection: pooling.PooledMySQLConnection,
+        kind: str,
+        lists: dict[bytes, dict[bytes, float]],
+    ) -> set[str]:
+        counts, _ = NEIGHBOUR_SOURCES[kind]
+        users = set()
+        with connection.cursor() as cursor:
+            for chunk in chunks(list(lists), 1000):
+                cursor.execute(
+                    f"""
+                    SELECT DISTINCT user_name
+                    FROM {counts}
+                    WHERE mbid IN ({sql_placeholders(chunk)})
+                      AND scrobble_count > 0
+                    """,
+                    chunk,
+                )
+                users.update(row[0] for row in cursor)
+        return users
+
+    # NOTE: brings the neighbours up to date with the scrobbles queued in
+    # recommendation_changes and recomputes the recommendations they affect.
+    # the first refresh, or one with full set, recomputes everything.
+    def refresh(self: Self, full: bool = False) -> None:
+        with mysql_write() as connection:
+            # NOTE: the queue is read before the rollups, so every change read
+            # is in them. changes committed after it are left for next time.
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT refreshed FROM recommendation_state")
+                (refreshed,) = cursor.fetchone()
+                cursor.execute(
+                    "SELECT change_id, user_name, mbid FROM recommendation_changes"
+                )
+                changes = cursor.fetchall()
+
+            if len(changes) == 0 and refreshed and not full:
+                return None
+            full = full or not refreshed
+            tracks = sorted({mbid for _, _, mbid in changes})
+            users = {user for _, user, _ in changes}
+
+            try:
+                for kind in NEIGHBOUR_SOURCES:
+                    lists = self.refresh_kind(connection, kind, tracks, full)
+                    self.write(connection, kind, lists, full)
+                    if not full:
+                        users |= self.players(connection, kind, lists)
+
+                with connection.cursor() as cursor:
+                    cursor.execute("UPDATE recommendation_state SET refreshed = TRUE")
+                    for chunk in chunks([change[0] for change in changes], 1000):
+                        cursor.execute(
+                            f"""
+                            DELETE FROM recommendation_changes
+                            WHERE change_id IN ({sql_placeholders(chunk)})
+                            """,
+                            chunk,
+                        )
+                    for user in [None] if full else sorted(users):
+                        cursor.execute(
+                            "CALL sp_recommendations_refresh(%s, %s)",
+                            (user, self.artist_weight),
+                        )
+                connection.commit()
+                RESULT_CACHE.invalidate()
+            except mysql.connector.Error:
+                connection.rollback()
+                raise
+
+
+RECOMMENDER = Recommender()
+
+
+# IMPORT PIPELINE
+# ------------------------------------------------------------------------------
+@dataclass
+class ImportEntry:
+    time: int
+    artist: str
+    artist_mbid: str
+    album: str | None
+    album_mbid: str | None
+    track: str | None
+    track_mbid: str | None
+    length: timedelta | None
+
+
+# NOTE: the import of the scrobbles a user made in (window_from, window_to] as
+# stored in import_state, along with the pages of it already written.
+@dataclass
+class ImportJob:
+    username: str
+    window_from: int
+    window_to: int
+    total_pages: int | None = None
+    pages: set[int] = field(default_factory=set)
+
+
+@dataclass
+class ImportBuffer:
+    username: str
+    batch_size: int = IMPORT_BATCH_SIZE
+    flush_interval: float = IMPORT_FLUSH_INTERVAL
+    entries: list[ImportEntry] = field(default_factory=list)
+    # NOTE: the pages of an import whose entries are all in entries.
+    pages: list[int] = field(default_factory=list)
+    last_flush: float = field(default_factory=monotonic)
+    # NOTE: a store to bring up to date after each batch.
+    store: ScrobbleStore | None = None
+    # NOTE: the number of scrobbles flushed so far.
+    written: int = 0
+
+    def full(self: Self) -> bool:
+        return (
+            len(self.entries) >= self.batch_size
+            or monotonic() - self.last_flush >= self.flush_interval
+        )
+
+    def add(self: Self, entry: ImportEntry) -> None:
+        self.entries.append(entry)
+        if self.full():
+            self.flush()
+
+    # NOTE: like add but takes a whole page of an import and flushes on a worker
+    # thread so the event loop can keep fetching while the batch is written.
+    # batches only ever end on a page boundary so a page is written along with
+    # the record that it was.
+    async def put(self: Self, page: int, entries: list[ImportEntry]) -> None:
+        self.entries.extend(entries)
+        self.pages.append(page)
+        if self.full():
+            await to_thread(self.flush)
+
+    def flush(self: Self) -> None:
+        # NOTE: the batch is taken before it is written so a flush left running
+        # on a worker thread by a cancelled task isn't written again.
+        entries, pages = self.entries, self.pages
+        self.entries, self.pages = [], []
+        if len(entries) > 0 or len(pages) > 0:
+            mysql_import_batch(self.username, entries, pages)
+            self.written += len(entries)
+            NAME_INDEX.stale = True
+            if self.store is not None:
+                self.store.refresh()
+            # NOTE: only once the store has caught up, or a page read from it
+            # before then could be cached as current.
+            RESULT_CACHE.invalidate(self.username)
+        self.last_flush = monotonic()
+
+
+@dataclass
+class DurationCache:
+    capacity: int = DURATION_CACHE_SIZE
+    # NOTE: durations fetched from Last.FM in least to most recently used order.
+    # tracks Last.FM has no duration for are cached as None so they are not
+    # looked up again, but failed lookups aren't cached at all.
+    recent: OrderedDict[str, timedelta | None] = field(default_factory=OrderedDict)
+    # NOTE: durations already in the tracks table as of the last call to load.
+    stored: dict[str, timedelta] = field(default_factory=dict)
+    pending: dict[str, Future] = field(default_factory=dict)
+    hits: int = 0
+    stored_hits: int = 0
+    coalesced: int = 0
+    misses: int = 0
+
+    def load(self: Self) -> None:
+        self.stored = mysql_track_lengths()
+
+    def remember(self: Self, mbid: str, length: timedelta | None) -> None:
+        self.recent[mbid] = length
+        self.recent.move_to_end(mbid)
+        if len(self.recent) > self.capacity:
+            self.recent.popitem(last=False)
+
+    async def get(self: Self, mbid: str, artist: str, track: str) -> timedelta | None:
+        if mbid in self.recent:
+            self.hits += 1
+            self.recent.move_to_end(mbid)
+            return self.recent[mbid]
+
+        if mbid in self.stored:
+            self.stored_hits += 1
+            return self.stored[mbid]
+
+        # NOTE: another scrobble of this track is already waiting on Last.FM.
+        if mbid in self.pending:
+            self.coalesced += 1
+            return await shield(self.pending[mbid])
+
+        self.misses += 1
+        future = self.pending[mbid] = get_running_loop().create_future()
+        try:
+            length = await lastfm_track_duration(artist, track)
+            self.remember(mbid, length)
+            future.set_result(length)
+            return length
+        except Exception as e:
+            # NOTE: scrobbles waiting on this lookup fail with it. reading the
+            # exception back keeps asyncio from logging it when none are.
+            future.set_exception(e)
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            del self.pending[mbid]
+
+
+TRACK_DURATIONS = DurationCache()
+
+
+# NOTE: an MBID is only kept if it is a UUID, in its lowercase form, since it is
+# written as the 16 bytes of one.
+def lastfm_validate_mbid(mbid: str) -> str | None:
+    if mbid and len(mbid) == 36:
+        try:
+            return str(uuid.UUID(mbid))
+        except ValueError:
+            return None
+    else:
+        return None
+
+
+async def lastfm_parse_scrobble(track_node: any) -> ImportEntry | None:
+    timestamp = track_node.getElementsByTagName("date")[0].getAttribute("uts")
+    timestamp = timestamp and int(timestamp)
+
+    artist = pylast._extract(track_node, "artist")
+    artist_mbid = lastfm_validate_mbid(
+        track_node.getElementsByTagName("artist")[0].getAttribute("mbid")
+    )
+
+    if artist_mbid is None:
+        return None
+
+    album = pylast._extract(track_node, "album")
+    album_mbid = lastfm_validate_mbid(
+        track_node.getElementsByTagName("album")[0].getAttribute("mbid")
+    )
+
+    track = pylast._extract(track_node, "name")
+    track_mbid = lastfm_validate_mbid(pylast._extract(track_node, "mbid"))
+
+    duration = None
+    if track_mbid is not None:
+        duration = await TRACK_DURATIONS.get(track_mbid, artist, track)
+
+    return ImportEntry(
+        timestamp, artist, artist_mbid, album, album_mbid, track, track_mbid, duration
+    )
+
+
+# NOTE: pages are fetched and parsed concurrently through LASTFM_FETCHER and
+# handed to a single writer over a bounded queue so that network and database
+# latency overlap. a parsed entry of None is a scrobble that was skipped. pages
+# of job already written are not fetched again.
+async def lastfm_import_scrobbles(
+    user: pylast.User,
+    job: ImportJob,
+    buffer: ImportBuffer,
+    advance: Callable[[int, int], Awaitable[None]],
+) -> None:
+    params = user._get_params()
+    params["limit"] = str(LASTFM_PAGE_SIZE)
+    params["from"] = str(job.window_from + 1)
+    params["to"] = str(job.window_to)
+
+    queue = Queue(maxsize=2 * LASTFM_FETCHER.concurrency)
+
+    async def fetch(page: int) -> None:
+        nodes, total_pages = await LASTFM_FETCHER.call(
+            lastfm_recent_tracks_page, user, params, page
+        )
+        if job.total_pages is None:
+            job.total_pages = total_pages
+            await to_thread(mysql_import_total_pages, job)
+        # prevent the now playing track from sneaking in
+        nodes = [n for n in nodes if not n.hasAttribute("nowplaying")]
+        metrics_count("import_pages")
+        metrics_count("import_fetched", len(nodes))
+        await queue.put((page, await gather(*map(lastfm_parse_scrobble, nodes))))
+
+    async def produce() -> None:
+        fetched = set(job.pages)
+        # NOTE: the number of pages is only known once one has been fetched.
+        if job.total_pages is None:
+            await fetch(1)
+            fetched.add(1)
+        async with TaskGroup() as pages:
+            for page in range(1, job.total_pages + 1):
+                if page not in fetched:
+                    pages.create_task(fetch(page))
+        await queue.put(None)
+
+    async def write() -> None:
+        done = len(job.pages)
+        while (item := await queue.get()) is not None:
+            page, entries = item
+            parsed = [e for e in entries if e is not None]
+            metrics_count(
+                "import_skipped", len(entries) - len(parsed), reason="no_mbid"
+            )
+            await buffer.put(page, parsed)
+            done += 1
+            await advance(done, max(done, job.total_pages))
+        await to_thread(buffer.flush)
+
+    async with TaskGroup() as tasks:
+        tasks.create_task(produce())
+        tasks.create_task(write())
+
+
+# SYNC
+# ------------------------------------------------------------------------------
+# NOTE: a client's history is kept up to date with Last.FM by a SyncService
+# running alongside the screens rather than by an import they wait on at login.
+# each sync is an import of the scrobbles made since the last one, so it is
+# usually a single page, written as it arrives and resumed like any import if
+# it's cut short.
+async def lastfm_sync_progress(pages_done: int, total_pages: int) -> None:
+    pass
 
-            for row in cursor:
-                artist = Artist(row["artist_name"], row["artist"])
-                if album := row["album"]:
-                    album = Album(row["album_name"], row["album"], self)
-                track = Track(
-                    row["track_name"], row["track"], album, artist, row["track_length"]
-                )
 
-                yield Scrobble(
-                    track,
-                    datetime.fromtimestamp(row["scrobble_time"]),
+@dataclass
+class SyncService:
+    user: pylast.User
+    store: ScrobbleStore | None = None
+    # NOTE: called with the user's name and how many scrobbles a sync wrote,
+    # when it wrote any, and with the user's name and the error when it failed.
+    on_sync: Callable[[str, int], Awaitable[None]] | None = None
+    on_error: Callable[[str, Exception], Awaitable[None]] | None = None
+    interval: float = SYNC_INTERVAL
+    max_interval: float = SYNC_MAX_INTERVAL
+
+    async def sync(self: Self) -> int:
+        username = self.user.get_name()
+        job = await to_thread(
+            mysql_import_start, username, int(datetime.now().timestamp())
+        )
+        buffer = ImportBuffer(username, store=self.store)
+        try:
+            with metrics_timer("sync"):
+                await lastfm_import_scrobbles(
+                    self.user, job, buffer, lastfm_sync_progress
                 )
+                await to_thread(mysql_import_finish, job)
+        finally:
+            await to_thread(buffer.flush)
 
-    def report(self: Self, filters: list[Filter]) -> Generator[Scrobble]:
-        with mysql_connection.cursor(dictionary=True) as cursor:
-            cursor.execute(
-                f"""
-                SELECT track,
-                       album,
-                       artist,
-                       track_name,
-                       album_name,
-                       artist_name,
-                       track_length,
-                       COUNT(*) AS scrobble_count
-                FROM display_tracks
-                  JOIN scrobbles ON (mbid = track)
-                WHERE user_name = %s
-                  {"\n".join(map(lambda x: "AND " + x.to_sql(), filters))}
-                GROUP BY mbid
-                ORDER BY scrobble_count DESC;
-                """,
-                (self.name,),
-            )
+        metrics_count("sync_written", buffer.written)
+        if buffer.written > 0 and self.on_sync is not None:
+            await self.on_sync(username, buffer.written)
+        return buffer.written
 
-            for row in cursor:
-                artist = Artist(row["artist_name"], row["artist"])
-                if album := row["album"]:
-                    album = Album(row["album_name"], row["album"], self)
-                track = Track(
-                    row["track_name"], row["track"], album, artist, row["track_length"]
-                )
+    # NOTE: like sync but hands an error to on_error and returns None. the
+    # error passed on is the first one behind the import's task groups.
+    async def attempt(self: Self) -> int | None:
+        try:
+            return await self.sync()
+        except Exception as e:
+            metrics_count("sync_errors")
+            while isinstance(e, ExceptionGroup):
+                e = e.exceptions[0]
+            if self.on_error is not None:
+                await self.on_error(self.user.get_name(), e)
+            return None
 
-                yield track, row["scrobble_count"]
+    # NOTE: syncs right away and then keeps syncing until cancelled. the wait
+    # doubles after each sync that found nothing new or failed, up to
+    # max_interval, and goes back to interval once one finds something.
+    async def run(self: Self) -> None:
+        idle = 0
+        while True:
+            idle = 0 if await self.attempt() else idle + 1
+            await sleep(min(self.max_interval, self.interval * 2 ** max(0, idle - 1)))
 
-    def find_tracks(self: Self, filters: list[Filter]) -> Generator[Scrobble]:
-        with mysql_connection.cursor(dictionary=True) as cursor:
-            cursor.execute(
-                f"""
-                SELECT track,
-                       album,
-                       artist,
-                       track_name,
-                       album_name,
-                       artist_name,
-                       track_length,
-                       last_access
-                FROM display_tracks
-                  JOIN scores ON (mbid = track)
-                WHERE user_name = %s
-                  {"\n".join(map(lambda x: "AND " + x.to_sql(), filters))}
-                ORDER BY last_crf ASC
-                """,
-                (self.name,),
-            )
 
-            for row in cursor:
-                artist = Artist(row["artist_name"], row["artist"])
-                if album := row["album"]:
-                    album = Album(row["album_name"], row["album"], self)
-                track = Track(
-                    row["track_name"], row["track"], album, artist, row["track_length"]
-                )
+# NOTE: syncs every client with a Last.FM session, once or on the same schedule
+# as a logged in client, and refreshes the recommendations after each sync that
+# wrote something.
+async def sync_users(once: bool) -> None:
+    try:
+        network = lastfm_network()
+    except pylast.PyLastError:
+        print("API_KEY and API_SECRET are needed to reach Last.FM", file=sys.stderr)
+        sys.exit(1)
 
-                yield Scrobble(
-                    track,
-                    datetime.fromtimestamp(row["last_access"]),
-                )
+    await to_thread(mysql_scrobbles_partition, SCROBBLE_PARTITIONS_AHEAD)
+    usernames = await to_thread(mysql_sync_users)
+    await to_thread(TRACK_DURATIONS.load)
+    refreshing = threading.Lock()
+
+    async def synced(username: str, count: int) -> None:
+        print(f"{username}: synced {count} scrobbles", flush=True)
+        if RECOMMENDATIONS and np is not None:
+
+            def refresh() -> None:
+                with refreshing:
+                    RECOMMENDER.refresh()
+
+            await to_thread(refresh)
+
+    async def failed(username: str, e: Exception) -> None:
+        print(f"{username}: failed to sync: {e}", file=sys.stderr, flush=True)
+
+    services = [
+        SyncService(network.get_user(u), on_sync=synced, on_error=failed)
+        for u in usernames
+    ]
+    async with TaskGroup() as tasks:
+        for service in services:
+            tasks.create_task(service.attempt() if once else service.run())
+
+
+def sync_parse(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="app.py sync",
+        description="Sync the scrobbles of every client with a Last.FM session",
+    )
+    parser.add_argument(
+        "--once", action="store_true", help="sync each client once and exit"
+    )
+    return parser.parse_args(argv)
+
+
+# EXPORT
+# ------------------------------------------------------------------------------
+# NOTE: an export writes the rows behind User.scrobbles, User.report or
+# User.find_tracks a chunk at a time as they're read, so memory use doesn't
+# grow with the history. in CSV and JSON Lines times are UNIX timestamps and
+# lengths are in seconds. Parquet has types for both. MBIDs are written as text
+# in every format.
+EXPORT_FORMATS = ["csv", "jsonl", "parquet"]
+EXPORT_TIMES = {"scrobble_time", "last_access"}
+EXPORT_LENGTH = TRACK_COLUMNS.index("track_length")
+
+
+def export_rows(
+    user: User, what: str, filters: list[Filter], period: str | None, decayed: bool
+) -> tuple[list[str], Generator[list[tuple]]]:
+    if what == "scrobbles":
+        rows = user.scrobble_rows(filters, EXPORT_CHUNK, EXPORT_CHUNK)
+        return SCROBBLE_COLUMNS, export_mbids(rows)
+    elif what == "report":
+        rows = user.report_rows(filters, period, EXPORT_CHUNK)
+        return REPORT_COLUMNS, export_mbids(rows)
+    else:
+        rows = user.find_rows(filters, decayed, EXPORT_CHUNK)
+        return FIND_COLUMNS, export_mbids(rows)
+
+
+# NOTE: every row starts with the track, album and artist of TRACK_COLUMNS.
+def export_mbids(chunks: Generator[list[tuple]]) -> Generator[list[tuple]]:
+    for rows in chunks:
+        yield [
+            (mbid_text(track), album and mbid_text(album), mbid_text(artist), *rest)
+            for track, album, artist, *rest in rows
+        ]
+
+
+def export_seconds(row: tuple) -> tuple:
+    length = row[EXPORT_LENGTH]
+    if length is not None:
+        length = int(length.total_seconds())
+    return (*row[:EXPORT_LENGTH], length, *row[EXPORT_LENGTH + 1 :])
+
+
+def export_csv(columns: list[str], chunks: Generator[list[tuple]], f: any) -> int:
+    writer = csv.writer(f)
+    writer.writerow(columns)
+    count = 0
+    for rows in chunks:
+        writer.writerows(map(export_seconds, rows))
+        count += len(rows)
+    return count
+
+
+def export_jsonl(columns: list[str], chunks: Generator[list[tuple]], f: any) -> int:
+    count = 0
+    for rows in chunks:
+        f.writelines(
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n"
+            for row in map(export_seconds, rows)
+        )
+        count += len(rows)
+    return count
+
+
+# NOTE: each chunk is written as a row group, column by column, without making
+# anything of its rows but the arrays.
+def export_parquet(columns: list[str], chunks: Generator[list[tuple]], f: any) -> int:
+    import pyarrow.parquet as pq
+
+    def column_type(column: str) -> pa.DataType:
+        if column in EXPORT_TIMES:
+            return pa.timestamp("s", tz="UTC")
+        elif column == "track_length":
+            return pa.duration("s")
+        elif column in ("scrobble_id", "scrobble_count"):
+            return pa.int64()
+        else:
+            return pa.string()
+
+    schema = pa.schema([(column, column_type(column)) for column in columns])
+    count = 0
+    with pq.ParquetWriter(f, schema) as writer:
+        for rows in chunks:
+            arrays = [
+                pa.array(values, type=field.type)
+                for values, field in zip(zip(*rows), schema)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            count += len(rows)
+    return count
+
+
+def export_parse(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="app.py export",
+        description="Write a user's scrobbles, report or tracks to find to a file.",
+    )
+    parser.add_argument("user")
+    parser.add_argument("what", choices=["scrobbles", "report", "find"])
+    parser.add_argument(
+        "--filter", default="", help="filters as typed into the filter screen"
+    )
+    parser.add_argument(
+        "--period", choices=[p for p in REPORT_PERIODS if p is not None]
+    )
+    parser.add_argument(
+        "--stored", action="store_true", help="rank tracks to find by stored scores"
+    )
+    parser.add_argument("--format", choices=EXPORT_FORMATS)
+    parser.add_argument("-o", "--output", default="-", help="a file, or - for stdout")
+    args = parser.parse_args(argv)
+
+    args.filters = Filter.parse(args.filter)
+    if args.filters is None:
+        parser.error(f"invalid filter: {args.filter}")
+    if args.format is None:
+        extension = os.path.splitext(args.output)[1].lstrip(".")
+        args.format = extension if extension in EXPORT_FORMATS else "csv"
+    if args.format == "parquet" and pa is None:
+        parser.error("exporting to Parquet needs pyarrow")
+    return args
+
+
+def export(args: argparse.Namespace) -> None:
+    if not mysql_user_exists(args.user):
+        print(f"User {args.user} does not exist", file=sys.stderr)
+        sys.exit(1)
+
+    columns, chunks = export_rows(
+        User(args.user), args.what, args.filters, args.period, not args.stored
+    )
+    writer = {"csv": export_csv, "jsonl": export_jsonl, "parquet": export_parquet}[
+        args.format
+    ]
+    binary = args.format == "parquet"
+
+    if args.output == "-":
+        f = sys.stdout.buffer if binary else sys.stdout
+        start = perf_counter()
+        count = writer(columns, chunks, f)
+        f.flush()
+    else:
+        try:
+            with (
+                open(args.output, "wb")
+                if binary
+                else open(args.output, "w", newline="", encoding="utf-8")
+            ) as f:
+                start = perf_counter()
+                count = writer(columns, chunks, f)
+        except OSError as err:
+            print(f"Failed to write {args.output}: {err}", file=sys.stderr)
+            sys.exit(1)
+
+    print(f"exported {count} rows in {perf_counter() - start:.2f}s", file=sys.stderr)
 
 
 # UI
@@ -383,11 +3446,12 @@ class LoginScreen(Screen):
         yield Input(placeholder="PASSWORD", id="password", password=True)
         yield Button("Login")
 
-    def on_button_pressed(self, event: Button.Pressed) -> None:
+    @work(exclusive=True)
+    async def on_button_pressed(self, event: Button.Pressed) -> None:
         username = self.query_one("#username", Input).value
         password = self.query_one("#password", Input).value
         if username != "" and password != "":
-            if user := User.login(username, password):
+            if user := await run_query(User.login, username, password):
                 self.dismiss(user)
             else:
                 self.notify("Invalid username or password.", severity="error")
@@ -426,11 +3490,15 @@ class SignupScreen(Screen):
 
             while True:
                 try:
-                    result = skg.get_web_auth_session_key_username(url)
+                    result = await to_thread(skg.get_web_auth_session_key_username, url)
                     self.session_key, self.username = result
 
-                    if mysql_user_exists(self.username):
-                        mysql_user_update_session_key(self.username, self.session_key)
+                    if await run_query(mysql_user_exists, self.username):
+                        await run_query(
+                            mysql_user_update_session_key,
+                            self.username,
+                            self.session_key,
+                        )
                         self.notify(
                             f"User '{self.username}' already exists.", severity="error"
                         )
@@ -457,197 +3525,21 @@ class SignupScreen(Screen):
         input.loading = True
         self.authenticate()
 
-    def on_button_pressed(self, event: Button.Pressed) -> None:
+    @work(exclusive=True)
+    async def on_button_pressed(self, event: Button.Pressed) -> None:
         password = self.query_one("#password", Input).value
         if len(password) == 0:
             self.notify("Invalid password.", severity="error")
         elif len(password) > 16:
             self.notify("Password too long.", severity="error")
         else:
-            mysql_user_create(self.username, password, self.session_key)
+            await run_query(
+                mysql_user_create, self.username, password, self.session_key
+            )
             self.notify(f"Created user '{self.username}'.")
             self.dismiss(User(self.username))
 
 
-class ImportScreen(Screen):
-    TITLE = "Import"
-
-    CSS = """
-    ImportScreen {
-        align: center middle;
-    }
-
-    #dialog {
-        width: auto;
-        height: auto;
-    }
-    """
-
-    def compose(self) -> ComposeResult:
-        yield Container(
-            Static("Importing..."),
-            ProgressBar(),
-            id="dialog",
-        )
-
-    @work(exclusive=True)
-    async def lastfm_import(self, scrobble_count: int) -> None:
-        progress = self.query_one(ProgressBar)
-
-        user = self.app.user.lastfm()
-        username = user.get_name()
-
-        prev_scrobble_count = mysql_user_scrobble_count(username)
-        curr_scrobble_count = scrobble_count
-
-        last_scrobble = mysql_user_last_update(username)
-
-        if prev_scrobble_count >= curr_scrobble_count:
-            self.dismiss()
-            return None
-
-        scrobbles_remaining = curr_scrobble_count - prev_scrobble_count
-
-        params = user._get_params()
-        params["limit"] = None
-        params["from"] = last_scrobble + 1
-
-        def validate_mbid(mbid: str) -> bool:
-            if mbid and len(mbid) == 36:
-                return mbid
-            else:
-                return None
-
-        scrobbles_seen = 0
-
-        async def advance() -> bool:
-            nonlocal scrobbles_seen
-
-            progress.advance(advance=1)
-            scrobbles_seen += 1
-
-            if scrobbles_seen % 200 == 0:
-                await sleep(0.1)
-            else:
-                self.query_one(Static).update(
-                    content=f"Importing {scrobbles_seen}/{scrobble_count} scrobbles."
-                )
-                # NOTE: yield control back to control loop to update display
-                await sleep(0)
-
-        try:
-            for track_node in pylast._collect_nodes(
-                params["limit"],
-                user,
-                user.ws_prefix + ".getRecentTracks",
-                True,
-                params,
-                stream=True,
-            ):
-                # prevent the now playing track from sneaking in
-                if track_node.hasAttribute("nowplaying"):
-                    continue
-
-                scrobbles_remaining -= 1
-                if scrobbles_remaining < 0:
-                    break
-
-                timestamp = track_node.getElementsByTagName("date")[0].getAttribute(
-                    "uts"
-                )
-                timestamp = timestamp and int(timestamp)
-                last_scrobble = max(last_scrobble, timestamp)
-
-                artist = pylast._extract(track_node, "artist")
-                artist_mbid = validate_mbid(
-                    track_node.getElementsByTagName("artist")[0].getAttribute("mbid")
-                )
-
-                if artist_mbid is None:
-                    await advance()
-                    continue
-
-                mysql_artist_add(artist_mbid, artist)
-                mysql_score_update(username, timestamp, artist_mbid)
-
-                album = pylast._extract(track_node, "album")
-                album_mbid = validate_mbid(
-                    track_node.getElementsByTagName("album")[0].getAttribute("mbid")
-                )
-
-                if album_mbid is not None:
-                    mysql_album_add(album_mbid, album, artist_mbid)
-                    mysql_score_update(username, timestamp, album_mbid)
-
-                track = pylast._extract(track_node, "name")
-                track_mbid = validate_mbid(pylast._extract(track_node, "mbid"))
-
-                if track_mbid is None:
-                    await advance()
-                    continue
-
-                # NOTE: ideally we would just use MBIDs here, but since
-                # Last.FM's API is broken and using MBIDs doesn't work 99% of
-                # the time here we are.
-                duration_tries = 1
-                while True:
-                    try:
-                        duration = pylast._Request(
-                            lastfm_network(),
-                            "track.getInfo",
-                            {"artist": artist, "track": track},
-                        ).execute(True)
-                        break  # success
-                    except Exception:
-                        if duration_tries >= 5:
-                            continue
-
-                        duration_tries += 1
-                        await sleep(1)
-
-                duration = pylast.cleanup_nodes(duration)
-                duration = pylast._extract(duration, "duration")
-                duration = duration and (int(duration) // 1000)
-
-                if duration != 0:
-                    duration = timedelta(seconds=duration)
-                    mysql_track_add(
-                        track_mbid, track, artist_mbid, album_mbid, duration
-                    )
-                    mysql_score_update(username, timestamp, track_mbid)
-                    mysql_scrobble_add(username, timestamp, track_mbid)
-
-                await advance()
-
-        except pylast.PyLastError:
-            pass
-
-        finally:
-            if scrobbles_remaining > 0:
-                progress.advance(advance=scrobbles_remaining)
-
-            self.dismiss()
-
-    @work
-    async def on_mount(self) -> None:
-        try:
-            scrobble_count = self.app.user.lastfm().get_playcount()
-        except pylast.PyLastError:
-            self.notify("Unable to reach Last.FM.", severity="error")
-            self.dismiss()
-            return None
-
-        self.query_one(Static).update(
-            content=f"Importing 0/{scrobble_count} scrobbles."
-        )
-        self.query_one(ProgressBar).update(total=scrobble_count)
-
-        # NOTE: yield control back to control loop to update display
-        await sleep(0)
-
-        self.lastfm_import(scrobble_count)
-
-
 class FilterScreen(ModalScreen):
     TITLE = "Filter"
 
@@ -679,49 +3571,233 @@ class FilterScreen(ModalScreen):
             self.notify("Invalid filter.")
 
 
-class ViewScreen(Screen):
-    TITLE = "Scrobbles"
+class StatsScreen(ModalScreen):
+    TITLE = "Stats"
 
     CSS = """
-    #box {
-        width: 100%;
-        height: 100%;
+    StatsScreen {
+        align: center middle;
     }
 
     DataTable {
-        width: 100%;
-        text-overflow: ellipsis;
+        width: 90%;
+        height: 80%;
     }
     """
 
+    BINDINGS = [
+        ("escape", "app.pop_screen", "Back"),
+    ]
+
     def compose(self) -> ComposeResult:
-        yield Header()
-        yield Container(DataTable(cursor_type="row", zebra_stripes=True), id="box")
-        yield Footer()
+        yield DataTable(cursor_type="row", zebra_stripes=True)
 
-    @work
-    async def load_scrobbles(self, table: DataTable) -> None:
-        for s in self.app.user.scrobbles(self.app.filters):
-            track = Content(s.track.name).truncate(48, ellipsis=True)
-            artist = Content(s.track.artist.name).truncate(32, ellipsis=True)
-            table.add_row(s.time, track, artist)
-        self.query_one("#box").loading = False
+    def refresh_stats(self) -> None:
+        table = self.query_one(DataTable)
+        row = table.cursor_row
+        table.clear()
+        metrics_render()
+        for name, labels, count, seconds in METRICS.snapshot():
+            if seconds is None:
+                table.add_row(name, labels, count, "", "")
+            else:
+                mean = 1000 * seconds / count if count else 0
+                table.add_row(name, labels, count, f"{seconds:.3f}", f"{mean:.3f}")
+        table.move_cursor(row=row)
 
     def on_mount(self) -> None:
-        table = self.query_one(DataTable)
-        table.add_columns("Date", "Track", "Artist")
+        self.query_one(DataTable).add_columns(
+            "Metric", "Labels", "Count", "Seconds", "Mean ms"
+        )
+        self.refresh_stats()
+        self.set_interval(1, self.refresh_stats)
 
-        def on_filter_change() -> None:
-            self.query_one("#box").loading = True
-            table.clear()
-            self.load_scrobbles(table)
 
-        self.watch(self.app, "filters", on_filter_change)
-        on_filter_change()
+class PagedTable(DataTable):
+    """A DataTable that only holds a window of rows around the cursor.
 
+    Rows come from fetch(key, limit, reverse), which returns up to limit
+    (key, row) pairs after key in display order, or before key if reverse is
+    set, in display order. A key of None fetches from the first (or last) row.
+    The next or previous page is fetched as soon as the cursor moves into the
+    first or last page of the window. fetch is run off the event loop with
+    run_query.
+    """
 
-class ReportScreen(Screen):
-    TITLE = "Report"
+    BINDINGS = [
+        Binding("home", "scroll_top", "Top", show=False),
+        Binding("end", "scroll_bottom", "Bottom", show=False),
+    ]
+
+    def __init__(self, *args: any, page_size: int = PAGE_SIZE, **kwargs: any) -> None:
+        super().__init__(*args, **kwargs)
+        self.page_size = page_size
+        self.fetch = None
+        self.window = []
+        self.at_start = True
+        self.at_end = True
+        # NOTE: bumped whenever the window changes, so a page fetched for a
+        # window that has changed since is dropped.
+        self.generation = 0
+        self.paging = False
+
+    def redraw(self, row: int) -> None:
+        with metrics_timer("screen_draw", screen=type(self.screen).__name__):
+            self.clear()
+            self.add_rows(r for _, r in self.window)
+            self.move_cursor(row=row)
+
+    def replace(self, window: list, at_start: bool, at_end: bool, row: int) -> None:
+        self.generation += 1
+        self.window = window
+        self.at_start = at_start
+        self.at_end = at_end
+        self.redraw(row)
+
+    # NOTE: pages being fetched for the window being replaced are cancelled,
+    # which kills their queries.
+    def cancel_paging(self, *groups: str) -> None:
+        for group in groups:
+            self.workers.cancel_group(self, group)
+        self.paging = False
+
+    async def load(self, fetch: Callable[[tuple | None, int, bool], list]) -> None:
+        screen = type(self.screen).__name__
+        if METRICS is not None:
+
+            def timed(key: tuple | None, limit: int, reverse: bool) -> list:
+                with METRICS.timer("screen_fetch", {"screen": screen}):
+                    return fetch(key, limit, reverse)
+
+            self.fetch = timed
+        else:
+            self.fetch = fetch
+
+        self.cancel_paging("page", "jump")
+        with metrics_timer("screen_load", screen=screen):
+            window = await run_query(self.fetch, None, 2 * self.page_size, False)
+            self.replace(window, True, len(window) < 2 * self.page_size, 0)
+
+    def action_scroll_top(self) -> None:
+        if self.at_start:
+            super().action_scroll_top()
+        else:
+            self.jump(False)
+
+    def action_scroll_bottom(self) -> None:
+        if self.at_end:
+            super().action_scroll_bottom()
+        else:
+            self.jump(True)
+
+    @work(exclusive=True, group="jump")
+    async def jump(self, reverse: bool) -> None:
+        self.cancel_paging("page")
+        window = await run_query(self.fetch, None, 2 * self.page_size, reverse)
+        full = len(window) == 2 * self.page_size
+        if reverse:
+            self.replace(window, not full, True, len(window) - 1)
+        else:
+            self.replace(window, True, not full, 0)
+
+    # NOTE: brings the window up to date with rows added or changed since it was
+    # fetched, e.g. by a sync, without moving the cursor off the row it is on.
+    # only the window is fetched again, from the first row if it starts there
+    # and from its own first row otherwise.
+    @work(exclusive=True, group="jump")
+    async def patch(self) -> None:
+        if self.fetch is None:
+            return
+        self.cancel_paging("page")
+        row = self.cursor_row
+        current = self.window[row][0] if 0 <= row < len(self.window) else None
+        size = max(len(self.window), 2 * self.page_size)
+
+        if self.at_start:
+            window = await run_query(self.fetch, None, size, False)
+        else:
+            first = self.window[0]
+            window = [first] + await run_query(self.fetch, first[0], size - 1, False)
+        if window == self.window:
+            return
+
+        # NOTE: rows are matched by the last part of their key, which names the
+        # scrobble or track whatever its count or score is now.
+        keys = [k[-1] for k, _ in window]
+        if current is not None and current[-1] in keys:
+            row = keys.index(current[-1])
+        self.replace(
+            window, self.at_start, len(window) < size, max(0, min(row, len(window) - 1))
+        )
+
+    def on_data_table_row_highlighted(self, event: DataTable.RowHighlighted) -> None:
+        if not self.paging:
+            self.paging = True
+            self.fetch_pages()
+
+    @work(group="page")
+    async def fetch_pages(self) -> None:
+        try:
+            while await self.fetch_page():
+                pass
+        finally:
+            self.paging = False
+
+    # NOTE: fetches the page the cursor has moved into, if it needs one, and
+    # returns whether it did. redrawing posts highlights for rows the cursor
+    # has already left, and it may have moved on while the page was fetched,
+    # so always look at where the cursor is now.
+    async def fetch_page(self) -> bool:
+        row = self.cursor_row
+        generation = self.generation
+        limit = PAGED_TABLE_PAGES * self.page_size
+
+        if row >= len(self.window) - self.page_size and not self.at_end:
+            key = self.window[-1][0]
+            page = await run_query(self.fetch, key, self.page_size, False)
+            if generation != self.generation:
+                return True
+            self.at_end = len(page) < self.page_size
+            if len(page) == 0:
+                return False
+
+            window = self.window + page
+            drop = max(0, len(window) - limit)
+            if drop > 0:
+                window = window[drop:]
+            row = self.cursor_row - drop
+            self.replace(window, self.at_start and drop == 0, self.at_end, row)
+            return True
+
+        elif row < self.page_size and not self.at_start:
+            key = self.window[0][0]
+            page = await run_query(self.fetch, key, self.page_size, True)
+            if generation != self.generation:
+                return True
+            self.at_start = len(page) < self.page_size
+            if len(page) == 0:
+                return False
+
+            window = page + self.window
+            drop = max(0, len(window) - limit)
+            if drop > 0:
+                window = window[: len(window) - drop]
+            row = self.cursor_row + len(page)
+            self.replace(window, self.at_start, self.at_end and drop == 0, row)
+            return True
+
+        return False
+
+
+class PagedScreen(Screen):
+    """A screen of rows from fetch in a PagedTable that follows the filters
+    and the scrobbles synced.
+
+    A screen only reloads or patches its table while it is showing. One in
+    another mode remembers that it is behind and catches up when it is shown
+    again, so every mode shows the current filters and history whichever one
+    they were changed from.
+    """
 
     CSS = """
     #box {
@@ -735,71 +3811,177 @@ class ReportScreen(Screen):
     }
     """
 
+    # NOTE: "reload" or "patch" while the screen is behind, None when it isn't.
+    behind = None
+
     def compose(self) -> ComposeResult:
         yield Header()
-        yield Container(DataTable(cursor_type="row", zebra_stripes=True), id="box")
+        yield Container(PagedTable(cursor_type="row", zebra_stripes=True), id="box")
         yield Footer()
 
-    @work
-    async def load_scrobbles(self, table: DataTable) -> None:
-        for track, count in self.app.user.report(self.app.filters):
-            t = Content(track.name).truncate(48, ellipsis=True)
-            a = Content(track.artist.name).truncate(32, ellipsis=True)
-            table.add_row(count, t, a)
+    # NOTE: Screen's metaclass isn't ABCMeta, so the check is done here instead.
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        if getattr(cls.fetch, "__isabstractmethod__", False):
+            raise TypeError(f"{cls.__name__} doesn't define fetch")
+
+    @abstractmethod
+    def fetch(self, key: tuple | None, limit: int, reverse: bool) -> list: ...
+
+    @work(exclusive=True)
+    async def load_scrobbles(self, table: PagedTable) -> None:
+        await table.load(self.fetch)
         self.query_one("#box").loading = False
 
+    def reload(self) -> None:
+        self.behind = None
+        self.query_one("#box").loading = True
+        self.load_scrobbles(self.query_one(PagedTable))
+
+    def on_filters_change(self) -> None:
+        if self.is_current:
+            self.reload()
+        else:
+            self.behind = "reload"
+
+    def on_synced(self) -> None:
+        if self.is_current:
+            self.query_one(PagedTable).patch()
+        elif self.behind is None:
+            self.behind = "patch"
+
+    def on_screen_resume(self) -> None:
+        if self.behind == "reload":
+            self.reload()
+        elif self.behind == "patch":
+            self.behind = None
+            self.query_one(PagedTable).patch()
+
     def on_mount(self) -> None:
-        table = self.query_one(DataTable)
-        table.add_columns("Scrobble Count", "Track", "Artist")
+        self.watch(self.app, "filters", self.on_filters_change, init=False)
+        self.watch(self.app, "synced", self.on_synced, init=False)
+        self.reload()
+
 
-        def on_filter_change() -> None:
-            self.query_one("#box").loading = True
-            table.clear()
-            self.load_scrobbles(table)
+class ViewScreen(PagedScreen):
+    TITLE = "Scrobbles"
 
-        self.watch(self.app, "filters", on_filter_change)
-        on_filter_change()
+    def fetch(self, key: tuple | None, limit: int, reverse: bool) -> list:
+        return [
+            (
+                k,
+                (
+                    s.time,
+                    Content(s.track.name).truncate(48, ellipsis=True),
+                    Content(s.track.artist.name).truncate(32, ellipsis=True),
+                ),
+            )
+            for k, s in self.app.user.scrobble_page(
+                self.app.filters, key, limit, reverse
+            )
+        ]
 
+    # NOTE: runs before PagedScreen.on_mount loads the table.
+    def on_mount(self) -> None:
+        self.query_one(PagedTable).add_columns("Date", "Track", "Artist")
 
-class FindScreen(Screen):
-    TITLE = "Recommendations"
 
-    CSS = """
-    #box {
-        width: 100%;
-        height: 100%;
-    }
+class ReportScreen(PagedScreen):
+    TITLE = "Report"
 
-    DataTable {
-        width: 100%;
-        text-overflow: ellipsis;
-    }
-    """
+    BINDINGS = [
+        ("p", "cycle_period", "Period"),
+    ]
 
-    def compose(self) -> ComposeResult:
-        yield Header()
-        yield Container(DataTable(cursor_type="row", zebra_stripes=True), id="box")
-        yield Footer()
+    period = None
+
+    def fetch(self, key: tuple | None, limit: int, reverse: bool) -> list:
+        return [
+            (
+                k,
+                (
+                    count,
+                    Content(track.name).truncate(48, ellipsis=True),
+                    Content(track.artist.name).truncate(32, ellipsis=True),
+                ),
+            )
+            for k, (track, count) in self.app.user.report_page(
+                self.app.filters, key, limit, reverse, self.period
+            )
+        ]
 
-    @work
-    async def load_scrobbles(self, table: DataTable) -> None:
-        for s in self.app.user.find_tracks(self.app.filters):
-            track = Content(s.track.name).truncate(48, ellipsis=True)
-            artist = Content(s.track.artist.name).truncate(32, ellipsis=True)
-            table.add_row(s.time, track, artist)
-        self.query_one("#box").loading = False
+    def reload(self) -> None:
+        self.sub_title = f"This {self.period}" if self.period else "All Time"
+        super().reload()
+
+    def action_cycle_period(self) -> None:
+        i = REPORT_PERIODS.index(self.period)
+        self.period = REPORT_PERIODS[(i + 1) % len(REPORT_PERIODS)]
+        self.reload()
 
     def on_mount(self) -> None:
-        table = self.query_one(DataTable)
-        table.add_columns("Date", "Track", "Artist")
+        self.query_one(PagedTable).add_columns("Scrobble Count", "Track", "Artist")
+
+
+class FindScreen(PagedScreen):
+    TITLE = "Recommendations"
+
+    BINDINGS = [
+        ("d", "toggle_decayed", "Decay"),
+        ("n", "toggle_similar", "New"),
+    ]
+
+    decayed = True
+    similar = False
+
+    def fetch(self, key: tuple | None, limit: int, reverse: bool) -> list:
+        if self.similar:
+            return [
+                (
+                    k,
+                    (
+                        f"{score:.2f}",
+                        Content(track.name).truncate(48, ellipsis=True),
+                        Content(track.artist.name).truncate(32, ellipsis=True),
+                    ),
+                )
+                for k, (track, score) in self.app.user.similar_page(
+                    self.app.filters, key, limit, reverse
+                )
+            ]
+
+        return [
+            (
+                k,
+                (
+                    s.time,
+                    Content(s.track.name).truncate(48, ellipsis=True),
+                    Content(s.track.artist.name).truncate(32, ellipsis=True),
+                ),
+            )
+            for k, s in self.app.user.find_page(
+                self.app.filters, key, limit, reverse, self.decayed
+            )
+        ]
+
+    def reload(self) -> None:
+        table = self.query_one(PagedTable)
+        table.clear(columns=True)
+        if self.similar:
+            self.sub_title = "New to You"
+            table.add_columns("Score", "Track", "Artist")
+        else:
+            self.sub_title = "Scored Now" if self.decayed else "Scored at Last Play"
+            table.add_columns("Date", "Track", "Artist")
+        super().reload()
 
-        def on_filter_change() -> None:
-            self.query_one("#box").loading = True
-            table.clear()
-            self.load_scrobbles(table)
+    def action_toggle_decayed(self) -> None:
+        self.decayed = not self.decayed
+        self.reload()
 
-        self.watch(self.app, "filters", on_filter_change)
-        on_filter_change()
+    def action_toggle_similar(self) -> None:
+        self.similar = not self.similar
+        self.reload()
 
 
 class AdminScreen(Screen):
@@ -823,25 +4005,16 @@ class AdminScreen(Screen):
             yield DataTable(cursor_type="row", zebra_stripes=True)
         yield Footer()
 
+    @work(exclusive=True)
+    async def load_users(self, table: DataTable) -> None:
+        table.add_rows(await run_query(mysql_user_stats))
+        self.query_one("#box").loading = False
+
     def on_mount(self) -> None:
         table = self.query_one(DataTable)
         table.add_columns("User", "Admin", "Scrobbles")
-
-        with mysql_connection.cursor(dictionary=True) as cursor:
-            cursor.execute(
-                """
-                SELECT user_name,
-                       IF(user_admin, 'Admin', 'Client') AS user_status,
-                       COUNT(mbid) as user_scrobbles
-                FROM users LEFT JOIN scrobbles USING (user_name)
-                GROUP BY user_name
-                """
-            )
-
-            for row in cursor:
-                table.add_row(
-                    row["user_name"], row["user_status"], row["user_scrobbles"]
-                )
+        self.query_one("#box").loading = True
+        self.load_users(table)
 
 
 class Main(App):
@@ -862,7 +4035,7 @@ class Main(App):
 
     ADMIN_BINDINGS = []
 
-    SCREENS = {"filter": FilterScreen}
+    SCREENS = {"filter": FilterScreen, "stats": StatsScreen}
 
     MODES = {
         "view": ViewScreen,
@@ -871,32 +4044,80 @@ class Main(App):
     }
 
     filters = reactive([])
+    # NOTE: the number of scrobbles synced since login. the screens patch their
+    # tables whenever it goes up.
+    synced = reactive(0)
 
     @work
     async def on_mount(self) -> None:
+        if METRICS is not None:
+            self.bind("ctrl+s", "push_screen('stats')", description="Stats")
         self.user = await self.push_screen_wait(StartScreen())
         if self.user.admin:
             for k, a, d in self.CLIENT_BINDINGS:
                 self.bind(k, a, description=d)
             self.push_screen(AdminScreen())
         else:
-            await self.push_screen_wait(ImportScreen())
-            for k, a, d in self.CLIENT_BINDINGS:
-                self.bind(k, a, description=d)
-            self.switch_mode("view")
+            self.start_client()
+
+    # NOTE: the screens are shown straight away, served by MySQL until the
+    # history has been loaded into memory, and the history is synced in the
+    # background from then on.
+    def start_client(self) -> None:
+        for k, a, d in self.CLIENT_BINDINGS:
+            self.bind(k, a, description=d)
+        self.switch_mode("view")
+        self.sync_history()
+
+    @work(exclusive=True, group="sync")
+    async def sync_history(self) -> None:
+        await to_thread(TRACK_DURATIONS.load)
+        if COLUMN_STORE and np is not None:
+            store = ScrobbleStore(self.user.name)
+            await to_thread(store.refresh)
+            self.user.store = store
+        if RECOMMENDATIONS and np is not None:
+            await to_thread(RECOMMENDER.refresh)
+
+        try:
+            user = self.user.lastfm()
+        except pylast.PyLastError:
+            self.notify("Unable to reach Last.FM.", severity="error")
+            return
+
+        failing = False
+
+        async def on_sync(username: str, count: int) -> None:
+            nonlocal failing
+            failing = False
+            if RECOMMENDATIONS and np is not None:
+                await to_thread(RECOMMENDER.refresh)
+            self.synced += count
+
+        # NOTE: only the first of a run of failed syncs is reported.
+        async def on_error(username: str, e: Exception) -> None:
+            nonlocal failing
+            if not failing:
+                self.notify("Unable to reach Last.FM.", severity="error")
+            failing = True
+
+        await SyncService(user, self.user.store, on_sync, on_error).run()
 
 
 # ENTRY POINT
 # ------------------------------------------------------------------------------
 if __name__ == "__main__":
+    # NOTE: app.py export ... writes a file and app.py sync ... syncs every
+    # client instead of starting the UI.
+    export_args = sync_args = None
+    if sys.argv[1:2] == ["export"]:
+        export_args = export_parse(sys.argv[2:])
+    elif sys.argv[1:2] == ["sync"]:
+        sync_args = sync_parse(sys.argv[2:])
+
     try:
-        mysql_connection = mysql.connector.connect(
-            host="localhost",
-            user=CLIENT_DATABASE_USER,
-            port="3306",
-            password=CLIENT_DATABASE_PASSWORD,
-            database=DATABSE_NAME,
-        )
+        POOLS["read"].open()
+        POOLS["write"].open()
     except mysql.connector.Error as err:
         if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
             print(
@@ -909,15 +4130,24 @@ if __name__ == "__main__":
 
         sys.exit(1)
 
-    LASTFM_NETWORK = lastfm_init()
+    SCORE_HALF_LIFE = mysql_score_half_life()
+
+    if METRICS is not None:
+        metrics_start()
 
     try:
-        Main().run()
+        if export_args is not None:
+            export(export_args)
+        elif sync_args is not None:
+            with suppress(KeyboardInterrupt):
+                asyncio.run(sync_users(sync_args.once))
+        else:
+            Main().run()
     except Exception:
         print(
             "Something unexpected happened. Please contact support",
             file=sys.stderr,
         )
-
-    mysql_connection.commit()
-    mysql_connection.close()
+    finally:
+        if METRICS is not None:
+            metrics_export()
@@ -0,0 +1,2382 @@
+from __future__ import annotations
+
+from collections.abc import Generator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+from typing import Self
+
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import re
+import resource
+import shlex
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+import xml.dom.minidom
+
+import httpx
+import mysql.connector
+from textual import events, work
+from textual.app import App, ComposeResult
+
+import app
+import bootstrap
+
+
+# SETUP
+# ------------------------------------------------------------------------------
+BENCH_USER = "bench"
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sql")
+
+# NOTE: an admin connection for setting up and inspecting the database. the
+# code being measured goes through the pools in app as usual.
+db = None
+
+
+def connect() -> mysql.connector.MySQLConnection:
+    return mysql.connector.connect(
+        host="localhost",
+        user=app.ADMIN_DATABASE_USER,
+        port="3306",
+        password=app.ADMIN_DATABASE_PASSWORD,
+        database=app.DATABSE_NAME,
+        consume_results=True,
+        # NOTE: so reads here always see what app has committed since.
+        autocommit=True,
+    )
+
+
+def user_reset(username: str) -> None:
+    with db.cursor() as cursor:
+        cursor.execute("DELETE FROM users WHERE user_name = %s", (username,))
+        cursor.execute("CALL sp_user_create_client(%s, %s, NULL)", (username, username))
+    db.commit()
+
+
+def mbids_delete(entries: list[app.ImportEntry]) -> None:
+    mbids = set()
+    for e in entries:
+        mbids.update((e.artist_mbid, e.album_mbid, e.track_mbid))
+    mbids.discard(None)
+
+    with db.cursor() as cursor:
+        cursor.executemany(
+            "DELETE FROM mbids WHERE mbid = %s", [(app.mbid_bytes(m),) for m in mbids]
+        )
+    db.commit()
+
+
+def sql_statements(path: str) -> list[str]:
+    with open(path) as f:
+        text = re.sub(r"--.*", "", f.read())
+    return [stmt.strip() for stmt in text.split(";") if stmt.strip()]
+
+
+def sql_source(path: str) -> None:
+    with db.cursor() as cursor:
+        for stmt in sql_statements(path):
+            cursor.execute(stmt)
+    db.commit()
+
+
+def timed_median(fn: callable, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = perf_counter()
+        fn()
+        samples.append(perf_counter() - start)
+    return statistics.median(samples)
+
+
+def user_copy(source: str, username: str, scale: int) -> None:
+    with db.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT MAX(scrobble_time) - MIN(scrobble_time) + 1
+            FROM scrobbles WHERE user_name = %s
+            """,
+            (source,),
+        )
+        span = cursor.fetchone()[0] or 1
+
+        for i in range(scale):
+            cursor.execute(
+                """
+                INSERT INTO scrobbles (scrobble_time, mbid, user_name)
+                SELECT scrobble_time - %s, mbid, %s
+                FROM scrobbles WHERE user_name = %s
+                """,
+                (span * i, username, source),
+            )
+        cursor.execute(
+            """
+            INSERT INTO scores (user_name, mbid, last_access, last_crf)
+            SELECT %s, mbid, last_access, last_crf
+            FROM scores WHERE user_name = %s
+            """,
+            (username, source),
+        )
+    db.commit()
+
+
+# SYNTHETIC DATA
+# ------------------------------------------------------------------------------
+def synthetic_library(
+    track_count: int, rng: random.Random, name: callable | None = None
+) -> list[tuple]:
+    def mbid() -> str:
+        return str(uuid.UUID(int=rng.getrandbits(128)))
+
+    name = name or (lambda kind, i: f"{kind} {i}")
+    artists = [(name("artist", i), mbid()) for i in range(max(1, track_count // 10))]
+    albums = [
+        (name("album", i), mbid(), rng.choice(artists))
+        for i in range(max(1, track_count // 5))
+    ]
+    tracks = []
+    for i in range(track_count):
+        album, album_mbid, (artist, artist_mbid) = rng.choice(albums)
+        tracks.append(
+            (
+                artist,
+                artist_mbid,
+                album,
+                album_mbid,
+                name("track", i),
+                mbid(),
+                timedelta(seconds=rng.randint(90, 420)),
+            )
+        )
+    return tracks
+
+
+def synthetic_feed(count: int, track_count: int, seed: int) -> list[app.ImportEntry]:
+    rng = random.Random(seed)
+    tracks = synthetic_library(track_count, rng)
+
+    # NOTE: Last.FM reports scrobbles from most to least recent.
+    now = int(time.time())
+    return [app.ImportEntry(now - 180 * i, *rng.choice(tracks)) for i in range(count)]
+
+
+# NOTE: names are made of a few of these words so that filters match some of a
+# generated library and not the rest, as they would a real one.
+NAME_WORDS = """
+the love heart night world kenny blue fire rain dance home light dream river
+gold summer ghost city time song wild end young 1999 7
+""".split()
+
+# NOTE: the share of a generated user's scrobbles drawn from their own ranking
+# of the library rather than the one everyone shares.
+GENERATE_TASTE = 0.5
+GENERATE_PREFIX = "zipf"
+
+
+def synthetic_name(rng: random.Random) -> str:
+    return " ".join(rng.choices(NAME_WORDS, k=rng.randint(1, 4)))
+
+
+# NOTE: cumulative weights for picking the n-th most popular of count items
+# with probability proportional to 1 / n^exponent.
+def zipf_weights(count: int, exponent: float) -> list[float]:
+    return list(itertools.accumulate(n**-exponent for n in range(1, count + 1)))
+
+
+def generated_users() -> list[str]:
+    with db.cursor() as cursor:
+        cursor.execute(
+            "SELECT user_name FROM users WHERE user_name LIKE %s ORDER BY user_name",
+            (GENERATE_PREFIX + "%",),
+        )
+        return [name for (name,) in cursor]
+
+
+# NOTE: writes a library and histories for users to TSV files in the format of
+# bootstrap.py's snapshots and loads them on top of what the database holds.
+# track popularity follows a Zipf distribution and each user mixes it with
+# their own ranking of the library, so users overlap as real ones do.
+def generate(users: int, count: int, tracks: int, exponent: float, seed: int) -> None:
+    rng = random.Random(seed)
+    library = synthetic_library(tracks, rng, lambda kind, i: synthetic_name(rng))
+    weights = zipf_weights(len(library), exponent)
+    names = [f"{GENERATE_PREFIX}{i:03d}" for i in range(users)]
+
+    with db.cursor() as cursor:
+        for username in generated_users():
+            cursor.execute("DELETE FROM users WHERE user_name = %s", (username,))
+        for username in names:
+            cursor.execute(
+                "CALL sp_user_create_client(%s, %s, NULL)", (username, username)
+            )
+    db.commit()
+
+    with tempfile.TemporaryDirectory() as directory:
+
+        def table(name: str, header: str) -> any:
+            f = open(bootstrap.snapshot_path(directory, name), "w", encoding="utf-8")
+            f.write(header + "\n")
+            return f
+
+        start = perf_counter()
+        artists, albums = {}, {}
+        with (
+            table("mbids", "mbid\tmbid_name\tmbid_type") as mbids,
+            table("artists", "mbid") as artist_rows,
+            table("albums", "mbid\tartist") as album_rows,
+            table("tracks", "mbid\tartist\talbum\tlength") as track_rows,
+        ):
+            for artist, artist_mbid, album, album_mbid, track, mbid, length in library:
+                if artist_mbid not in artists:
+                    artists[artist_mbid] = artist
+                    mbids.write(f"{artist_mbid}\t{artist}\tartist\n")
+                    artist_rows.write(f"{artist_mbid}\n")
+                if album_mbid not in albums:
+                    albums[album_mbid] = album
+                    mbids.write(f"{album_mbid}\t{album}\talbum\n")
+                    album_rows.write(f"{album_mbid}\t{artist_mbid}\n")
+                mbids.write(f"{mbid}\t{track}\ttrack\n")
+                track_rows.write(f"{mbid}\t{artist_mbid}\t{album_mbid}\t{length}\n")
+
+        # NOTE: Last.FM reports at most a scrobble a second so times are kept
+        # distinct, a few minutes apart, going back from now.
+        now = int(time.time())
+        with table("scrobbles", "scrobble_time\tmbid\tuser_name") as scrobbles:
+            for i, username in enumerate(names):
+                ranking = library[:]
+                rng.shuffle(ranking)
+                at = now
+                for _ in range(count // users + (i < count % users)):
+                    source = ranking if rng.random() < GENERATE_TASTE else library
+                    track = rng.choices(source, cum_weights=weights)[0]
+                    scrobbles.write(f"{at}\t{track[5]}\t{username}\n")
+                    at -= rng.randint(120, 420)
+        print(f"wrote {count} scrobbles in {perf_counter() - start:.2f}s")
+
+        # NOTE: the triggers on these tables keep track_display and the play
+        # count rollups up to date, so they are loaded in order, one at a time.
+        for name in ["mbids", "artists", "albums", "tracks", "scrobbles"]:
+            start = perf_counter()
+            bootstrap.load_table(app.DATABSE_NAME, directory, name)
+            print(f"loaded {name:<10} {perf_counter() - start:8.2f}s")
+
+    start = perf_counter()
+    for username in names:
+        app.mysql_scores_rebuild(username)
+    print(f"rebuilt scores     {perf_counter() - start:8.2f}s")
+
+    start = perf_counter()
+    app.Recommender().refresh(full=True)
+    print(f"refreshed similar  {perf_counter() - start:8.2f}s")
+
+
+# FAKE LAST.FM
+# ------------------------------------------------------------------------------
+def xml_escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+# NOTE: the body Last.FM answers user.getRecentTracks with for the page of
+# entries params asks for.
+def recent_tracks_xml(name: str, entries: list[app.ImportEntry], params: dict) -> str:
+    since = int(params.get("from", 0))
+    until = int(params.get("to", 2**31))
+    limit = int(params.get("limit", 50))
+    page = int(params.get("page", 1))
+
+    entries = [e for e in entries if since <= e.time <= until]
+    total_pages = max(1, -(-len(entries) // limit))
+    tracks = "".join(
+        f"""<track>
+          <artist mbid="{e.artist_mbid}">{xml_escape(e.artist)}</artist>
+          <name>{xml_escape(e.track)}</name>
+          <mbid>{e.track_mbid}</mbid>
+          <album mbid="{e.album_mbid or ""}">{xml_escape(e.album or "")}</album>
+          <date uts="{e.time}"></date>
+        </track>"""
+        for e in entries[(page - 1) * limit : page * limit]
+    )
+    return f"""<lfm status="ok">
+      <recenttracks user="{xml_escape(name)}" page="{page}" perPage="{limit}"
+        totalPages="{total_pages}" total="{len(entries)}">{tracks}</recenttracks>
+    </lfm>"""
+
+
+TRACK_INFO_XML = '<lfm status="ok"><track><duration>180000</duration></track></lfm>'
+
+
+class FakeLastFMUser:
+    """Stands in for a pylast.User, serving a synthetic feed with a fixed
+    latency per request."""
+
+    ws_prefix = "user"
+
+    def __init__(
+        self,
+        name: str,
+        entries: list[app.ImportEntry],
+        latency: float,
+        log: str | None = None,
+    ) -> None:
+        self.name = name
+        self.entries = entries
+        self.latency = latency
+        self.requests = 0
+        # NOTE: the number of track.getInfo requests for each (artist, track).
+        self.track_requests = {}
+        # NOTE: a file the number of every page served is appended to.
+        self.log = log
+
+    def get_name(self) -> str:
+        return self.name
+
+    def _get_params(self) -> dict:
+        return {"user": self.name}
+
+    def _request(self, method: str, cacheable: bool, params: dict) -> any:
+        self.requests += 1
+        time.sleep(self.latency)
+
+        if self.log is not None:
+            with open(self.log, "a") as f:
+                f.write(f"{params.get('page', 1)}\n")
+
+        return xml.dom.minidom.parseString(
+            recent_tracks_xml(self.name, self.entries, params)
+        )
+
+    def track_info(self, artist: str, track: str) -> any:
+        self.requests += 1
+        key = (artist, track)
+        self.track_requests[key] = self.track_requests.get(key, 0) + 1
+        time.sleep(self.latency)
+        return xml.dom.minidom.parseString(TRACK_INFO_XML)
+
+
+class FakeLastFMHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        self.reply(dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(self.path).query)))
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.reply(dict(urllib.parse.parse_qsl(body.decode("utf-8"))))
+
+    def reply(self, params: dict) -> None:
+        status, body = self.server.respond(params)
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/xml; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: any) -> None:
+        pass
+
+
+class FakeLastFMServer(ThreadingHTTPServer):
+    """Serves user.getRecentTracks and track.getInfo for synthetic feeds over
+    HTTP on a local port, with a fixed latency per request and a share of the
+    requests failing as Last.FM does when it's overloaded."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        feeds: dict[str, list[app.ImportEntry]],
+        latency: float,
+        error_rate: float,
+        seed: int,
+    ) -> None:
+        super().__init__(("127.0.0.1", 0), FakeLastFMHandler)
+        self.feeds = feeds
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    @property
+    def host(self) -> str:
+        return f"127.0.0.1:{self.server_port}"
+
+    def respond(self, params: dict) -> tuple[int, str]:
+        with self.lock:
+            self.requests += 1
+            failed = self.rng.random() < self.error_rate
+            self.errors += failed
+            unavailable = self.rng.random() < 0.5
+        time.sleep(self.latency)
+
+        # NOTE: half of the failures are a 503 and half an error from the API,
+        # both of which the importer retries.
+        if failed and unavailable:
+            return 503, "Service Unavailable"
+        elif failed:
+            return 200, (
+                '<lfm status="failed">'
+                f'<error code="{app.pylast.STATUS_RATE_LIMIT_EXCEEDED}">'
+                "Rate Limit Exceeded</error></lfm>"
+            )
+
+        method = params.get("method", "").lower()
+        if method == "user.getrecenttracks" and params.get("user") in self.feeds:
+            name = params["user"]
+            return 200, recent_tracks_xml(name, self.feeds[name], params)
+        elif method == "track.getinfo":
+            return 200, TRACK_INFO_XML
+        else:
+            return 200, (
+                '<lfm status="failed">'
+                f'<error code="{app.pylast.STATUS_INVALID_PARAMS}">'
+                "Invalid parameters</error></lfm>"
+            )
+
+    def __enter__(self) -> Self:
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args: any) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class HTTPLastFMUser:
+    """Stands in for a pylast.User, requesting pages from a FakeLastFMServer
+    the way pylast does, over a new connection per request. Only TLS is left
+    out since pylast always connects over HTTPS."""
+
+    ws_prefix = "user"
+
+    def __init__(self, name: str, server: FakeLastFMServer) -> None:
+        self.name = name
+        self.server = server
+
+    def get_name(self) -> str:
+        return self.name
+
+    def _get_params(self) -> dict:
+        return {"user": self.name}
+
+    def post(self, params: dict) -> any:
+        pylast = app.pylast
+        with httpx.Client(base_url=f"http://{self.server.host}") as client:
+            response = client.post("/2.0/", data=params)
+
+        if response.status_code in (500, 502, 503, 504):
+            raise pylast.WSError(
+                None,
+                response.status_code,
+                f"Connection to the API failed with HTTP code {response.status_code}",
+            )
+        doc = xml.dom.minidom.parseString(response.content)
+        if doc.documentElement.getAttribute("status") != "ok":
+            error = doc.getElementsByTagName("error")[0]
+            raise pylast.WSError(
+                None, error.getAttribute("code"), error.firstChild.data.strip()
+            )
+        return doc
+
+    def _request(self, method: str, cacheable: bool, params: dict) -> any:
+        return self.post({"method": method} | params)
+
+    def track_info(self, artist: str, track: str) -> any:
+        return self.post({"method": "track.getInfo", "artist": artist, "track": track})
+
+
+# SCENARIOS
+# ------------------------------------------------------------------------------
+def ingest_per_row(username: str, entries: list[app.ImportEntry]) -> None:
+    for e in entries:
+        app.mysql_artist_add(e.artist_mbid, e.artist)
+        app.mysql_score_update(username, e.time, e.artist_mbid)
+
+        if e.album_mbid is not None:
+            app.mysql_album_add(e.album_mbid, e.album, e.artist_mbid)
+            app.mysql_score_update(username, e.time, e.album_mbid)
+
+        if e.track_mbid is not None and e.length:
+            app.mysql_track_add(
+                e.track_mbid, e.track, e.artist_mbid, e.album_mbid, e.length
+            )
+            app.mysql_score_update(username, e.time, e.track_mbid)
+            app.mysql_scrobble_add(username, e.time, e.track_mbid)
+
+
+def ingest_batched(
+    username: str, entries: list[app.ImportEntry], batch_size: int
+) -> None:
+    buffer = app.ImportBuffer(username, batch_size=batch_size)
+    for e in entries:
+        buffer.add(e)
+    buffer.flush()
+
+
+# NOTE: a scenario run as username with history, entries unless given, written
+# beforehand. the user and every MBID of entries are deleted when the block is
+# left, by a failed test too, so every scenario starts from the same tables.
+@contextmanager
+def scenario(
+    entries: list[app.ImportEntry],
+    history: list[app.ImportEntry] | None = None,
+    username: str = BENCH_USER,
+) -> Generator[app.User]:
+    user_reset(username)
+    try:
+        history = entries if history is None else history
+        if len(history) > 0:
+            ingest_batched(username, history, app.IMPORT_BATCH_SIZE)
+        yield app.User(username)
+    finally:
+        mbids_delete(entries)
+        with db.cursor() as cursor:
+            cursor.execute("DELETE FROM users WHERE user_name = %s", (username,))
+        db.commit()
+
+
+def bench_ingest(args: argparse.Namespace) -> None:
+    entries = synthetic_feed(args.count, args.tracks, args.seed)
+
+    paths = {
+        "per-row": ingest_per_row,
+        "batched": lambda u, e: ingest_batched(u, e, args.batch_size),
+    }
+    for name, ingest in paths.items():
+        with scenario(entries, []):
+            start = perf_counter()
+            ingest(BENCH_USER, entries)
+            elapsed = perf_counter() - start
+        print(f"{name:<10} {len(entries) / elapsed:10.1f} scrobbles/s")
+
+
+# NOTE: Last.FM is stubbed at track.getInfo, under LastFMFetcher, so every
+# request that would reach it is counted. the cache is measured on its own,
+# then through an import, and then restarted to import the same scrobbles again
+# with the lengths the first import stored.
+def bench_durations(args: argparse.Namespace) -> None:
+    # NOTE: one distinct track per ten scrobbles, i.e. ~90% repeats.
+    entries = synthetic_feed(args.count, max(1, args.count // 10), args.seed)
+    distinct = {e.track_mbid for e in entries}
+    # NOTE: lengths left behind by an earlier run would be found stored.
+    mbids_delete(entries)
+
+    fake = FakeLastFMUser(BENCH_USER, entries, args.latency)
+    app.lastfm_track_info = fake.track_info
+    app.LASTFM_FETCHER = app.LastFMFetcher(args.concurrency, rate=args.rate)
+
+    def requested() -> int:
+        return sum(fake.track_requests.values())
+
+    async def run(cache: app.DurationCache) -> None:
+        # NOTE: look up a batch at a time so repeats within a batch overlap.
+        for i in range(0, len(entries), args.batch_size):
+            await asyncio.gather(
+                *(
+                    cache.get(e.track_mbid, e.artist, e.track)
+                    for e in entries[i : i + args.batch_size]
+                )
+            )
+
+    async def noop(pages_done: int, total_pages: int) -> None:
+        pass
+
+    def report(
+        name: str, cache: app.DurationCache, before: int, elapsed: float
+    ) -> None:
+        print(
+            f"{name:<9} {len(entries)} scrobbles, {len(distinct)} tracks, "
+            f"{requested() - before} track.getInfo requests in {elapsed:.2f}s "
+            f"(hits={cache.hits} stored_hits={cache.stored_hits} "
+            f"coalesced={cache.coalesced} misses={cache.misses})"
+        )
+
+    def import_all(name: str) -> None:
+        before = requested()
+        app.TRACK_DURATIONS = app.DurationCache()
+        start = perf_counter()
+        app.TRACK_DURATIONS.load()
+        job = app.mysql_import_start(BENCH_USER, int(time.time()))
+        asyncio.run(
+            app.lastfm_import_scrobbles(fake, job, app.ImportBuffer(BENCH_USER), noop)
+        )
+        app.mysql_import_finish(job)
+        report(name, app.TRACK_DURATIONS, before, perf_counter() - start)
+
+    with scenario(entries, []):
+        cache = app.DurationCache()
+        cache.load()
+        start = perf_counter()
+        asyncio.run(run(cache))
+        report("lookups", cache, 0, perf_counter() - start)
+
+        import_all("import")
+        # NOTE: a restarted cache only has the tracks table to go on, which now
+        # holds every length, so neither the preload nor the import asks Last.FM.
+        user_reset(BENCH_USER)
+        import_all("restart")
+
+
+def bench_fetch(args: argparse.Namespace) -> None:
+    entries = synthetic_feed(args.count, args.tracks, args.seed)
+
+    async def noop(pages_done: int, total_pages: int) -> None:
+        pass
+
+    for concurrency in args.concurrency:
+        fake = FakeLastFMUser(BENCH_USER, entries, args.latency)
+        app.lastfm_track_info = fake.track_info
+        app.LASTFM_FETCHER = app.LastFMFetcher(concurrency, rate=args.rate)
+        app.TRACK_DURATIONS = app.DurationCache()
+
+        with scenario(entries, []):
+            buffer = app.ImportBuffer(BENCH_USER)
+            start = perf_counter()
+            job = app.mysql_import_start(BENCH_USER, int(time.time()))
+            asyncio.run(app.lastfm_import_scrobbles(fake, job, buffer, noop))
+            app.mysql_import_finish(job)
+            elapsed = perf_counter() - start
+
+        print(
+            f"concurrency={concurrency:<3} {len(entries) / elapsed:10.1f} scrobbles/s"
+            f" ({fake.requests} requests in {elapsed:.2f}s)"
+        )
+
+
+def bench_stream(args: argparse.Namespace) -> None:
+    entries = synthetic_feed(args.count, args.tracks, args.seed)
+
+    # NOTE: a single chunk as large as the history behaves like the old fully
+    # buffered path. run each mode in its own process for a fair peak RSS.
+    if args.buffered:
+        first = size = len(entries)
+    else:
+        first, size = app.STREAM_FIRST_CHUNK, app.STREAM_CHUNK
+
+    with scenario(entries) as user:
+        rows = 0
+        first_row = None
+
+        start = perf_counter()
+        for chunk in user.scrobble_chunks([], first, size):
+            if first_row is None:
+                first_row = perf_counter() - start
+            rows += len(chunk)
+        elapsed = perf_counter() - start
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    mode = "buffered" if args.buffered else "streamed"
+    print(
+        f"{mode}: {rows} rows, first row {first_row * 1000:.1f}ms, "
+        f"all rows {elapsed:.2f}s, peak RSS {peak:.1f}MiB"
+    )
+
+
+def bench_pages(args: argparse.Namespace) -> None:
+    entries = synthetic_feed(args.count, args.tracks, args.seed)
+    size = app.PAGE_SIZE
+
+    def timed(name: str, fetch: callable) -> list:
+        start = perf_counter()
+        page = fetch()
+        print(f"{name:<16} {(perf_counter() - start) * 1000:8.2f}ms")
+        return page
+
+    with scenario(entries) as user:
+        page = timed("top", lambda: user.scrobble_page([], None, 2 * size))
+        for _ in range(args.steps):
+            page = timed("next page", lambda: user.scrobble_page([], page[-1][0], size))
+        page = timed(
+            "jump to end", lambda: user.scrobble_page([], None, 2 * size, True)
+        )
+        for _ in range(args.steps):
+            page = timed(
+                "previous page", lambda: user.scrobble_page([], page[0][0], size, True)
+            )
+        timed("jump to top", lambda: user.scrobble_page([], None, 2 * size))
+
+
+QUERIES = {
+    "scrobbles": lambda user: sum(1 for _ in user.scrobbles([])),
+    "scrobble_page": lambda user: user.scrobble_page([], None, 2 * app.PAGE_SIZE),
+    "report": lambda user: sum(1 for _ in user.report([])),
+    "find_tracks": lambda user: sum(1 for _ in user.find_tracks([])),
+    "find_page": lambda user: user.find_page([], None, 2 * app.PAGE_SIZE),
+    "find_page stored": lambda user: user.find_page(
+        [], None, 2 * app.PAGE_SIZE, decayed=False
+    ),
+    "similar_page": lambda user: user.similar_page([], None, 2 * app.PAGE_SIZE),
+}
+
+INDEXES = {
+    "scrobbles": ["scrobbles_user_mbid"],
+    "scores": ["scores_user_crf", "scores_user_log_crf"],
+}
+
+
+def bench_indexes(args: argparse.Namespace) -> None:
+    with scenario([], []) as user:
+        user_copy(args.user, BENCH_USER, args.scale)
+
+        def run(label: str) -> None:
+            for name, query in QUERIES.items():
+                elapsed = timed_median(lambda: query(user), args.repeat)
+                print(f"{label:<8} {name:<14} {elapsed * 1000:10.2f}ms")
+
+        with db.cursor() as cursor:
+            for table, names in INDEXES.items():
+                for index in names:
+                    cursor.execute(f"DROP INDEX IF EXISTS {index} ON {table}")
+        run("before")
+
+        sql_source(os.path.join(SQL_DIR, "setup-indexes.sql"))
+        run("after")
+
+
+DISPLAY_COLUMNS = """
+    track, track_name, album, album_name, artist, artist_name, track_length
+"""
+
+
+def bench_display(args: argparse.Namespace) -> None:
+    def query(source: str) -> None:
+        with db.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT {DISPLAY_COLUMNS}, scrobble_time
+                FROM {source}
+                  JOIN scrobbles ON (mbid = track)
+                WHERE user_name = %s
+                ORDER BY scrobble_time DESC
+                """,
+                (args.user,),
+            )
+            cursor.fetchall()
+
+    for source in ("display_tracks", "track_display"):
+        elapsed = timed_median(lambda: query(source), args.repeat)
+        print(f"{source:<16} {elapsed * 1000:10.2f}ms")
+
+    start = perf_counter()
+    with db.cursor() as cursor:
+        cursor.execute("CALL sp_track_display_rebuild()")
+    db.commit()
+    print(f"rebuild          {(perf_counter() - start) * 1000:10.2f}ms")
+
+
+def bench_rollups(args: argparse.Namespace) -> None:
+    def raw_report() -> None:
+        with db.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT mbid, COUNT(*) AS scrobble_count
+                FROM scrobbles WHERE user_name = %s
+                GROUP BY mbid ORDER BY scrobble_count DESC
+                """,
+                (args.user,),
+            )
+            cursor.fetchall()
+
+    user = app.User(args.user)
+    for name, fn in {
+        "aggregate": raw_report,
+        "rollup": lambda: list(user.report([])),
+        "rollup month": lambda: list(user.report([], "month")),
+    }.items():
+        elapsed = timed_median(fn, args.repeat)
+        print(f"{name:<20} {elapsed * 1000:10.2f}ms")
+
+
+FILTER_SHAPES = [
+    "+album:world",
+    "+artist:kenny",
+    "+track:'^the'",
+    "+track:'love|heart'",
+    "+track:'[0-9]+'",
+    "+artist:'^[a-m]' +track:'e$'",
+]
+
+
+def bench_filters(args: argparse.Namespace) -> None:
+    start = perf_counter()
+    app.NAME_INDEX.load()
+    print(f"name index load {(perf_counter() - start) * 1000:.2f}ms")
+
+    with scenario([], []):
+        for scale in args.scale:
+            user_reset(BENCH_USER)
+            user_copy(args.user, BENCH_USER, scale)
+            user = app.User(BENCH_USER)
+
+            for shape in FILTER_SHAPES:
+                filters = app.Filter.parse(shape)
+                for pushdown in (False, True):
+                    app.FILTER_PUSHDOWN = pushdown
+                    elapsed = timed_median(
+                        lambda: sum(1 for _ in user.scrobbles(filters)), args.repeat
+                    )
+                    mode = "pushdown" if pushdown else "rlike"
+                    print(f"x{scale:<4} {mode:<9} {shape:<32} {elapsed * 1000:10.2f}ms")
+
+
+# NOTE: the screens in the order a user might switch between them.
+MODES = {
+    "view": lambda user, filters: user.scrobble_page(filters, None, 2 * app.PAGE_SIZE),
+    "report": lambda user, filters: user.report_page(filters, None, 2 * app.PAGE_SIZE),
+    "report month": lambda user, filters: user.report_page(
+        filters, None, 2 * app.PAGE_SIZE, False, "month"
+    ),
+    "find": lambda user, filters: user.find_page(filters, None, 2 * app.PAGE_SIZE),
+}
+
+
+def bench_columns(args: argparse.Namespace) -> None:
+    entries = synthetic_feed(args.count, args.tracks, args.seed)
+    with scenario(entries) as sql:
+        memory = app.User(BENCH_USER, store=app.ScrobbleStore(BENCH_USER))
+        start = perf_counter()
+        memory.store.refresh()
+        print(
+            f"store load {perf_counter() - start:.2f}s, {len(memory.store.times)} rows"
+        )
+
+        # NOTE: a mode switch after changing the filter is the worst case for the
+        # store since nothing for the new filter has been computed yet.
+        for shape in [""] + FILTER_SHAPES:
+            filters = app.Filter.parse(shape)
+            for mode, load in MODES.items():
+                sql_time = timed_median(lambda: load(sql, filters), args.repeat)
+
+                def cold() -> None:
+                    memory.store.masks.clear()
+                    memory.store.orderings.clear()
+                    load(memory, filters)
+
+                cold_time = timed_median(cold, args.repeat)
+                warm_time = timed_median(lambda: load(memory, filters), args.repeat)
+                print(
+                    f"{mode:<13} {shape:<32} sql {sql_time * 1000:8.2f}ms"
+                    f"  store {cold_time * 1000:8.2f}ms  warm {warm_time * 1000:8.2f}ms"
+                )
+
+
+# NOTE: switching back and forth between the modes and between two filters,
+# with the result cache off and on, and the pages an import leaves stale.
+def bench_cache(args: argparse.Namespace) -> None:
+    entries = synthetic_feed(args.count + args.added, args.tracks, args.seed)
+    with scenario(entries, entries[args.added :]) as user:
+        if args.store:
+            user.store = app.ScrobbleStore(BENCH_USER)
+            user.store.refresh()
+        shapes = ["", "+track:'^track 1'"]
+
+        def switch() -> list:
+            pages = []
+            for _ in range(args.rounds):
+                for shape in shapes:
+                    filters = app.Filter.parse(shape)
+                    for load in MODES.values():
+                        pages.append(load(user, filters))
+            return pages
+
+        switches = args.rounds * len(shapes) * len(MODES)
+        for capacity in (0, args.capacity):
+            app.RESULT_CACHE = app.ResultCache(capacity)
+            start = perf_counter()
+            switch()
+            elapsed = perf_counter() - start
+            cache = app.RESULT_CACHE
+            lookups = cache.hits + cache.misses + cache.stale
+            print(
+                f"cache {'on ' if capacity else 'off'} {switches} switches"
+                f" {elapsed * 1000 / switches:8.2f}ms each"
+                f"  hit rate {cache.hits / max(1, lookups):6.1%}"
+                f"  {cache.size / 1024:8.0f}KiB in {len(cache.pages)} pages"
+                f"  ({cache.evictions} evicted)"
+            )
+
+        buffer = app.ImportBuffer(BENCH_USER, store=user.store)
+        for e in entries[: args.added]:
+            buffer.add(e)
+        buffer.flush()
+        switch()
+        print(f"stale pages dropped after the import: {app.RESULT_CACHE.stale}")
+
+
+def scores_snapshot(username: str) -> dict[str, tuple[int, float, float]]:
+    with db.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT mbid, last_access, last_crf, log_crf
+            FROM scores WHERE user_name = %s
+            """,
+            (username,),
+        )
+        return {app.mbid_text(mbid): rest for mbid, *rest in cursor}
+
+
+def bench_scores(args: argparse.Namespace) -> None:
+    entries = synthetic_feed(args.count, args.tracks, args.seed)
+    with scenario(entries) as user:
+        for decayed in (False, True):
+            elapsed = timed_median(
+                lambda: user.find_page([], None, 2 * app.PAGE_SIZE, decayed=decayed),
+                args.repeat,
+            )
+            print(f"find_page decayed={decayed!s:<5} {elapsed * 1000:10.2f}ms")
+
+        elapsed = timed_median(
+            lambda: app.mysql_scores_rebuild(BENCH_USER), args.repeat
+        )
+        print(f"rebuild {len(entries)} scrobbles {elapsed:10.2f}s")
+
+
+def bench_similar(args: argparse.Namespace) -> None:
+    # NOTE: each user mostly plays tracks from one of a few clusters so a good
+    # recommendation is an unplayed track from their own cluster.
+    rng = random.Random(args.seed)
+    library = synthetic_library(args.tracks, rng)
+    clusters = [library[i :: args.clusters] for i in range(args.clusters)]
+
+    def feed(user: int, count: int, start: int) -> list[app.ImportEntry]:
+        cluster = clusters[user % args.clusters]
+        return [
+            app.ImportEntry(
+                start - 180 * i,
+                *rng.choice(cluster if rng.random() < 0.9 else library),
+            )
+            for i in range(count)
+        ]
+
+    users = [f"{BENCH_USER}{i}" for i in range(args.users)]
+    now = int(time.time())
+    entries = []
+    with ExitStack() as stack:
+        for i, username in enumerate(users):
+            history = feed(i, args.count, now - 86400)
+            stack.enter_context(scenario(history, username=username))
+            entries += history
+        print(f"{len(users)} users, {len(entries)} scrobbles, {len(library)} tracks")
+
+        recommender = app.Recommender()
+        start = perf_counter()
+        recommender.refresh(full=True)
+        print(f"full refresh        {perf_counter() - start:10.2f}s")
+
+        hits = total = 0
+        for i, username in enumerate(users):
+            cluster = {t[5] for t in clusters[i % args.clusters]}
+            for _, (track, _) in app.User(username).similar_page([], None, args.top):
+                hits += app.mbid_text(track.mbid) in cluster
+                total += 1
+        print(f"recommendations from the user's own cluster {hits / max(1, total):.1%}")
+
+        batch = feed(0, args.batch, now)
+        stack.callback(mbids_delete, batch)
+        ingest_batched(users[0], batch, app.IMPORT_BATCH_SIZE)
+
+        start = perf_counter()
+        recommender.refresh()
+        print(
+            f"incremental refresh {perf_counter() - start:10.2f}s"
+            f" ({len(batch)} scrobbles)"
+        )
+
+    recommender.refresh(full=True)
+
+
+# NOTE: screens read while an import writes. with shared set both pools are
+# replaced by a single connection, as before there were pools, so reads have
+# to wait for the import's batches to commit.
+def bench_concurrency(args: argparse.Namespace) -> None:
+    entries = synthetic_feed(args.count + args.import_count, args.tracks, args.seed)
+    history, incoming = entries[: args.count], entries[args.count :]
+    with scenario(entries, history) as user:
+        if args.shared:
+            shared = app.ConnectionPool(
+                "shared", app.WRITER_DATABASE_USER, app.WRITER_DATABASE_PASSWORD, 1
+            )
+            app.POOLS["read"] = app.POOLS["write"] = shared
+
+        def measure(done: callable) -> dict[str, list[float]]:
+            samples = {name: [] for name in MODES}
+            while len(samples["view"]) < args.rounds or not done():
+                for name, fetch in MODES.items():
+                    start = perf_counter()
+                    fetch(user, [])
+                    samples[name].append(perf_counter() - start)
+            return samples
+
+        def percentiles(samples: list[float]) -> str:
+            cuts = statistics.quantiles(samples, n=20)
+            return f"p50 {cuts[9] * 1000:8.2f}ms p95 {cuts[18] * 1000:8.2f}ms"
+
+        idle = measure(lambda: True)
+        with ThreadPoolExecutor(1) as executor:
+            start = perf_counter()
+            importing = executor.submit(
+                ingest_batched, BENCH_USER, incoming, args.batch_size
+            )
+            busy = measure(importing.done)
+            importing.result()
+            elapsed = perf_counter() - start
+
+        for name in MODES:
+            print(
+                f"{name:<14} idle {percentiles(idle[name])}"
+                f" | importing {percentiles(busy[name])}"
+            )
+        print(
+            f"imported {len(incoming)} scrobbles in {elapsed:.2f}s"
+            f" alongside {len(busy['view'])} rounds of reads"
+        )
+
+
+# NOTE: each call checks out a connection and commits, as in the app, so the
+# difference between the modes is the parsing the server skips.
+PREPARED_CALLS = {
+    "sp_artist_add": lambda e: app.mysql_artist_add(e.artist_mbid, e.artist),
+    "sp_album_add": lambda e: app.mysql_album_add(e.album_mbid, e.album, e.artist_mbid),
+    "sp_track_add": lambda e: app.mysql_track_add(
+        e.track_mbid, e.track, e.artist_mbid, e.album_mbid, e.length
+    ),
+    "sp_score_update": lambda e: app.mysql_score_update(
+        BENCH_USER, e.time, e.track_mbid
+    ),
+    "sp_user_add_scrobble": lambda e: app.mysql_scrobble_add(
+        BENCH_USER, e.time, e.track_mbid
+    ),
+}
+
+
+def bench_prepared(args: argparse.Namespace) -> None:
+    entries = synthetic_feed(args.count, args.tracks, args.seed)
+    modes = {"text": False, "prepared": True}
+    rates = {}
+
+    for mode, prepared in modes.items():
+        app.PREPARED_STATEMENTS = prepared
+        with scenario(entries, []) as user:
+            for name, call in PREPARED_CALLS.items():
+                start = perf_counter()
+                for e in entries:
+                    call(e)
+                rates[mode, name] = len(entries) / (perf_counter() - start)
+
+            start = perf_counter()
+            for _ in range(args.repeat):
+                sum(1 for _ in user.scrobbles([]))
+            rates[mode, "User.scrobbles"] = args.repeat / (perf_counter() - start)
+
+    print(f"{'statement':<22} {'text/s':>10} {'prepared/s':>12}")
+    for name in [*PREPARED_CALLS, "User.scrobbles"]:
+        print(
+            f"{name:<22} {rates['text', name]:10.1f} {rates['prepared', name]:12.1f}"
+            f" ({rates['prepared', name] / rates['text', name]:.2f}x)"
+        )
+    print(f"{app.STATEMENTS.prepared} statements prepared")
+
+
+# NOTE: writes a copy of the snapshot in source to target with every user
+# repeated scale times, along with their scores and scrobbles.
+def snapshot_scale(source: str, target: str, scale: int) -> None:
+    os.makedirs(target, exist_ok=True)
+    for table in bootstrap.SNAPSHOT_TABLES:
+        with (
+            open(bootstrap.snapshot_path(source, table), encoding="utf-8") as f,
+            open(bootstrap.snapshot_path(target, table), "w", encoding="utf-8") as g,
+        ):
+            header = f.readline()
+            g.write(header)
+            rows = [line.rstrip("\n").split("\t") for line in f]
+            columns = header.rstrip("\n").split("\t")
+            if "user_name" not in columns:
+                g.writelines("\t".join(row) + "\n" for row in rows)
+                continue
+
+            user = columns.index("user_name")
+            scrobble = columns.index("scrobble_id") if table == "scrobbles" else None
+            if scrobble is not None:
+                offset = 1 + max((int(row[scrobble]) for row in rows), default=0)
+            for i in range(scale):
+                for row in rows:
+                    row = list(row)
+                    if i > 0:
+                        row[user] = f"{row[user]}~{i}"
+                    if scrobble is not None:
+                        row[scrobble] = str(int(row[scrobble]) + offset * i)
+                    g.write("\t".join(row) + "\n")
+
+
+def table_counts(database: str) -> dict[str, int]:
+    return {
+        table: int(bootstrap.mysql(database, f"SELECT COUNT(*) FROM `{table}`"))
+        for table in bootstrap.SNAPSHOT_TABLES
+    }
+
+
+# NOTE: compares sourcing a mysqldump, which is how the database used to be
+# set up, against creating the schema and restoring a snapshot, in a scratch
+# database. the dump is taken from the restored database so both hold the
+# same rows.
+MYSQLDUMP = shlex.split(os.getenv("MYSQLDUMP", "mysqldump -u root"))
+
+
+def bench_bootstrap(args: argparse.Namespace) -> None:
+    scratch = f"{app.DATABSE_NAME}_bootstrap"
+    schema = os.path.join(SQL_DIR, "setup.sql")
+
+    def recreate() -> None:
+        bootstrap.mysql(
+            None,
+            f"""
+            DROP DATABASE IF EXISTS `{scratch}`;
+            CREATE DATABASE `{scratch}`
+              DEFAULT CHARSET = utf8mb4 DEFAULT COLLATE = utf8mb4_unicode_ci;
+            """,
+        )
+
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in args.scale:
+            snapshot = os.path.join(directory, f"x{scale}")
+            snapshot_scale(bootstrap.SNAPSHOT_DIR, snapshot, scale)
+
+            recreate()
+            start = perf_counter()
+            bootstrap.mysql(scratch, f"SOURCE {schema}")
+            timings = bootstrap.restore(scratch, snapshot, args.jobs)
+            restored = perf_counter() - start
+            expected = table_counts(scratch)
+
+            dump = os.path.join(directory, f"x{scale}.sql")
+            with open(dump, "w") as f:
+                subprocess.run([*MYSQLDUMP, scratch], stdout=f, check=True)
+
+            recreate()
+            start = perf_counter()
+            with open(dump) as f:
+                subprocess.run([*bootstrap.MYSQL, scratch], stdin=f, check=True)
+            sourced = perf_counter() - start
+
+            steps = ", ".join(f"{k} {v:.2f}s" for k, v in timings.items())
+            print(
+                f"x{scale:<4} {sum(expected.values()):>9} rows"
+                f" mysqldump {sourced:8.2f}s snapshot {restored:8.2f}s"
+                f" ({sourced / restored:.1f}x) [{steps}]"
+            )
+
+    bootstrap.mysql(None, f"DROP DATABASE IF EXISTS `{scratch}`")
+
+
+# NOTE: compares MBIDs stored as CHAR(36), as they used to be, against
+# BINARY(16) in two scratch databases restored from the same scaled snapshot:
+# the size on disk of the tables holding MBIDs, with their indexes, and the
+# time to run joins over them. the old schema is the sql/ scripts with every
+# BINARY(16) turned back into a CHAR(36).
+MBID_SETUP = [
+    "setup.sql",
+    "setup-views.sql",
+    "setup-routines.sql",
+    "setup-passwords.sql",
+    "setup-partitions.sql",
+]
+MBID_DERIVED = [
+    "setup-scores.sql",
+    "setup-indexes.sql",
+    "setup-imports.sql",
+    "setup-versions.sql",
+    "setup-display.sql",
+    "setup-rollups.sql",
+    "setup-recommendations.sql",
+]
+MBID_TABLES = [
+    "mbids",
+    "artists",
+    "albums",
+    "tracks",
+    "scores",
+    "scrobbles",
+    "track_display",
+    "user_track_counts",
+]
+MBID_QUERIES = {
+    "display_tracks history": f"""
+        SELECT {DISPLAY_COLUMNS}, scrobble_time
+        FROM display_tracks
+          JOIN scrobbles ON (mbid = track)
+        WHERE user_name = %s
+        ORDER BY scrobble_time DESC
+    """,
+    "track_display history": f"""
+        SELECT {DISPLAY_COLUMNS}, scrobble_time
+        FROM track_display
+          JOIN scrobbles ON (mbid = track)
+        WHERE user_name = %s
+        ORDER BY scrobble_time DESC
+    """,
+    "report page": f"""
+        SELECT {DISPLAY_COLUMNS}, scrobble_count
+        FROM track_display
+          JOIN user_track_counts ON (mbid = track)
+        WHERE user_name = %s
+        ORDER BY scrobble_count DESC, mbid DESC
+        LIMIT {2 * app.PAGE_SIZE}
+    """,
+    "find page": f"""
+        SELECT {DISPLAY_COLUMNS}, last_access
+        FROM track_display
+          JOIN scores ON (mbid = track)
+        WHERE user_name = %s
+        ORDER BY log_crf ASC, mbid ASC
+        LIMIT {2 * app.PAGE_SIZE}
+    """,
+    "plays by artist": """
+        SELECT artist, COUNT(*)
+        FROM scrobbles
+          JOIN display_tracks ON (mbid = track)
+        WHERE user_name <> %s
+        GROUP BY artist
+    """,
+}
+
+
+MBID_SCRATCH = f"{app.DATABSE_NAME}_mbids"
+
+
+# NOTE: writes the sql/ scripts with MBIDs as CHAR(36) into directory and
+# returns the directory of the scripts for each MBID type.
+def mbid_schemas(directory: str) -> dict[str, str]:
+    schemas = {"CHAR(36)": os.path.join(directory, "char"), "BINARY(16)": SQL_DIR}
+    os.makedirs(schemas["CHAR(36)"])
+    for name in MBID_SETUP + MBID_DERIVED:
+        with open(os.path.join(SQL_DIR, name)) as f:
+            text = f.read().replace("BINARY(16)", "CHAR(36)")
+        with open(os.path.join(schemas["CHAR(36)"], name), "w") as f:
+            f.write(text)
+    return schemas
+
+
+# NOTE: recreates MBID_SCRATCH from the scripts in sql with snapshot restored
+# into it, and returns a connection to it.
+def mbid_restore(sql: str, snapshot: str, jobs: int) -> mysql.connector.MySQLConnection:
+    bootstrap.mysql(
+        None,
+        f"""
+        DROP DATABASE IF EXISTS `{MBID_SCRATCH}`;
+        CREATE DATABASE `{MBID_SCRATCH}`
+          DEFAULT CHARSET = utf8mb4 DEFAULT COLLATE = utf8mb4_unicode_ci;
+        """,
+    )
+    bootstrap.mysql(
+        MBID_SCRATCH,
+        "\n".join(f"SOURCE {os.path.join(sql, n)};" for n in MBID_SETUP),
+    )
+    bootstrap.restore(MBID_SCRATCH, snapshot, jobs)
+    bootstrap.mysql(
+        MBID_SCRATCH,
+        "\n".join(f"SOURCE {os.path.join(sql, n)};" for n in MBID_DERIVED),
+    )
+    bootstrap.mysql(MBID_SCRATCH, f"ANALYZE TABLE {', '.join(MBID_TABLES)}")
+
+    return mysql.connector.connect(
+        host="localhost",
+        user=app.ADMIN_DATABASE_USER,
+        port="3306",
+        password=app.ADMIN_DATABASE_PASSWORD,
+        database=MBID_SCRATCH,
+        consume_results=True,
+    )
+
+
+def bench_mbids(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        schemas = mbid_schemas(directory)
+        for scale in args.scale:
+            snapshot = os.path.join(directory, f"x{scale}")
+            snapshot_scale(bootstrap.SNAPSHOT_DIR, snapshot, scale)
+
+            sizes, timings = {}, {}
+            for label, sql in schemas.items():
+                connection = mbid_restore(sql, snapshot, args.jobs)
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"""
+                        SELECT TABLE_NAME, DATA_LENGTH, INDEX_LENGTH
+                        FROM information_schema.TABLES
+                        WHERE TABLE_SCHEMA = DATABASE()
+                          AND TABLE_NAME IN ({app.sql_placeholders(MBID_TABLES)})
+                        """,
+                        MBID_TABLES,
+                    )
+                    sizes[label] = {t: (d, i) for t, d, i in cursor}
+
+                    for name, query in MBID_QUERIES.items():
+
+                        def run() -> None:
+                            cursor.execute(query, (args.user,))
+                            cursor.fetchall()
+
+                        timings[label, name] = timed_median(run, args.repeat)
+                connection.close()
+                bootstrap.mysql(None, f"DROP DATABASE IF EXISTS `{MBID_SCRATCH}`")
+
+            print(f"x{scale}")
+            for table in MBID_TABLES:
+                (d0, i0), (d1, i1) = (sizes[label][table] for label in schemas)
+                print(
+                    f"  {table:<24} data {d0 / 2**20:9.1f}MiB -> {d1 / 2**20:9.1f}MiB"
+                    f" index {i0 / 2**20:9.1f}MiB -> {i1 / 2**20:9.1f}MiB"
+                    f" ({(d1 + i1) / max(1, d0 + i0):.2f}x)"
+                )
+            for name in MBID_QUERIES:
+                before, after = (timings[label, name] for label in schemas)
+                print(
+                    f"  {name:<24} {before * 1000:10.2f}ms -> {after * 1000:10.2f}ms"
+                    f" ({before / after:.2f}x faster)"
+                )
+
+
+# NOTE: compares the partitioned scrobbles against a copy laid out as it used to
+# be, keyed by scrobble_id with secondary indexes on the user, over the users
+# written by generate. per-user queries are timed for a sample of them and
+# the median reported with the partitions read. the scrobble page is bounded by
+# app.keyset as User.scrobble_page is.
+PARTITION_TABLE = "scrobbles_unpartitioned"
+PARTITION_QUERIES = {
+    "user first page": (
+        """
+        SELECT scrobble_time, scrobble_id, mbid FROM {table}
+        WHERE user_name = %(user)s
+        ORDER BY scrobble_time DESC, scrobble_id DESC
+        LIMIT 200
+        """,
+        None,
+    ),
+    "user middle page": (
+        """
+        SELECT scrobble_time, scrobble_id, mbid FROM {table}
+        WHERE user_name = %(user)s AND {keyset}
+        ORDER BY {order}
+        LIMIT 200
+        """,
+        None,
+    ),
+    "user count": (
+        "SELECT COUNT(*) FROM {table} WHERE user_name = %(user)s",
+        None,
+    ),
+    "user last day": (
+        """
+        SELECT scrobble_time, mbid FROM {table}
+        WHERE user_name = %(user)s AND scrobble_time BETWEEN %(day)s AND %(now)s
+        """,
+        86400,
+    ),
+    "user last 30 days": (
+        """
+        SELECT scrobble_time, mbid FROM {table}
+        WHERE user_name = %(user)s AND scrobble_time BETWEEN %(month)s AND %(now)s
+        """,
+        30 * 86400,
+    ),
+    "all last 30 days": (
+        """
+        SELECT mbid, COUNT(*) FROM {table}
+        WHERE scrobble_time BETWEEN %(month)s AND %(now)s
+        GROUP BY mbid
+        """,
+        30 * 86400,
+    ),
+    "all by user": (
+        "SELECT user_name, COUNT(*) FROM {table} GROUP BY user_name",
+        None,
+    ),
+}
+
+
+# NOTE: the parameters of PARTITION_QUERIES for user, whose history runs from
+# first to last, with now the latest scrobble of anyone.
+def partition_params(user: str, first: int, last: int, now: int) -> dict:
+    return {
+        "user": user,
+        "now": now,
+        "day": now - 86400,
+        "month": now - 30 * 86400,
+        "middle": (first + last) // 2,
+    }
+
+
+# NOTE: the key is made of integers so it is written into the statement.
+def partition_statement(query: str, table: str, params: dict) -> str:
+    condition, values, order = app.keyset(
+        ("scrobble_time", "scrobble_id"), (params["middle"], 0), True, False
+    )
+    return query.format(table=table, keyset=condition % values, order=order)
+
+
+def partitions_read(operation: str, params: dict) -> int:
+    with db.cursor(dictionary=True) as cursor:
+        cursor.execute("EXPLAIN PARTITIONS " + operation, params)
+        return len((cursor.fetchall()[0]["partitions"] or "").split(","))
+
+
+def bench_partitions(args: argparse.Namespace) -> None:
+    users = generated_users()
+    if len(users) == 0:
+        print("no generated users, run bench.py generate first", file=sys.stderr)
+        sys.exit(1)
+    sample = random.Random(args.seed).sample(users, min(args.sample, len(users)))
+
+    with db.cursor() as cursor:
+        start = perf_counter()
+        cursor.execute(f"DROP TABLE IF EXISTS {PARTITION_TABLE}")
+        cursor.execute(
+            f"""
+            CREATE TABLE {PARTITION_TABLE}
+              ( scrobble_id   INT         NOT NULL
+              , scrobble_time INT         NOT NULL
+              , mbid          BINARY(16)  NOT NULL
+              , user_name     VARCHAR(16) NOT NULL
+              , PRIMARY KEY (scrobble_id)
+              , INDEX (user_name, scrobble_time, scrobble_id, mbid)
+              , INDEX (user_name, mbid)
+              , INDEX (mbid)
+              )
+            """
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {PARTITION_TABLE}
+            SELECT scrobble_id, scrobble_time, mbid, user_name FROM scrobbles
+            """
+        )
+        cursor.execute(f"ANALYZE TABLE {PARTITION_TABLE}, scrobbles")
+        cursor.fetchall()
+        cursor.execute(f"SELECT COUNT(*) FROM {PARTITION_TABLE}")
+        (total,) = cursor.fetchone()
+        cursor.execute(
+            """
+            SELECT COUNT(*) FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'scrobbles'
+            """
+        )
+        (partitions,) = cursor.fetchone()
+        print(
+            f"copied {total} scrobbles in {perf_counter() - start:.2f}s,"
+            f" {partitions} partitions, {len(users)} users"
+        )
+
+        # NOTE: the times bounding each user's history, for the middle page.
+        cursor.execute(
+            f"""
+            SELECT user_name, MIN(scrobble_time), MAX(scrobble_time)
+            FROM scrobbles
+            WHERE user_name IN ({app.sql_placeholders(sample)})
+            GROUP BY user_name
+            """,
+            sample,
+        )
+        spans = {user: (first, last) for user, first, last in cursor}
+        now = max(last for _, last in spans.values())
+    params = {user: partition_params(user, *spans[user], now) for user in sample}
+
+    for name, (query, _) in PARTITION_QUERIES.items():
+        per_user = "%(user)s" in query
+        timings = {}
+        for table in (PARTITION_TABLE, "scrobbles"):
+            samples = []
+            for user in sample if per_user else sample[:1]:
+                operation = partition_statement(query, table, params[user])
+
+                def run() -> None:
+                    with db.cursor() as cursor:
+                        cursor.execute(operation, params[user])
+                        cursor.fetchall()
+
+                samples.append(timed_median(run, args.repeat))
+            timings[table] = statistics.median(samples)
+
+        operation = partition_statement(query, "scrobbles", params[sample[0]])
+        read = partitions_read(operation, params[sample[0]])
+
+        before, after = timings[PARTITION_TABLE], timings["scrobbles"]
+        print(
+            f"{name:<20} {before * 1000:10.2f}ms -> {after * 1000:10.2f}ms"
+            f" ({before / after:.2f}x faster, {read}/{partitions} partitions)"
+        )
+
+    with db.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {PARTITION_TABLE}")
+
+
+# NOTE: runs an import in a process of its own so it can be killed at any point,
+# as a crash or a closed terminal would.
+def resume_worker(
+    entries: list[app.ImportEntry], latency: float, batch_size: int, log: str
+) -> None:
+    fake = FakeLastFMUser(BENCH_USER, entries, latency, log)
+    app.lastfm_track_info = fake.track_info
+    app.SCORE_HALF_LIFE = app.mysql_score_half_life()
+    app.TRACK_DURATIONS.load()
+
+    async def noop(pages_done: int, total_pages: int) -> None:
+        pass
+
+    job = app.mysql_import_start(BENCH_USER, int(time.time()))
+    buffer = app.ImportBuffer(BENCH_USER, batch_size=batch_size)
+    asyncio.run(app.lastfm_import_scrobbles(fake, job, buffer, noop))
+    app.mysql_import_finish(job)
+
+
+def import_pages(username: str) -> set[int]:
+    with db.cursor() as cursor:
+        cursor.execute(
+            "SELECT page FROM import_pages WHERE user_name = %s", (username,)
+        )
+        return {page for (page,) in cursor}
+
+
+# NOTE: the pages a FakeLastFMUser logged as served. the last line may be cut
+# short by a kill.
+def served_pages(log: str) -> list[int]:
+    if not os.path.exists(log):
+        return []
+    with open(log) as f:
+        return [int(line) for line in f if line.endswith("\n")]
+
+
+# NOTE: runs an import of entries, killed after kill_after seconds unless it is
+# None, and returns whether it finished.
+def resume_run(
+    entries: list[app.ImportEntry],
+    latency: float,
+    batch_size: int,
+    log: str,
+    kill_after: float | None,
+) -> bool:
+    context = multiprocessing.get_context("spawn")
+    process = context.Process(
+        target=resume_worker, args=(entries, latency, batch_size, log)
+    )
+    process.start()
+    process.join(kill_after)
+    if process.is_alive():
+        process.kill()
+        process.join()
+        return False
+    if process.exitcode != 0:
+        raise RuntimeError(f"the import exited with {process.exitcode}")
+    return True
+
+
+# NOTE: imports entries for BENCH_USER, killed at up to kills random points
+# within elapsed seconds and resumed until it finishes. refetched counts the
+# pages fetched again after they were written. returns the runs, the pages
+# fetched and the pages refetched.
+def resume_until_finished(
+    entries: list[app.ImportEntry],
+    latency: float,
+    batch_size: int,
+    kills: int,
+    elapsed: float,
+    rng: random.Random,
+    directory: str,
+) -> tuple[int, int, int]:
+    runs = fetched = refetched = 0
+    for attempt in range(kills + 1):
+        written = import_pages(BENCH_USER)
+        log = os.path.join(directory, f"attempt-{attempt}")
+        kill_after = rng.uniform(0, elapsed) if attempt < kills else None
+        finished = resume_run(entries, latency, batch_size, log, kill_after)
+
+        pages = served_pages(log)
+        runs += 1
+        fetched += len(pages)
+        refetched += len(written.intersection(pages))
+        if finished:
+            break
+    return runs, fetched, refetched
+
+
+# NOTE: kills an import at random points and resumes it until it finishes,
+# reporting the pages fetched against an uninterrupted import of the same feed.
+def bench_resume(args: argparse.Namespace) -> None:
+    entries = synthetic_feed(args.count, args.tracks, args.seed)
+    rng = random.Random(args.seed)
+
+    with scenario(entries, []), tempfile.TemporaryDirectory() as directory:
+        reference = os.path.join(directory, "reference")
+        start = perf_counter()
+        resume_run(entries, args.latency, args.batch_size, reference, None)
+        elapsed = perf_counter() - start
+        total_pages = len(served_pages(reference))
+
+        user_reset(BENCH_USER)
+        runs, fetched, refetched = resume_until_finished(
+            entries,
+            args.latency,
+            args.batch_size,
+            args.kills,
+            elapsed,
+            rng,
+            directory,
+        )
+
+    print(
+        f"{runs} runs ({runs - 1} killed) fetched {fetched} pages"
+        f" for a feed of {total_pages} ({fetched - total_pages} lost to kills,"
+        f" {refetched} fetched again after being written)"
+    )
+
+
+# NOTE: run in a fresh interpreter so nothing is imported beforehand. exits as
+# soon as the StartScreen is up.
+STARTUP_SCRIPT = """
+import asyncio
+import app
+
+async def start() -> None:
+    async with app.Main().run_test() as pilot:
+        while not isinstance(pilot.app.screen, app.StartScreen):
+            await pilot.pause()
+
+asyncio.run(start())
+"""
+
+IMPORT_TIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+# NOTE: valid and invalid filters for timing Filter.parse. what they parse to is
+# checked in tests/test_filters.py.
+PARSE_CASES = [
+    "",
+    "+artist:Beatles",
+    "+artist:'^The ' +track:\"love\"",
+    "  +album: 'a\\'b'  ",
+    '+track:"it""s"',
+    "+track:love+album:x",
+    "+track:abc123",
+    "+genre:rock",
+    "+track:'unterminated",
+]
+
+
+def bench_startup(args: argparse.Namespace) -> None:
+    samples = []
+    for _ in range(args.repeat):
+        start = perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        samples.append(perf_counter() - start)
+
+    # NOTE: a module is listed after the modules it imports, indented one level
+    # further, so those app imports itself are the ones one level in since the
+    # last top level module.
+    imports, children, app_time = [], [], None
+    for line in result.stderr.splitlines():
+        if (match := IMPORT_TIME.match(line)) is None:
+            continue
+        _, cumulative, indent, module = match.groups()
+        if len(indent) > 0:
+            imports.append((len(indent), int(cumulative), module))
+            continue
+        if module == "app":
+            app_time = int(cumulative)
+            children = [(us, name) for depth, us, name in imports if depth == 2]
+        imports = []
+
+    startup = statistics.median(samples)
+    print(f"startup  {startup:8.3f}s median of {args.repeat} ({min(samples):.3f}s min)")
+    if app_time is not None:
+        heaviest = sorted(children, reverse=True)[:5]
+        print(
+            f"import app {app_time / 1000:8.1f}ms: "
+            + ", ".join(f"{module} {us / 1000:.1f}ms" for us, module in heaviest)
+        )
+
+    cases = PARSE_CASES * 1000
+    elapsed = timed_median(
+        lambda: [app.Filter.parse(case) for case in cases], args.repeat
+    )
+    parses = len(cases) / elapsed
+    print(f"Filter.parse {parses:10.1f} parses/s")
+
+
+# NOTE: the screens' reads with metrics off and on. with metrics off all that is
+# left of them are the helpers checking so, reported against the cheapest
+# statement they sit in front of.
+def bench_metrics(args: argparse.Namespace) -> None:
+    entries = synthetic_feed(args.count, args.tracks, args.seed)
+    with scenario(entries) as user:
+        metrics = app.METRICS
+
+        def workload() -> None:
+            for fetch in MODES.values():
+                fetch(user, [])
+            app.mysql_user_exists(BENCH_USER)
+
+        samples = {"off": [], "on": []}
+        enabled = app.Metrics()
+        for _ in range(args.repeat):
+            for mode, value in (("off", None), ("on", enabled)):
+                app.METRICS = value
+                start = perf_counter()
+                workload()
+                samples[mode].append(perf_counter() - start)
+        off, on = (statistics.median(samples[mode]) for mode in ("off", "on"))
+        print(
+            f"screens      off {off * 1000:8.2f}ms on {on * 1000:8.2f}ms"
+            f" ({(on / off - 1) * 100:+.1f}%)"
+        )
+
+        app.METRICS = None
+        calls = 100000
+        start = perf_counter()
+        for _ in range(calls):
+            with app.metrics_timer("bench"):
+                pass
+            app.metrics_count("bench")
+        guard = (perf_counter() - start) / calls
+        cheapest = timed_median(lambda: app.mysql_user_exists(BENCH_USER), args.repeat)
+        print(
+            f"off overhead {guard * 1e9:8.1f}ns per call"
+            f" vs {cheapest * 1e6:.1f}us for the cheapest statement"
+            f" ({guard / cheapest * 100:.3f}%)"
+        )
+        app.METRICS = metrics
+
+
+# NOTE: the peak RSS is of the whole process, so with the history exported a
+# format at a time it only grows if a format needs more memory than the ones
+# before it. bounded memory means it stays flat as --count grows.
+def bench_export(args: argparse.Namespace) -> None:
+    entries = synthetic_feed(args.count, args.tracks, args.seed)
+    # NOTE: a scrobble of each track is kept to delete the tracks after, so the
+    # feed isn't counted in the peak RSS.
+    tracks = list({e.track_mbid: e for e in entries}.values())
+    with scenario(tracks, []) as user:
+        ingest_batched(BENCH_USER, entries, app.IMPORT_BATCH_SIZE)
+        del entries
+
+        writers = {
+            "csv": app.export_csv,
+            "jsonl": app.export_jsonl,
+            "parquet": app.export_parquet,
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            for what in ("scrobbles", "report", "find"):
+                for name in args.formats:
+                    path = os.path.join(directory, f"{what}.{name}")
+                    start = perf_counter()
+                    with (
+                        open(path, "wb")
+                        if name == "parquet"
+                        else open(path, "w", newline="", encoding="utf-8")
+                    ) as f:
+                        columns, chunks = app.export_rows(user, what, [], None, True)
+                        count = writers[name](columns, chunks, f)
+                    elapsed = perf_counter() - start
+
+                    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+                    size = os.path.getsize(path) / 2**20
+                    print(
+                        f"{what:<10} {name:<8} {count / elapsed:12.1f} rows/s"
+                        f" {size:8.1f}MiB peak RSS {peak:.1f}MiB"
+                    )
+
+
+class ResponsiveApp(App):
+    """A screen with nothing but a PagedTable, counting how late each of its
+    frames is."""
+
+    def __init__(self, interval: float) -> None:
+        super().__init__()
+        self.interval = interval
+        self.gaps = []
+
+    def compose(self) -> ComposeResult:
+        yield app.PagedTable(cursor_type="row")
+
+    def tick(self) -> None:
+        now = perf_counter()
+        self.gaps.append(now - self.last)
+        self.last = now
+
+    def on_mount(self) -> None:
+        self.query_one(app.PagedTable).add_columns("Row")
+        self.last = perf_counter()
+        self.set_interval(self.interval, self.tick)
+
+    # NOTE: how screens loaded before run_query, with the query run on the
+    # event loop.
+    @work(exclusive=True)
+    async def load_blocking(self, fetch: callable) -> None:
+        table = self.query_one(app.PagedTable)
+        table.fetch = fetch
+        table.replace(fetch(None, 2 * table.page_size, False), True, True, 0)
+
+    @work(exclusive=True)
+    async def load(self, fetch: callable) -> None:
+        await self.query_one(app.PagedTable).load(fetch)
+
+
+# NOTE: frame timings while a screen loads a deliberately slow query, run on
+# the event loop as screens used to and with run_query, and the time until
+# reloading part way through kills the first query.
+def bench_responsive(args: argparse.Namespace) -> None:
+    finished = []
+
+    def slow(key: tuple | None, limit: int, reverse: bool) -> list:
+        start = perf_counter()
+        with (
+            app.mysql_read() as connection,
+            app.mysql_execute(connection, "SELECT SLEEP(%s)", (args.sleep,)) as cursor,
+        ):
+            cursor.fetchall()
+        finished.append(perf_counter() - start)
+        return [((0,), ("slow",))]
+
+    def fast(key: tuple | None, limit: int, reverse: bool) -> list:
+        return [((0,), ("fast",))]
+
+    async def run() -> None:
+        interval = 1 / args.fps
+        for mode in ("blocking", "run_query"):
+            responsive = ResponsiveApp(interval)
+            async with responsive.run_test():
+                await asyncio.sleep(0.2)
+                responsive.gaps.clear()
+                if mode == "blocking":
+                    responsive.load_blocking(slow)
+                else:
+                    responsive.load(slow)
+                await asyncio.sleep(args.sleep + 0.5)
+            gaps = sorted(responsive.gaps)
+            print(
+                f"{mode:<10} frames {len(gaps):5d} p99 gap"
+                f" {gaps[int(0.99 * (len(gaps) - 1))] * 1000:8.1f}ms"
+                f" max gap {gaps[-1] * 1000:8.1f}ms"
+            )
+
+        finished.clear()
+        responsive = ResponsiveApp(1 / args.fps)
+        async with responsive.run_test():
+            responsive.load(slow)
+            await asyncio.sleep(0.2)
+            responsive.load(fast)
+            start = perf_counter()
+            while len(finished) == 0 and perf_counter() - start < 2 * args.sleep:
+                await asyncio.sleep(0.01)
+        if len(finished) > 0:
+            print(f"reload     the first query ended after {finished[0]:.3f}s")
+
+    asyncio.run(run())
+
+
+class SyncApp(app.Main):
+    """The client as it is once user has logged in."""
+
+    def __init__(self, user: app.User) -> None:
+        super().__init__()
+        self.bench_user = user
+
+    # NOTE: stops Main.on_mount from asking for a login as well.
+    def on_mount(self, event: events.Mount) -> None:
+        event.prevent_default()
+        self.user = self.bench_user
+        self.start_client()
+
+
+# NOTE: starts the client for BENCH_USER with entries waiting on Last.FM and
+# returns the time to its first screen, the time until that screen shows the
+# newest of entries, or None if it didn't within timeout seconds, and the rows
+# it shows by then.
+async def sync_run(
+    entries: list[app.ImportEntry], timeout: float
+) -> tuple[float | None, float | None, list]:
+    newest = max((e.time for e in entries), default=None)
+    client = SyncApp(app.User(BENCH_USER))
+    start = perf_counter()
+    first = synced = None
+    async with client.run_test():
+        while perf_counter() - start < timeout:
+            screen = client.screen
+            if first is None and isinstance(screen, app.ViewScreen):
+                if screen.query_one(app.PagedTable).generation > 0:
+                    first = perf_counter() - start
+            if first is not None and newest is None:
+                break
+            if first is not None:
+                window = screen.query_one(app.PagedTable).window
+                if len(window) > 0 and window[0][0][0] == newest:
+                    synced = perf_counter() - start
+                    break
+            await asyncio.sleep(0.005)
+        shown = list(screen.query_one(app.PagedTable).window)
+    return first, synced, shown
+
+
+# NOTE: the time from starting the client to its first screen, for a history
+# that is behind Last.FM by each backlog, and until the screen is patched with
+# the newest scrobble. the backlog is synced after the screen is up so the
+# first shouldn't grow with it.
+def bench_sync(args: argparse.Namespace) -> None:
+    # NOTE: the client runs with the result cache on, as it does outside the
+    # benchmarks, so the patched screen also shows each sync invalidating it.
+    app.RESULT_CACHE = app.ResultCache()
+    for backlog in args.backlog:
+        entries = synthetic_feed(backlog, args.tracks, args.seed)
+        fake = FakeLastFMUser(BENCH_USER, entries, args.latency)
+        app.User.lastfm = lambda self: fake
+        app.lastfm_track_info = fake.track_info
+        app.LASTFM_FETCHER = app.LastFMFetcher(args.concurrency, rate=args.rate)
+        app.TRACK_DURATIONS = app.DurationCache()
+        with scenario(entries, []):
+            first, synced, shown = asyncio.run(sync_run(entries, args.timeout))
+
+        if first is None:
+            print(f"backlog={backlog:<8d} the first screen never loaded")
+            continue
+        line = f"backlog={backlog:<8d} first screen {first * 1000:8.1f}ms"
+        if backlog > 0 and synced is None:
+            print(f"{line}  not patched after {args.timeout}s")
+        elif backlog > 0:
+            print(f"{line}  patched after {synced:.2f}s ({len(shown)} rows shown)")
+        else:
+            print(line)
+
+
+def bench_generate(args: argparse.Namespace) -> None:
+    start = perf_counter()
+    generate(args.users, args.count, args.tracks, args.zipf, args.seed)
+    print(
+        f"generated {args.users} users, {args.count} scrobbles and {args.tracks}"
+        f" tracks in {perf_counter() - start:.2f}s"
+    )
+
+
+# NOTE: every way the screens read a user's history through User.
+SUITE_QUERIES = {
+    "scrobbles": lambda user, filters: sum(1 for _ in user.scrobbles(filters)),
+    "report": lambda user, filters: sum(1 for _ in user.report(filters)),
+    "report month": lambda user, filters: sum(1 for _ in user.report(filters, "month")),
+    "find_tracks": lambda user, filters: sum(1 for _ in user.find_tracks(filters)),
+    "scrobble_page": lambda user, filters: user.scrobble_page(
+        filters, None, 2 * app.PAGE_SIZE
+    ),
+    "scrobble_page end": lambda user, filters: user.scrobble_page(
+        filters, None, 2 * app.PAGE_SIZE, True
+    ),
+    "report_page": lambda user, filters: user.report_page(
+        filters, None, 2 * app.PAGE_SIZE
+    ),
+    "report_page month": lambda user, filters: user.report_page(
+        filters, None, 2 * app.PAGE_SIZE, False, "month"
+    ),
+    "find_page": lambda user, filters: user.find_page(filters, None, 2 * app.PAGE_SIZE),
+    "find_page stored": lambda user, filters: user.find_page(
+        filters, None, 2 * app.PAGE_SIZE, decayed=False
+    ),
+    "similar_page": lambda user, filters: user.similar_page(
+        filters, None, 2 * app.PAGE_SIZE
+    ),
+}
+
+SUITE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench-results")
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# NOTE: times an import from the stand-in Last.FM, every User query, filtering
+# and the admin screen against the users written by generate, and writes the
+# timings to a JSON file to compare with later runs. timings are in seconds.
+def bench_suite(args: argparse.Namespace) -> None:
+    users = generated_users()
+    if len(users) == 0:
+        print("no generated users, run bench.py generate first", file=sys.stderr)
+        sys.exit(1)
+
+    with db.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT user_name, COUNT(*) FROM scrobbles
+            WHERE user_name LIKE %s
+            GROUP BY user_name
+            """,
+            (GENERATE_PREFIX + "%",),
+        )
+        counts = dict(cursor)
+        cursor.execute("SELECT VERSION()")
+        (version,) = cursor.fetchone()
+
+    results = {}
+
+    def record(name: str, elapsed: float, detail: str = "") -> None:
+        results[name] = elapsed
+        print(f"{name:<40} {elapsed * 1000:10.2f}ms {detail}")
+
+    async def noop(pages_done: int, total_pages: int) -> None:
+        pass
+
+    entries = synthetic_feed(args.import_count, args.tracks, args.seed)
+    with FakeLastFMServer(
+        {BENCH_USER: entries}, args.latency, args.error_rate, args.seed
+    ) as server:
+        lastfm = HTTPLastFMUser(BENCH_USER, server)
+        app.lastfm_track_info = lastfm.track_info
+        app.LASTFM_FETCHER = app.LastFMFetcher(args.concurrency, rate=args.rate)
+        app.TRACK_DURATIONS = app.DurationCache()
+
+        with scenario(entries, []):
+            buffer = app.ImportBuffer(BENCH_USER)
+            start = perf_counter()
+            job = app.mysql_import_start(BENCH_USER, int(time.time()))
+            asyncio.run(app.lastfm_import_scrobbles(lastfm, job, buffer, noop))
+            app.mysql_import_finish(job)
+            record(
+                "ingest",
+                perf_counter() - start,
+                f"({server.requests} requests, {server.errors} failed)",
+            )
+
+    # NOTE: the median over users of each user's median time.
+    for name, query in SUITE_QUERIES.items():
+        samples = [
+            timed_median(lambda: query(app.User(username), []), args.repeat)
+            for username in users
+        ]
+        record(
+            f"query {name}", statistics.median(samples), f"(max {max(samples):.3f}s)"
+        )
+
+    start = perf_counter()
+    app.NAME_INDEX.load()
+    record("filter name index load", perf_counter() - start)
+
+    pushdown_default = app.FILTER_PUSHDOWN
+    heaviest = app.User(max(users, key=lambda u: counts.get(u, 0)))
+    for shape in FILTER_SHAPES:
+        filters = app.Filter.parse(shape)
+        for pushdown in (False, True):
+            app.FILTER_PUSHDOWN = pushdown
+            mode = "pushdown" if pushdown else "rlike"
+            for name in ("scrobbles", "scrobble_page"):
+                query = SUITE_QUERIES[name]
+                record(
+                    f"filter {mode} {name} {shape}",
+                    timed_median(lambda: query(heaviest, filters), args.repeat),
+                )
+    app.FILTER_PUSHDOWN = pushdown_default
+
+    record("admin stats", timed_median(app.mysql_user_stats, args.repeat))
+
+    output = args.output or os.path.join(
+        SUITE_DIR, f"suite-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(
+            {
+                "time": datetime.now().isoformat(timespec="seconds"),
+                "commit": git_commit(),
+                "python": sys.version.split()[0],
+                "server": version,
+                "users": len(users),
+                "scrobbles": sum(counts.values()),
+                "options": {
+                    k: v for k, v in vars(args).items() if k not in ("run", "output")
+                },
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"wrote {output}")
+
+
+# NOTE: compares the timings of two runs of the suite. a ratio above 1 means the
+# second run was slower.
+def bench_compare(args: argparse.Namespace) -> None:
+    runs = []
+    for path in (args.before, args.after):
+        with open(path) as f:
+            runs.append(json.load(f))
+    before, after = (run["results"] for run in runs)
+
+    for run, path in zip(runs, (args.before, args.after)):
+        print(
+            f"{path}: {run['commit'] or 'unknown commit'}, {run['users']} users,"
+            f" {run['scrobbles']} scrobbles"
+        )
+
+    slower = 0
+    for name in list(before) + [name for name in after if name not in before]:
+        if name not in before or name not in after:
+            print(f"{name:<40} only in {args.before if name in before else args.after}")
+            continue
+        ratio = after[name] / max(before[name], 1e-9)
+        flag = ""
+        if ratio > 1 + args.tolerance:
+            slower += 1
+            flag = " slower"
+        print(
+            f"{name:<40} {before[name] * 1000:10.2f}ms {after[name] * 1000:10.2f}ms"
+            f" {ratio:6.2f}x{flag}"
+        )
+
+    if args.fail and slower > 0:
+        sys.exit(1)
+
+
+# ENTRY POINT
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrobble Browser benchmarks")
+    parser.add_argument("--seed", type=int, default=121)
+    scenarios = parser.add_subparsers(dest="scenario", required=True)
+
+    ingest = scenarios.add_parser("ingest", help="per-row vs batched import")
+    ingest.add_argument("--count", type=int, default=10000)
+    ingest.add_argument("--tracks", type=int, default=1000)
+    ingest.add_argument("--batch-size", type=int, default=app.IMPORT_BATCH_SIZE)
+    ingest.set_defaults(run=bench_ingest)
+
+    durations = scenarios.add_parser("durations", help="track duration cache")
+    durations.add_argument("--count", type=int, default=10000)
+    durations.add_argument("--latency", type=float, default=0.01)
+    durations.add_argument("--batch-size", type=int, default=app.IMPORT_BATCH_SIZE)
+    durations.add_argument("--rate", type=float, default=1000)
+    durations.add_argument("--concurrency", type=int, default=app.LASTFM_CONCURRENCY)
+    durations.set_defaults(run=bench_durations)
+
+    fetch = scenarios.add_parser("fetch", help="import against a slow Last.FM")
+    fetch.add_argument("--count", type=int, default=5000)
+    fetch.add_argument("--tracks", type=int, default=500)
+    fetch.add_argument("--latency", type=float, default=0.05)
+    fetch.add_argument("--rate", type=float, default=1000)
+    fetch.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    fetch.set_defaults(run=bench_fetch)
+
+    stream = scenarios.add_parser("stream", help="time to first scrobble row")
+    stream.add_argument("--count", type=int, default=100000)
+    stream.add_argument("--tracks", type=int, default=5000)
+    stream.add_argument("--buffered", action="store_true")
+    stream.set_defaults(run=bench_stream)
+
+    pages = scenarios.add_parser("pages", help="keyset paging latency")
+    pages.add_argument("--count", type=int, default=1000000)
+    pages.add_argument("--tracks", type=int, default=20000)
+    pages.add_argument("--steps", type=int, default=5)
+    pages.set_defaults(run=bench_pages)
+
+    indexes = scenarios.add_parser("indexes", help="query latency by index")
+    indexes.add_argument("--user", default="emekoi")
+    indexes.add_argument("--scale", type=int, default=10)
+    indexes.add_argument("--repeat", type=int, default=5)
+    indexes.set_defaults(run=bench_indexes)
+
+    display = scenarios.add_parser("display", help="time track_display")
+    display.add_argument("--user", default="emekoi")
+    display.add_argument("--repeat", type=int, default=5)
+    display.set_defaults(run=bench_display)
+
+    rollups = scenarios.add_parser("rollups", help="time play counts")
+    rollups.add_argument("--user", default="emekoi")
+    rollups.add_argument("--repeat", type=int, default=5)
+    rollups.set_defaults(run=bench_rollups)
+
+    filters = scenarios.add_parser("filters", help="RLIKE vs name index filters")
+    filters.add_argument("--user", default="emekoi")
+    filters.add_argument("--scale", type=int, nargs="+", default=[1, 10])
+    filters.add_argument("--repeat", type=int, default=5)
+    filters.set_defaults(run=bench_filters)
+
+    columns = scenarios.add_parser("columns", help="time ScrobbleStore")
+    columns.add_argument("--count", type=int, default=1000000)
+    columns.add_argument("--tracks", type=int, default=20000)
+    columns.add_argument("--repeat", type=int, default=5)
+    columns.set_defaults(run=bench_columns)
+
+    cache = scenarios.add_parser("cache", help="mode and filter switching cache")
+    cache.add_argument("--count", type=int, default=100000)
+    cache.add_argument("--added", type=int, default=100)
+    cache.add_argument("--tracks", type=int, default=2000)
+    cache.add_argument("--rounds", type=int, default=10)
+    cache.add_argument("--capacity", type=int, default=app.RESULT_CACHE_BYTES)
+    cache.add_argument("--store", action="store_true")
+    cache.set_defaults(run=bench_cache)
+
+    scores = scenarios.add_parser("scores", help="time score rebuilds")
+    scores.add_argument("--count", type=int, default=1000000)
+    scores.add_argument("--tracks", type=int, default=20000)
+    scores.add_argument("--repeat", type=int, default=3)
+    scores.set_defaults(run=bench_scores)
+
+    similar = scenarios.add_parser("similar", help="time recommendations")
+    similar.add_argument("--users", type=int, default=20)
+    similar.add_argument("--count", type=int, default=20000)
+    similar.add_argument("--tracks", type=int, default=20000)
+    similar.add_argument("--clusters", type=int, default=5)
+    similar.add_argument("--batch", type=int, default=500)
+    similar.add_argument("--top", type=int, default=50)
+    similar.set_defaults(run=bench_similar)
+
+    concurrency = scenarios.add_parser(
+        "concurrency", help="read latency while an import runs"
+    )
+    concurrency.add_argument("--count", type=int, default=100000)
+    concurrency.add_argument("--import-count", type=int, default=50000)
+    concurrency.add_argument("--tracks", type=int, default=5000)
+    concurrency.add_argument("--batch-size", type=int, default=app.IMPORT_BATCH_SIZE)
+    concurrency.add_argument("--rounds", type=int, default=20)
+    concurrency.add_argument("--shared", action="store_true")
+    concurrency.set_defaults(run=bench_concurrency)
+
+    prepared = scenarios.add_parser(
+        "prepared", help="statements/s with and without preparing"
+    )
+    prepared.add_argument("--count", type=int, default=5000)
+    prepared.add_argument("--tracks", type=int, default=1000)
+    prepared.add_argument("--repeat", type=int, default=20)
+    prepared.set_defaults(run=bench_prepared)
+
+    bootstrap_bench = scenarios.add_parser(
+        "bootstrap", help="mysqldump vs snapshot restore"
+    )
+    bootstrap_bench.add_argument("--scale", type=int, nargs="+", default=[1, 100])
+    bootstrap_bench.add_argument("--jobs", type=int, default=4)
+    bootstrap_bench.set_defaults(run=bench_bootstrap)
+
+    mbids = scenarios.add_parser("mbids", help="CHAR(36) vs BINARY(16) MBIDs")
+    mbids.add_argument("--user", default="emekoi")
+    mbids.add_argument("--scale", type=int, nargs="+", default=[10, 100])
+    mbids.add_argument("--jobs", type=int, default=4)
+    mbids.add_argument("--repeat", type=int, default=5)
+    mbids.set_defaults(run=bench_mbids)
+
+    partitions = scenarios.add_parser(
+        "partitions", help="partitioned vs unpartitioned scrobbles"
+    )
+    partitions.add_argument("--sample", type=int, default=10)
+    partitions.add_argument("--repeat", type=int, default=5)
+    partitions.add_argument("--seed", type=int, default=0)
+    partitions.set_defaults(run=bench_partitions)
+
+    resume = scenarios.add_parser("resume", help="kill and resume an import")
+    resume.add_argument("--count", type=int, default=5000)
+    resume.add_argument("--tracks", type=int, default=500)
+    resume.add_argument("--latency", type=float, default=0.05)
+    resume.add_argument("--batch-size", type=int, default=app.IMPORT_BATCH_SIZE)
+    resume.add_argument("--kills", type=int, default=5)
+    resume.set_defaults(run=bench_resume)
+
+    startup = scenarios.add_parser(
+        "startup", help="time to the StartScreen and Filter.parse"
+    )
+    startup.add_argument("--repeat", type=int, default=5)
+    startup.set_defaults(run=bench_startup)
+
+    metrics = scenarios.add_parser("metrics", help="overhead of metrics on and off")
+    metrics.add_argument("--count", type=int, default=20000)
+    metrics.add_argument("--tracks", type=int, default=2000)
+    metrics.add_argument("--repeat", type=int, default=20)
+    metrics.set_defaults(run=bench_metrics)
+
+    export = scenarios.add_parser("export", help="export throughput by format")
+    export.add_argument("--count", type=int, default=1000000)
+    export.add_argument("--tracks", type=int, default=20000)
+    export.add_argument(
+        "--formats", nargs="+", choices=app.EXPORT_FORMATS, default=app.EXPORT_FORMATS
+    )
+    export.set_defaults(run=bench_export)
+
+    responsive = scenarios.add_parser(
+        "responsive", help="frame latency while a slow query runs"
+    )
+    responsive.add_argument("--sleep", type=float, default=3)
+    responsive.add_argument("--fps", type=float, default=60)
+    responsive.set_defaults(run=bench_responsive)
+
+    sync = scenarios.add_parser("sync", help="time to the first screen by sync backlog")
+    sync.add_argument("--backlog", type=int, nargs="+", default=[0, 1000, 10000])
+    sync.add_argument("--tracks", type=int, default=500)
+    sync.add_argument("--latency", type=float, default=0.05)
+    sync.add_argument("--rate", type=float, default=1000)
+    sync.add_argument("--concurrency", type=int, default=app.LASTFM_CONCURRENCY)
+    sync.add_argument("--timeout", type=float, default=120)
+    sync.set_defaults(run=bench_sync)
+
+    generate_command = scenarios.add_parser(
+        "generate", help="write synthetic users for the suite"
+    )
+    generate_command.add_argument("--users", type=int, default=10)
+    generate_command.add_argument("--count", type=int, default=1000000)
+    generate_command.add_argument("--tracks", type=int, default=50000)
+    generate_command.add_argument("--zipf", type=float, default=1.0)
+    generate_command.set_defaults(run=bench_generate)
+
+    suite = scenarios.add_parser(
+        "suite", help="time every query against generated users"
+    )
+    suite.add_argument("--import-count", type=int, default=5000)
+    suite.add_argument("--tracks", type=int, default=500)
+    suite.add_argument("--latency", type=float, default=0.05)
+    suite.add_argument("--error-rate", type=float, default=0.05)
+    suite.add_argument("--rate", type=float, default=1000)
+    suite.add_argument("--concurrency", type=int, default=app.LASTFM_CONCURRENCY)
+    suite.add_argument("--repeat", type=int, default=3)
+    suite.add_argument("--output")
+    suite.set_defaults(run=bench_suite)
+
+    compare = scenarios.add_parser("compare", help="compare two runs of the suite")
+    compare.add_argument("before")
+    compare.add_argument("after")
+    compare.add_argument("--tolerance", type=float, default=0.1)
+    compare.add_argument("--fail", action="store_true")
+    compare.set_defaults(run=bench_compare, offline=True)
+
+    args = parser.parse_args()
+
+    if getattr(args, "offline", False):
+        args.run(args)
+        sys.exit(0)
+
+    # NOTE: the scenarios time reads, which mustn't be answered from the cache
+    # but for the one measuring it.
+    app.RESULT_CACHE.capacity = 0
+
+    db = connect()
+    app.SCORE_HALF_LIFE = app.mysql_score_half_life()
+    try:
+        args.run(args)
+    finally:
+        db.close()
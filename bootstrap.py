@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+import argparse
+import os
+import re
+import shlex
+import subprocess
+import sys
+
+
+# SETUP
+# ------------------------------------------------------------------------------
+DATABASE_NAME = os.getenv("DATABASE_NAME")
+
+# NOTE: the client used to reach the server, logged in as a user that can
+# create tables and load files. the same one setup.sh uses by default.
+MYSQL = shlex.split(os.getenv("MYSQL", "mysql -u root"))
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# NOTE: the tables that can't be rebuilt from other tables. everything else is
+# derived from these by the sql/setup-*.sql scripts sourced after a restore.
+SNAPSHOT_TABLES = [
+    "mbids",
+    "artists",
+    "albums",
+    "tracks",
+    "users",
+    "scores",
+    "scrobbles",
+]
+
+BINARY_TYPES = {"binary", "varbinary", "tinyblob", "blob", "mediumblob", "longblob"}
+
+# NOTE: the escapes LOAD DATA expects by default, as SQL string literals.
+ESCAPES = [
+    (r"'\\'", r"'\\\\'"),
+    (r"'\0'", r"'\\0'"),
+    (r"'\t'", r"'\\t'"),
+    (r"'\n'", r"'\\n'"),
+    (r"'\r'", r"'\\r'"),
+]
+
+KEY_PATTERN = re.compile(
+    r"^\s*((?:UNIQUE |FULLTEXT |SPATIAL )?KEY `([^`]+)`.*?),?$", re.M
+)
+CONSTRAINT_PATTERN = re.compile(r"^\s*(CONSTRAINT `([^`]+)` FOREIGN KEY .*?),?$", re.M)
+AUTO_INCREMENT_PATTERN = re.compile(r"^\s*`([^`]+)` .*AUTO_INCREMENT", re.M)
+
+
+def mysql(
+    database: str | None,
+    statements: str,
+    *options: str,
+    stdout: any = subprocess.PIPE,
+) -> str | None:
+    command = [*MYSQL, "--batch", "--raw", "--skip-column-names", *options]
+    if database is not None:
+        command.append(database)
+    result = subprocess.run(
+        command,
+        input=statements,
+        stdout=stdout,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding="utf-8",
+        check=True,
+    )
+    return result.stdout
+
+
+def sql_string(value: str) -> str:
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def table_columns(database: str, table: str) -> list[tuple[str, str]]:
+    rows = mysql(
+        database,
+        f"""
+        SELECT COLUMN_NAME, DATA_TYPE
+        FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE()
+          AND TABLE_NAME = {sql_string(table)}
+        ORDER BY ORDINAL_POSITION
+        """,
+    )
+    return [tuple(line.split("\t")) for line in rows.splitlines()]
+
+
+def snapshot_path(directory: str, table: str) -> str:
+    return os.path.abspath(os.path.join(directory, f"{table}.tsv"))
+
+
+# EXPORT
+# ------------------------------------------------------------------------------
+# NOTE: a snapshot is a directory with a file per table. the first line of each
+# names its columns and every other line is a row in the format LOAD DATA reads
+# by default: tab separated, NULL as \N and special characters escaped with a
+# backslash. binary columns are written in hex.
+# NOTE: MBIDs are binary columns too, so older snapshots hold them as UUIDs.
+# the dashes are dropped when loading which leaves the same hex either way.
+def export_expression(column: str, data_type: str) -> str:
+    if data_type in BINARY_TYPES:
+        value = f"HEX(`{column}`)"
+    else:
+        value = f"`{column}`"
+        for char, escaped in ESCAPES:
+            value = f"REPLACE({value}, {char}, {escaped})"
+    return f"IFNULL({value}, '\\\\N')"
+
+
+def export_table(database: str, directory: str, table: str) -> None:
+    columns = table_columns(database, table)
+    select = ", ".join(export_expression(c, t) for c, t in columns)
+
+    with open(snapshot_path(directory, table), "w", encoding="utf-8") as f:
+        f.write("\t".join(c for c, _ in columns) + "\n")
+        f.flush()
+        mysql(database, f"SELECT {select} FROM `{table}`", stdout=f)
+
+
+def export(database: str, directory: str, jobs: int) -> None:
+    os.makedirs(directory, exist_ok=True)
+    with ThreadPoolExecutor(jobs) as executor:
+        list(
+            executor.map(
+                lambda table: export_table(database, directory, table),
+                SNAPSHOT_TABLES,
+            )
+        )
+
+
+# RESTORE
+# ------------------------------------------------------------------------------
+# NOTE: the secondary indexes and foreign keys of a table, as they would be
+# written in an ALTER TABLE, paired with their names. an index led by an
+# AUTO_INCREMENT column is left out since the table can't be without it.
+def table_keys(
+    database: str, table: str
+) -> tuple[list[tuple[str, str]], list[tuple[str, str]]]:
+    create = mysql(database, f"SHOW CREATE TABLE `{table}`")
+    indexes = KEY_PATTERN.findall(create)
+    for column in AUTO_INCREMENT_PATTERN.findall(create):
+        indexes = [(d, n) for d, n in indexes if f"(`{column}`" not in d]
+    return indexes, CONSTRAINT_PATTERN.findall(create)
+
+
+def load_table(database: str, directory: str, table: str) -> None:
+    path = snapshot_path(directory, table)
+    with open(path, encoding="utf-8") as f:
+        header = f.readline().rstrip("\n").split("\t")
+
+    # NOTE: columns are matched by name so a snapshot can be restored into a
+    # schema with columns added or dropped since. columns the table doesn't
+    # have are skipped and columns the snapshot doesn't have get defaults.
+    types = dict(table_columns(database, table))
+    targets, assignments = [], []
+    for column in header:
+        if column not in types:
+            targets.append("@skipped")
+        elif types[column] in BINARY_TYPES:
+            targets.append(f"@{column}")
+            assignments.append(f"`{column}` = UNHEX(REPLACE(@{column}, '-', ''))")
+        else:
+            targets.append(f"`{column}`")
+
+    mysql(
+        database,
+        f"""
+        SET foreign_key_checks = 0;
+        SET unique_checks = 0;
+        LOAD DATA LOCAL INFILE {sql_string(path)}
+        INTO TABLE `{table}`
+        CHARACTER SET utf8mb4
+        IGNORE 1 LINES
+        ({", ".join(targets)})
+        {"SET " + ", ".join(assignments) if assignments else ""};
+        """,
+        "--local-infile=1",
+    )
+
+
+# NOTE: loads a snapshot into the tables of database, replacing what they hold.
+# secondary indexes and foreign keys are dropped first so rows are only written
+# to the primary key while loading, then built in one pass per table after.
+# returns how long each step took.
+def restore(database: str, directory: str, jobs: int) -> dict[str, float]:
+    tables = [t for t in SNAPSHOT_TABLES if os.path.exists(snapshot_path(directory, t))]
+    keys = {table: table_keys(database, table) for table in tables}
+    timings = {}
+
+    start = perf_counter()
+    statements = ["SET foreign_key_checks = 0;"]
+    for table, (_, constraints) in keys.items():
+        for _, name in constraints:
+            statements.append(f"ALTER TABLE `{table}` DROP FOREIGN KEY `{name}`;")
+    for table, (indexes, _) in keys.items():
+        for _, name in indexes:
+            statements.append(f"ALTER TABLE `{table}` DROP KEY `{name}`;")
+        statements.append(f"TRUNCATE TABLE `{table}`;")
+    mysql(database, "\n".join(statements))
+    timings["drop keys"] = perf_counter() - start
+
+    start = perf_counter()
+    with ThreadPoolExecutor(jobs) as executor:
+        list(executor.map(lambda t: load_table(database, directory, t), tables))
+    timings["load"] = perf_counter() - start
+
+    def add_indexes(table: str) -> None:
+        indexes, _ = keys[table]
+        if len(indexes) > 0:
+            additions = ", ".join(f"ADD {definition}" for definition, _ in indexes)
+            mysql(database, f"ALTER TABLE `{table}` {additions};")
+
+    start = perf_counter()
+    with ThreadPoolExecutor(jobs) as executor:
+        list(executor.map(add_indexes, tables))
+    timings["add indexes"] = perf_counter() - start
+
+    # NOTE: the rows came from a consistent database so the foreign keys are
+    # added without checking them again.
+    start = perf_counter()
+    statements = ["SET foreign_key_checks = 0;"]
+    for table, (_, constraints) in keys.items():
+        if len(constraints) > 0:
+            additions = ", ".join(f"ADD {definition}" for definition, _ in constraints)
+            statements.append(f"ALTER TABLE `{table}` {additions};")
+    mysql(database, "\n".join(statements))
+    timings["add foreign keys"] = perf_counter() - start
+
+    return timings
+
+
+# ENTRY POINT
+# ------------------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrobble Browser snapshots")
+    parser.add_argument("--database", default=DATABASE_NAME)
+    parser.add_argument("--jobs", type=int, default=4)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_command = commands.add_parser("export", help="write a snapshot")
+    export_command.add_argument("directory", nargs="?", default=SNAPSHOT_DIR)
+
+    restore_command = commands.add_parser("restore", help="load a snapshot")
+    restore_command.add_argument("directory", nargs="?", default=SNAPSHOT_DIR)
+
+    args = parser.parse_args()
+    if args.database is None:
+        print("DATABASE_NAME is not set", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        if args.command == "export":
+            start = perf_counter()
+            export(args.database, args.directory, args.jobs)
+            print(f"exported in {perf_counter() - start:.2f}s")
+        else:
+            timings = restore(args.database, args.directory, args.jobs)
+            for step, elapsed in timings.items():
+                print(f"{step:<18} {elapsed:8.2f}s")
+    except subprocess.CalledProcessError as err:
+        print(
+            f"Failed to {args.command} snapshot: {err.stderr.strip()}", file=sys.stderr
+        )
+        sys.exit(1)
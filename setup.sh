@@ -3,30 +3,36 @@
 if [ $# -eq 0 ]; then
     cat <<EOF
 ${0}
-- setup   : set up a database called ${DATABASE_NAME}
-- backup  : backup ${DATABASE_NAME}
+- setup [snapshot] : set up a database called ${DATABASE_NAME} from snapshot
+                     (default data)
+- backup           : backup ${DATABASE_NAME}
+- snapshot         : replace the snapshot in data with ${DATABASE_NAME}
 EOF
     exit 1
 fi
 
 case "$1" in
 setup)
-    mysql -u root <<EOF
+    snapshot="${2:-data}"
+    mysql -u root <<EOF || exit 1
 DROP DATABASE IF EXISTS ${DATABASE_NAME};
 CREATE DATABASE ${DATABASE_NAME} DEFAULT CHARSET = utf8mb4 DEFAULT COLLATE = utf8mb4_unicode_ci;
 USE ${DATABASE_NAME};
 SOURCE sql/setup.sql;
-SOURCE sql/setup.sql;
 SOURCE sql/setup-views.sql;
 SOURCE sql/setup-routines.sql;
 SOURCE sql/setup-passwords.sql;
-
-CALL sp_user_create_admin('admin', 'admin');
-CALL sp_user_create_client('dummy1', 'dummy1', NULL);
-CALL sp_user_create_client('dummy2', 'dummy2', NULL);
-CALL sp_user_create_client('dummy3', 'dummy3', NULL);
-
-SOURCE sql/load-data.sql;
+SOURCE sql/setup-partitions.sql;
+EOF
+    python bootstrap.py restore "${snapshot}" || exit 1
+    mysql -u root "${DATABASE_NAME}" <<EOF
+SOURCE sql/setup-scores.sql;
+SOURCE sql/setup-indexes.sql;
+SOURCE sql/setup-imports.sql;
+SOURCE sql/setup-versions.sql;
+SOURCE sql/setup-display.sql;
+SOURCE sql/setup-rollups.sql;
+SOURCE sql/setup-recommendations.sql;
 SOURCE sql/grant-permissions.sql;
 SHOW WARNINGS;
 EOF
@@ -36,7 +42,11 @@ backup)
     mkdir -p backup
     suffix="$(date '+%Y%m%d-%H%M%S' | tr -d '\n')"
     mysqldump -u root --databases "${DATABASE_NAME}" >"backup/backup-${suffix}.sql"
-    cp "backup/backup-${suffix}.sql" "sql/load-data.sql"
+    python bootstrap.py export "backup/snapshot-${suffix}"
+    ;;
+
+snapshot)
+    python bootstrap.py export data
     ;;
 *) ;;
 esac
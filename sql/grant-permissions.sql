@@ -1,9 +1,32 @@
-DROP USER IF EXISTS 'admin'@'localhost', 'client'@'localhost';
+DROP USER IF EXISTS 'admin'@'localhost', 'client'@'localhost', 'writer'@'localhost';
 
 CREATE USER 'admin'@'localhost' IDENTIFIED BY 'admin';
 CREATE USER 'client'@'localhost' IDENTIFIED BY 'client';
+CREATE USER 'writer'@'localhost' IDENTIFIED BY 'writer';
 
 GRANT ALL PRIVILEGES ON * TO 'admin'@'localhost';
 GRANT SELECT ON * TO 'client'@'localhost';
 GRANT EXECUTE ON * TO 'client'@'localhost';
+
+-- NOTE: the client reads through 'client' and writes through 'writer', each
+-- from its own pool of connections.
+GRANT SELECT ON * TO 'writer'@'localhost';
+GRANT EXECUTE ON * TO 'writer'@'localhost';
+
+-- NOTE: the bulk import path writes batches directly instead of going through
+-- the per-row stored procedures.
+GRANT INSERT, UPDATE ON mbids TO 'writer'@'localhost';
+GRANT INSERT, UPDATE ON artists TO 'writer'@'localhost';
+GRANT INSERT, UPDATE ON albums TO 'writer'@'localhost';
+GRANT INSERT, UPDATE ON tracks TO 'writer'@'localhost';
+GRANT INSERT, UPDATE ON scores TO 'writer'@'localhost';
+GRANT INSERT ON scrobbles TO 'writer'@'localhost';
+GRANT UPDATE (user_last_update) ON users TO 'writer'@'localhost';
+GRANT INSERT, UPDATE, DELETE ON import_state TO 'writer'@'localhost';
+GRANT INSERT, DELETE ON import_pages TO 'writer'@'localhost';
+
+-- NOTE: neighbour lists are computed by the client after each import.
+GRANT INSERT, DELETE ON mbid_neighbours TO 'writer'@'localhost';
+GRANT UPDATE ON recommendation_state TO 'writer'@'localhost';
+GRANT DELETE ON recommendation_changes TO 'writer'@'localhost';
 FLUSH PRIVILEGES;
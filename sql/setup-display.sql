@@ -0,0 +1,110 @@
+-- DISPLAY NOTES
+-- 1. track_display is a materialized copy of the display_tracks view so the
+-- queries in app.py don't have to re-run its five-way join. It is kept
+-- current by triggers on tracks and albums, which covers both the stored
+-- procedures and the bulk import path.
+-- 2. Deletes cascade through the foreign key since cascaded deletes do not
+-- fire triggers.
+-- 3. This is applied after the snapshot is restored by bootstrap.py so the
+-- rows are loaded without firing the triggers.
+
+DROP TRIGGER IF EXISTS trg_tracks_insert;
+DROP TRIGGER IF EXISTS trg_tracks_update;
+DROP TRIGGER IF EXISTS trg_albums_insert;
+DROP PROCEDURE IF EXISTS sp_track_display_upsert;
+DROP PROCEDURE IF EXISTS sp_track_display_rebuild;
+DROP TABLE IF EXISTS track_display;
+
+-- A denormalized copy of display_tracks.
+CREATE TABLE track_display
+    -- INFO: The MBID of the track.
+  ( track        BINARY(16)   NOT NULL
+  , track_name   VARCHAR(256) NOT NULL
+    -- INFO: The MBID of the track's album if it is known for this artist.
+  , album        BINARY(16)
+  , album_name   VARCHAR(256)
+    -- INFO: The MBID of the track's artist.
+  , artist       BINARY(16)   NOT NULL
+  , artist_name  VARCHAR(256) NOT NULL
+  , track_length TIME         NOT NULL
+  , PRIMARY KEY (track, artist)
+  , FOREIGN KEY (track, artist)
+      REFERENCES tracks(mbid, artist)
+      ON DELETE CASCADE
+  )
+;
+
+-- refresh the rows of track_display for a single track.
+DELIMITER !
+CREATE PROCEDURE sp_track_display_upsert
+  ( track_mbid   BINARY(16)
+  , track_artist BINARY(16)
+  )
+BEGIN
+  INSERT INTO track_display
+  SELECT track,
+         track_name,
+         album,
+         album_name,
+         artist,
+         artist_name,
+         track_length
+  FROM display_tracks
+  WHERE track = track_mbid AND artist = track_artist
+  ON DUPLICATE KEY UPDATE
+    track_name = VALUES(track_name),
+    album = VALUES(album),
+    album_name = VALUES(album_name),
+    artist_name = VALUES(artist_name),
+    track_length = VALUES(track_length);
+END !
+DELIMITER ;
+
+-- rebuild track_display from scratch.
+DELIMITER !
+CREATE PROCEDURE sp_track_display_rebuild()
+BEGIN
+  DELETE FROM track_display;
+  INSERT INTO track_display
+  SELECT track,
+         track_name,
+         album,
+         album_name,
+         artist,
+         artist_name,
+         track_length
+  FROM display_tracks;
+END !
+DELIMITER ;
+
+DELIMITER !
+CREATE TRIGGER trg_tracks_insert AFTER INSERT ON tracks
+FOR EACH ROW
+BEGIN
+  CALL sp_track_display_upsert(NEW.mbid, NEW.artist);
+END !
+DELIMITER ;
+
+DELIMITER !
+CREATE TRIGGER trg_tracks_update AFTER UPDATE ON tracks
+FOR EACH ROW
+BEGIN
+  CALL sp_track_display_upsert(NEW.mbid, NEW.artist);
+END !
+DELIMITER ;
+
+-- NOTE: a track may be added before its album is known for its artist.
+DELIMITER !
+CREATE TRIGGER trg_albums_insert AFTER INSERT ON albums
+FOR EACH ROW
+BEGIN
+  UPDATE track_display
+    JOIN tracks ON (tracks.mbid = track AND tracks.artist = track_display.artist)
+    JOIN mbids ON (mbids.mbid = NEW.mbid)
+  SET track_display.album = NEW.mbid,
+      track_display.album_name = mbids.mbid_name
+  WHERE tracks.album = NEW.mbid AND tracks.artist = NEW.artist;
+END !
+DELIMITER ;
+
+CALL sp_track_display_rebuild();
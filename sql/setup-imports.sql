@@ -0,0 +1,54 @@
+-- IMPORT NOTES
+-- 1. An import fetches the scrobbles a user made in a fixed window of time.
+-- The window is chosen when the import starts and kept in import_state until
+-- it finishes, so Last.FM numbers the pages of the window the same way no
+-- matter how many times the import is interrupted and resumed.
+-- 2. A page is recorded in import_pages in the same transaction that writes
+-- its scrobbles, so a page is either imported and recorded or neither. A
+-- resumed import only fetches the pages that aren't recorded.
+-- 3. A scrobble is identified by its user, time and track. Writing the same
+-- scrobble twice is ignored so replaying a batch is harmless.
+-- 4. This is applied after the snapshot is restored by bootstrap.py so the
+-- unique key on scrobbles is built in one pass.
+
+DROP TABLE IF EXISTS import_pages;
+DROP TABLE IF EXISTS import_state;
+
+-- The import in progress for each user, if any.
+CREATE TABLE import_state
+  ( user_name   VARCHAR(64) NOT NULL
+    -- INFO: The UNIX timestamps bounding the scrobbles being imported.
+  , window_from INT         NOT NULL
+  , window_to   INT         NOT NULL
+    -- INFO: The number of pages in the window once the first one is fetched.
+  , total_pages INT
+  , PRIMARY KEY (user_name)
+  , FOREIGN KEY (user_name)
+      REFERENCES users(user_name)
+      ON DELETE CASCADE
+  )
+;
+
+-- The pages of each import that are written.
+CREATE TABLE import_pages
+  ( user_name VARCHAR(64) NOT NULL
+  , page      INT         NOT NULL
+  , PRIMARY KEY (user_name, page)
+  , FOREIGN KEY (user_name)
+      REFERENCES import_state(user_name)
+      ON DELETE CASCADE
+  )
+;
+
+-- NOTE: scrobbles written twice before the key existed keep their first row.
+DELETE s
+FROM scrobbles s
+  JOIN scrobbles t
+    ON t.user_name = s.user_name
+   AND t.scrobble_time = s.scrobble_time
+   AND t.mbid = s.mbid
+   AND t.scrobble_id < s.scrobble_id;
+
+ALTER TABLE scrobbles
+  ADD UNIQUE KEY IF NOT EXISTS scrobbles_user_time_mbid
+    (user_name, scrobble_time, mbid);
@@ -0,0 +1,25 @@
+-- INDEX NOTES
+-- 1. These are applied after the snapshot is restored by bootstrap.py so each
+-- index is built once over every row. Every statement is idempotent so this
+-- file can also be used to migrate an existing database.
+-- 2. InnoDB appends the primary key to every secondary index, so the primary
+-- key columns of a table are always available from its secondary indexes.
+
+-- User.scrobbles and User.scrobble_page filter on the user and read scrobbles
+-- in (scrobble_time, scrobble_id) order, which is the primary key of scrobbles
+-- now that it is partitioned. The index that used to serve them is dropped.
+DROP INDEX IF EXISTS scrobbles_user_time ON scrobbles;
+
+-- User.report groups a user's scrobbles by track.
+CREATE INDEX IF NOT EXISTS scrobbles_user_mbid
+  ON scrobbles (user_name, mbid);
+
+-- User.find_tracks and User.find_page filter on the user and read scores in
+-- (last_crf, mbid) order.
+CREATE INDEX IF NOT EXISTS scores_user_crf
+  ON scores (user_name, last_crf);
+
+-- The decayed ranking reads scores in (log_crf, mbid) order. log_crf is added
+-- by sql/setup-scores.sql, which is applied first.
+CREATE INDEX IF NOT EXISTS scores_user_log_crf
+  ON scores (user_name, log_crf);
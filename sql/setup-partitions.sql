@@ -0,0 +1,102 @@
+-- PARTITION NOTES
+-- 1. scrobbles is partitioned by the year of scrobble_time. Queries bounded in
+-- time only read the partitions of the years they cover, and queries of a
+-- single user read their rows from each partition it has to through the
+-- primary key, which starts with the user.
+-- 2. p_future holds everything after the last year with a partition of its
+-- own so no write ever fails for want of one. sp_scrobbles_partition splits
+-- the years up to some number ahead of the current one out of it, which is
+-- cheap while it is empty. ev_scrobbles_partition runs it every month when the
+-- event scheduler is on and app.py sync runs it when it starts.
+-- 3. Partitioned tables can't have foreign keys, so the scrobbles of deleted
+-- users and MBIDs are deleted by the triggers below instead. Like the cascades
+-- they replace they leave the rollups to their own foreign keys, see
+-- sql/setup-rollups.sql.
+-- 4. This is applied before the snapshot is restored by bootstrap.py so rows
+-- are loaded straight into their partitions.
+
+DROP EVENT IF EXISTS ev_scrobbles_partition;
+DROP TRIGGER IF EXISTS trg_users_delete;
+DROP TRIGGER IF EXISTS trg_mbids_delete;
+DROP PROCEDURE IF EXISTS sp_scrobbles_partition;
+DROP FUNCTION IF EXISTS sf_year_start;
+
+-- the UNIX timestamp of the start of a year in UTC.
+DELIMITER !
+CREATE FUNCTION sf_year_start(year INT)
+RETURNS INT DETERMINISTIC
+BEGIN
+  RETURN TIMESTAMPDIFF(SECOND, '1970-01-01', MAKEDATE(year, 1));
+END !
+DELIMITER ;
+
+-- give every year up to ahead years from now a partition of scrobbles.
+DELIMITER !
+CREATE PROCEDURE sp_scrobbles_partition(ahead INT)
+BEGIN
+  DECLARE next_year INT;
+  DECLARE last_year INT DEFAULT YEAR(UTC_TIMESTAMP()) + ahead;
+  DECLARE partitions TEXT DEFAULT '';
+
+  -- INFO: the year starting where the last bounded partition ends.
+  SELECT YEAR(TIMESTAMPADD(SECOND,
+                           MAX(CAST(PARTITION_DESCRIPTION AS UNSIGNED)),
+                           '1970-01-01'))
+  INTO next_year
+  FROM information_schema.PARTITIONS
+  WHERE TABLE_SCHEMA = DATABASE()
+    AND TABLE_NAME = 'scrobbles'
+    AND PARTITION_DESCRIPTION <> 'MAXVALUE';
+
+  WHILE next_year <= last_year DO
+    SET partitions = CONCAT(partitions,
+      'PARTITION p', next_year,
+      ' VALUES LESS THAN (', sf_year_start(next_year + 1), '), ');
+    SET next_year = next_year + 1;
+  END WHILE;
+
+  IF partitions <> '' THEN
+    SET @statement = CONCAT(
+      'ALTER TABLE scrobbles REORGANIZE PARTITION p_future INTO (',
+      partitions,
+      'PARTITION p_future VALUES LESS THAN MAXVALUE)');
+    PREPARE statement FROM @statement;
+    EXECUTE statement;
+    DEALLOCATE PREPARE statement;
+  END IF;
+END !
+DELIMITER ;
+
+-- NOTE: trg_scrobbles_delete skips the rollups while this is set.
+DELIMITER !
+CREATE TRIGGER trg_users_delete BEFORE DELETE ON users
+FOR EACH ROW
+BEGIN
+  SET @scrobbles_cascade = TRUE;
+  DELETE FROM scrobbles WHERE user_name = OLD.user_name;
+  SET @scrobbles_cascade = NULL;
+END !
+DELIMITER ;
+
+DELIMITER !
+CREATE TRIGGER trg_mbids_delete BEFORE DELETE ON mbids
+FOR EACH ROW
+BEGIN
+  SET @scrobbles_cascade = TRUE;
+  -- NOTE: the tracks of a deleted artist or album are deleted with it.
+  IF OLD.mbid_type = 'track' THEN
+    DELETE FROM scrobbles WHERE mbid = OLD.mbid;
+  ELSE
+    DELETE scrobbles
+    FROM scrobbles JOIN tracks USING (mbid)
+    WHERE tracks.artist = OLD.mbid OR tracks.album = OLD.mbid;
+  END IF;
+  SET @scrobbles_cascade = NULL;
+END !
+DELIMITER ;
+
+CREATE EVENT ev_scrobbles_partition
+  ON SCHEDULE EVERY 1 MONTH
+  DO CALL sp_scrobbles_partition(1);
+
+CALL sp_scrobbles_partition(1);
@@ -0,0 +1,138 @@
+-- RECOMMENDATION NOTES
+-- 1. mbid_neighbours caches the most similar tracks (and artists) of every
+-- track (and artist) by the cosine similarity of who has played them and how
+-- often. The lists are computed in app.py (see Recommender) since MySQL has no
+-- way to take the top K of each row of a matrix product.
+-- 2. user_recommendations holds the tracks each user has never played ranked
+-- by the similarity of their neighbours to the tracks and artists the user
+-- has played. It is refreshed from mbid_neighbours after every refresh of
+-- the neighbours.
+-- 3. The triggers below queue every scrobble written or deleted in
+-- recommendation_changes. A refresh recomputes the lists of the MBIDs queued
+-- and the recommendations of the users queued, and deletes the changes it read
+-- in the same transaction. A change committed while a refresh runs is left
+-- for the next one, whatever its scrobble_id.
+-- 4. This is applied after the data is loaded and after
+-- sql/setup-rollups.sql since the recommendations are computed from the
+-- rollups.
+
+DROP TRIGGER IF EXISTS trg_scrobbles_insert_changes;
+DROP TRIGGER IF EXISTS trg_scrobbles_delete_changes;
+DROP PROCEDURE IF EXISTS sp_recommendations_refresh;
+DROP TABLE IF EXISTS recommendation_changes;
+DROP TABLE IF EXISTS user_recommendations;
+DROP TABLE IF EXISTS mbid_neighbours;
+DROP TABLE IF EXISTS recommendation_state;
+
+-- The most similar MBIDs of the same type to each MBID.
+CREATE TABLE mbid_neighbours
+  ( mbid       BINARY(16) NOT NULL
+  , neighbour  BINARY(16) NOT NULL
+    -- INFO: The cosine similarity of the two MBIDs in (0, 1].
+  , similarity DOUBLE     NOT NULL
+  , PRIMARY KEY (mbid, neighbour)
+  , INDEX (neighbour)
+  , FOREIGN KEY (mbid)
+      REFERENCES mbids(mbid)
+      ON DELETE CASCADE
+  , FOREIGN KEY (neighbour)
+      REFERENCES mbids(mbid)
+      ON DELETE CASCADE
+  )
+;
+
+-- Tracks each user hasn't played ranked by similarity to what they have.
+CREATE TABLE user_recommendations
+  ( user_name VARCHAR(16) NOT NULL
+  , mbid      BINARY(16)  NOT NULL
+  , score     DOUBLE      NOT NULL
+  , PRIMARY KEY (user_name, mbid)
+  , INDEX (user_name, score, mbid)
+  , FOREIGN KEY (mbid)
+      REFERENCES mbids(mbid)
+      ON DELETE CASCADE
+  , FOREIGN KEY (user_name)
+      REFERENCES users(user_name)
+      ON DELETE CASCADE
+  )
+;
+
+-- Whether mbid_neighbours has been computed yet.
+CREATE TABLE recommendation_state
+    -- INFO: Set by the first refresh, which recomputes every list.
+  ( refreshed BOOLEAN NOT NULL
+  )
+;
+
+INSERT INTO recommendation_state VALUES (FALSE);
+
+-- Scrobbles written or deleted since the last refresh.
+-- NOTE: there are no foreign keys so the changes made by deleting a user or
+-- an MBID are kept until a refresh reads them.
+CREATE TABLE recommendation_changes
+  ( change_id BIGINT      NOT NULL AUTO_INCREMENT
+  , user_name VARCHAR(16) NOT NULL
+    -- INFO: The track scrobbled.
+  , mbid      BINARY(16)  NOT NULL
+  , PRIMARY KEY (change_id)
+  )
+;
+
+-- recompute the recommendations of a user, or of every user if refresh_user
+-- is NULL. a track scores the similarity of each of its neighbours the user
+-- has played, weighted by the log of how often they played it, plus
+-- artist_weight times the same for its artist.
+DELIMITER !
+CREATE PROCEDURE sp_recommendations_refresh
+  ( refresh_user  VARCHAR(16)
+  , artist_weight DOUBLE
+  )
+BEGIN
+  DELETE FROM user_recommendations
+  WHERE refresh_user IS NULL OR user_name = refresh_user;
+
+  INSERT INTO user_recommendations
+  SELECT user_name, mbid, SUM(score)
+  FROM (SELECT played.user_name,
+               mbid_neighbours.neighbour AS mbid,
+               LOG(1 + played.scrobble_count) * similarity AS score
+        FROM user_track_counts AS played
+          JOIN mbid_neighbours USING (mbid)
+        WHERE (refresh_user IS NULL OR played.user_name = refresh_user)
+          AND played.scrobble_count > 0
+        UNION ALL
+        SELECT played.user_name,
+               tracks.mbid,
+               artist_weight * LOG(1 + played.scrobble_count) * similarity
+        FROM user_artist_counts AS played
+          JOIN mbid_neighbours USING (mbid)
+          JOIN tracks ON (tracks.artist = mbid_neighbours.neighbour)
+        WHERE (refresh_user IS NULL OR played.user_name = refresh_user)
+          AND played.scrobble_count > 0
+       ) AS candidates
+  WHERE NOT EXISTS (SELECT *
+                    FROM user_track_counts AS seen
+                    WHERE seen.user_name = candidates.user_name
+                      AND seen.mbid = candidates.mbid
+                      AND seen.scrobble_count > 0)
+  GROUP BY user_name, mbid;
+END !
+DELIMITER ;
+
+DELIMITER !
+CREATE TRIGGER trg_scrobbles_insert_changes AFTER INSERT ON scrobbles
+FOR EACH ROW
+BEGIN
+  INSERT INTO recommendation_changes (user_name, mbid)
+  VALUES (NEW.user_name, NEW.mbid);
+END !
+DELIMITER ;
+
+DELIMITER !
+CREATE TRIGGER trg_scrobbles_delete_changes AFTER DELETE ON scrobbles
+FOR EACH ROW
+BEGIN
+  INSERT INTO recommendation_changes (user_name, mbid)
+  VALUES (OLD.user_name, OLD.mbid);
+END !
+DELIMITER ;
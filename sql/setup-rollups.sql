@@ -0,0 +1,194 @@
+-- ROLLUP NOTES
+-- 1. These tables hold per-user play counts so reports don't have to
+-- aggregate a user's whole history. They are kept current by triggers on
+-- scrobbles, which covers both sp_user_add_scrobble and the bulk import path.
+-- 2. Rows for deleted users or MBIDs are removed through foreign keys since
+-- cascaded deletes do not fire triggers. The triggers that delete their
+-- scrobbles in place of foreign keys leave the rollups alone the same way.
+-- 3. This is applied after the snapshot is restored by bootstrap.py so the
+-- rows are loaded without firing the triggers.
+
+DROP TRIGGER IF EXISTS trg_scrobbles_insert;
+DROP TRIGGER IF EXISTS trg_scrobbles_delete;
+DROP PROCEDURE IF EXISTS sp_rollups_add;
+DROP PROCEDURE IF EXISTS sp_rollups_rebuild;
+DROP FUNCTION IF EXISTS sf_period_bucket;
+DROP TABLE IF EXISTS user_period_counts;
+DROP TABLE IF EXISTS user_track_counts;
+DROP TABLE IF EXISTS user_album_counts;
+DROP TABLE IF EXISTS user_artist_counts;
+
+-- Number of times each user has scrobbled each track.
+CREATE TABLE user_track_counts
+  ( user_name      VARCHAR(16) NOT NULL
+  , mbid           BINARY(16)  NOT NULL
+  , scrobble_count INT         NOT NULL
+  , PRIMARY KEY (user_name, mbid)
+  , INDEX (user_name, scrobble_count)
+  , FOREIGN KEY (mbid)
+      REFERENCES mbids(mbid)
+      ON DELETE CASCADE
+  , FOREIGN KEY (user_name)
+      REFERENCES users(user_name)
+      ON DELETE CASCADE
+  )
+;
+
+-- Number of times each user has scrobbled a track on each album.
+CREATE TABLE user_album_counts
+  ( user_name      VARCHAR(16) NOT NULL
+  , mbid           BINARY(16)  NOT NULL
+  , scrobble_count INT         NOT NULL
+  , PRIMARY KEY (user_name, mbid)
+  , INDEX (user_name, scrobble_count)
+  , FOREIGN KEY (mbid)
+      REFERENCES mbids(mbid)
+      ON DELETE CASCADE
+  , FOREIGN KEY (user_name)
+      REFERENCES users(user_name)
+      ON DELETE CASCADE
+  )
+;
+
+-- Number of times each user has scrobbled a track by each artist.
+CREATE TABLE user_artist_counts
+  ( user_name      VARCHAR(16) NOT NULL
+  , mbid           BINARY(16)  NOT NULL
+  , scrobble_count INT         NOT NULL
+  , PRIMARY KEY (user_name, mbid)
+  , INDEX (user_name, scrobble_count)
+  , FOREIGN KEY (mbid)
+      REFERENCES mbids(mbid)
+      ON DELETE CASCADE
+  , FOREIGN KEY (user_name)
+      REFERENCES users(user_name)
+      ON DELETE CASCADE
+  )
+;
+
+-- Number of times each user has scrobbled each track per day, week and month.
+CREATE TABLE user_period_counts
+  ( user_name      VARCHAR(16)                  NOT NULL
+  , period         ENUM('day', 'week', 'month') NOT NULL
+    -- INFO: The UNIX timestamp of the start of the period.
+  , bucket         INT                          NOT NULL
+  , mbid           BINARY(16)                   NOT NULL
+  , scrobble_count INT                          NOT NULL
+  , PRIMARY KEY (user_name, period, bucket, mbid)
+  , INDEX (user_name, period, bucket, scrobble_count)
+  , FOREIGN KEY (mbid)
+      REFERENCES mbids(mbid)
+      ON DELETE CASCADE
+  , FOREIGN KEY (user_name)
+      REFERENCES users(user_name)
+      ON DELETE CASCADE
+  )
+;
+
+-- the start of the day, week (starting on Monday) or month containing a time.
+DELIMITER !
+CREATE FUNCTION sf_period_bucket
+  ( period ENUM('day', 'week', 'month')
+  , t      INT
+  )
+RETURNS INT
+BEGIN
+  DECLARE d DATE DEFAULT DATE(FROM_UNIXTIME(t));
+  RETURN UNIX_TIMESTAMP(
+    CASE period
+      WHEN 'day' THEN d
+      WHEN 'week' THEN d - INTERVAL WEEKDAY(d) DAY
+      ELSE d - INTERVAL (DAY(d) - 1) DAY
+    END);
+END !
+DELIMITER ;
+
+-- add delta scrobbles of a track at a time to a user's rollups.
+DELIMITER !
+CREATE PROCEDURE sp_rollups_add
+  ( user_name     VARCHAR(16)
+  , scrobble_time INT
+  , track_mbid    BINARY(16)
+  , delta         INT
+  )
+BEGIN
+  INSERT INTO user_track_counts VALUES (user_name, track_mbid, delta)
+  ON DUPLICATE KEY UPDATE scrobble_count = scrobble_count + delta;
+
+  INSERT INTO user_artist_counts
+  SELECT user_name, artist, delta FROM tracks WHERE mbid = track_mbid
+  ON DUPLICATE KEY UPDATE scrobble_count = scrobble_count + delta;
+
+  INSERT INTO user_album_counts
+  SELECT user_name, album, delta FROM tracks
+  WHERE mbid = track_mbid AND album IS NOT NULL
+  ON DUPLICATE KEY UPDATE scrobble_count = scrobble_count + delta;
+
+  INSERT INTO user_period_counts
+  SELECT user_name,
+         period,
+         sf_period_bucket(period, scrobble_time),
+         track_mbid,
+         delta
+  FROM (SELECT 'day' AS period UNION ALL
+        SELECT 'week' UNION ALL
+        SELECT 'month') AS periods
+  ON DUPLICATE KEY UPDATE scrobble_count = scrobble_count + delta;
+END !
+DELIMITER ;
+
+-- rebuild every rollup from scrobbles.
+DELIMITER !
+CREATE PROCEDURE sp_rollups_rebuild()
+BEGIN
+  DELETE FROM user_track_counts;
+  DELETE FROM user_album_counts;
+  DELETE FROM user_artist_counts;
+  DELETE FROM user_period_counts;
+
+  INSERT INTO user_track_counts
+  SELECT user_name, mbid, COUNT(*) FROM scrobbles GROUP BY user_name, mbid;
+
+  INSERT INTO user_artist_counts
+  SELECT user_name, tracks.artist, COUNT(*)
+  FROM scrobbles JOIN tracks USING (mbid)
+  GROUP BY user_name, tracks.artist;
+
+  INSERT INTO user_album_counts
+  SELECT user_name, tracks.album, COUNT(*)
+  FROM scrobbles JOIN tracks USING (mbid)
+  WHERE tracks.album IS NOT NULL
+  GROUP BY user_name, tracks.album;
+
+  INSERT INTO user_period_counts
+  SELECT user_name, period, sf_period_bucket(period, scrobble_time) AS bucket,
+         mbid, COUNT(*)
+  FROM scrobbles
+    CROSS JOIN (SELECT 'day' AS period UNION ALL
+                SELECT 'week' UNION ALL
+                SELECT 'month') AS periods
+  GROUP BY user_name, period, bucket, mbid;
+END !
+DELIMITER ;
+
+DELIMITER !
+CREATE TRIGGER trg_scrobbles_insert AFTER INSERT ON scrobbles
+FOR EACH ROW
+BEGIN
+  CALL sp_rollups_add(NEW.user_name, NEW.scrobble_time, NEW.mbid, 1);
+END !
+DELIMITER ;
+
+DELIMITER !
+CREATE TRIGGER trg_scrobbles_delete AFTER DELETE ON scrobbles
+FOR EACH ROW
+BEGIN
+  -- INFO: @scrobbles_cascade is set by the triggers in
+  -- sql/setup-partitions.sql that stand in for foreign keys.
+  IF @scrobbles_cascade IS NULL THEN
+    CALL sp_rollups_add(OLD.user_name, OLD.scrobble_time, OLD.mbid, -1);
+  END IF;
+END !
+DELIMITER ;
+
+CALL sp_rollups_rebuild();
@@ -1,5 +1,7 @@
 DROP FUNCTION IF EXISTS sf_score_F;
 DROP FUNCTION IF EXISTS sf_score_C;
+DROP FUNCTION IF EXISTS sf_uuid_to_bin;
+DROP FUNCTION IF EXISTS sf_bin_to_uuid;
 
 DROP PROCEDURE IF EXISTS sp_mbid_add;
 DROP PROCEDURE IF EXISTS sp_artist_add;
@@ -8,10 +10,32 @@ DROP PROCEDURE IF EXISTS sp_track_add;
 DROP PROCEDURE IF EXISTS sp_user_add_scrobble;
 DROP PROCEDURE IF EXISTS sp_score_update;
 
+-- convert the text of an MBID to the bytes it is stored as.
+-- NOTE: MariaDB has no UUID_TO_BIN so this is done by hand.
+DELIMITER !
+CREATE FUNCTION sf_uuid_to_bin(mbid CHAR(36))
+RETURNS BINARY(16) DETERMINISTIC
+BEGIN
+  RETURN UNHEX(REPLACE(mbid, '-', ''));
+END !
+DELIMITER ;
+
+-- convert the bytes of a stored MBID back to its lowercase text.
+DELIMITER !
+CREATE FUNCTION sf_bin_to_uuid(mbid BINARY(16))
+RETURNS CHAR(36) DETERMINISTIC
+BEGIN
+  DECLARE digits CHAR(32) DEFAULT LOWER(HEX(mbid));
+  RETURN CONCAT_WS('-',
+    SUBSTR(digits, 1, 8), SUBSTR(digits, 9, 4), SUBSTR(digits, 13, 4),
+    SUBSTR(digits, 17, 4), SUBSTR(digits, 21));
+END !
+DELIMITER ;
+
 -- add an mbid and name to the table of mbids.
 DELIMITER !
 CREATE PROCEDURE sp_mbid_add
-  ( mbid      CHAR(36)
+  ( mbid      BINARY(16)
   , mbid_name VARCHAR(256)
   , mbid_type ENUM('artist', 'album', 'track')
   )
@@ -25,7 +49,7 @@ DELIMITER ;
 -- add artist to the artist and mbid tables.
 DELIMITER !
 CREATE PROCEDURE sp_artist_add
-  ( artist_mbid CHAR(36)
+  ( artist_mbid BINARY(16)
   , artist_name VARCHAR(256)
   )
 BEGIN
@@ -39,9 +63,9 @@ DELIMITER ;
 -- add album to the album and mbid tables.
 DELIMITER !
 CREATE PROCEDURE sp_album_add
-  ( album_mbid   CHAR(36)
+  ( album_mbid   BINARY(16)
   , album_name   VARCHAR(256)
-  , album_artist CHAR(36)
+  , album_artist BINARY(16)
   )
 BEGIN
   CALL sp_mbid_add(album_mbid, album_name, 'album');
@@ -53,10 +77,10 @@ DELIMITER ;
 -- add track to the track and mbid tables.
 DELIMITER !
 CREATE PROCEDURE sp_track_add
-  ( track_mbid   CHAR(36)
+  ( track_mbid   BINARY(16)
   , track_name   VARCHAR(256)
-  , track_artist CHAR(36)
-  , track_album  CHAR(36)
+  , track_artist BINARY(16)
+  , track_album  BINARY(16)
   , track_length TIME
   )
 BEGIN
@@ -74,13 +98,12 @@ DELIMITER !
 CREATE PROCEDURE sp_user_add_scrobble
   ( user_name     VARCHAR(16)
   , scrobble_time INT
-  , track_mbid    CHAR(36)
+  , track_mbid    BINARY(16)
   )
 BEGIN
-  INSERT INTO scrobbles
+  INSERT INTO scrobbles (scrobble_time, mbid, user_name)
   VALUES
-    ( DEFAULT
-    , scrobble_time
+    ( scrobble_time
     , track_mbid
     , user_name
     );
@@ -95,9 +118,10 @@ DELIMITER ;
 DELIMITER !
 CREATE FUNCTION sf_score_F(delta INT)
 RETURNS DOUBLE
+READS SQL DATA
 BEGIN
-  -- HALF_LIFE = 1 / (60 * 60 * 24 * 30) = 1 / 30 days
-  RETURN POW(0.5, delta / (60 * 60 * 24 * 30));
+  -- INFO: sf_score_half_life is defined in sql/setup-scores.sql.
+  RETURN POW(0.5, delta / sf_score_half_life());
 END !
 DELIMITER ;
 
@@ -118,10 +142,11 @@ DELIMITER !
 CREATE PROCEDURE sp_score_update
   ( user_name   VARCHAR(16)
   , curr_access INT
-  , mbid        CHAR(36)
+  , mbid        BINARY(16)
   )
 BEGIN
-  INSERT INTO scores VALUES (user_name, mbid, curr_access, sf_score_F(0))
+  INSERT INTO scores (user_name, mbid, last_access, last_crf)
+  VALUES (user_name, mbid, curr_access, sf_score_F(0))
   ON DUPLICATE KEY UPDATE
     last_crf = sf_score_C(curr_access - last_access, last_crf),
     last_access = curr_access;
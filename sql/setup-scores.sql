@@ -0,0 +1,124 @@
+-- SCORE NOTES
+-- 1. A CRF score is only meaningful relative to the time it was last updated,
+-- so last_crf can't be compared between MBIDs last played at different times.
+-- log_crf is log2(last_crf) + last_access / half_life, the log of the score
+-- decayed (or grown) to the UNIX epoch. Decaying every score to any common
+-- time preserves their order, so ranking by log_crf ranks by the score as of
+-- now without touching every row.
+-- 2. The half-life is read from score_settings. Changing it with
+-- sp_score_half_life_set rebuilds every score since stored scores were
+-- decayed with the old one.
+-- 3. This is applied after the snapshot is restored by bootstrap.py so the
+-- scores are loaded without firing the triggers.
+
+DROP TRIGGER IF EXISTS trg_scores_insert;
+DROP TRIGGER IF EXISTS trg_scores_update;
+DROP PROCEDURE IF EXISTS sp_scores_rebuild;
+DROP PROCEDURE IF EXISTS sp_score_half_life_set;
+DROP FUNCTION IF EXISTS sf_score_log;
+DROP FUNCTION IF EXISTS sf_score_half_life;
+
+-- The half-life of CRF scores.
+CREATE TABLE IF NOT EXISTS score_settings
+    -- INFO: The half-life in seconds.
+  ( half_life INT NOT NULL
+  )
+;
+
+INSERT INTO score_settings
+SELECT 60 * 60 * 24 * 30 FROM DUAL
+WHERE NOT EXISTS (SELECT * FROM score_settings);
+
+ALTER TABLE scores
+  -- INFO: log2(last_crf) + last_access / half_life. See the notes above.
+  ADD COLUMN IF NOT EXISTS log_crf DOUBLE NOT NULL DEFAULT 0;
+
+-- the half-life of CRF scores in seconds.
+DELIMITER !
+CREATE FUNCTION sf_score_half_life()
+RETURNS INT
+READS SQL DATA
+BEGIN
+  RETURN (SELECT half_life FROM score_settings LIMIT 1);
+END !
+DELIMITER ;
+
+-- the log of a CRF score decayed to the UNIX epoch.
+DELIMITER !
+CREATE FUNCTION sf_score_log
+  ( last_access INT
+  , last_crf    DOUBLE
+  )
+RETURNS DOUBLE
+READS SQL DATA
+BEGIN
+  RETURN LOG2(last_crf) + last_access / sf_score_half_life();
+END !
+DELIMITER ;
+
+-- recompute the scores of a user, or of every user if rebuild_user is NULL,
+-- from their scrobbles. each scrobble is an access of its track and of the
+-- track's artist and album. accesses of artists and albums that were never
+-- scrobbled with a known track are not kept in scrobbles so their scores are
+-- dropped.
+DELIMITER !
+CREATE PROCEDURE sp_scores_rebuild(rebuild_user VARCHAR(16))
+BEGIN
+  DECLARE half_life DOUBLE DEFAULT sf_score_half_life();
+
+  DELETE FROM scores WHERE rebuild_user IS NULL OR user_name = rebuild_user;
+
+  INSERT INTO scores (user_name, mbid, last_access, last_crf)
+  SELECT user_name,
+         mbid,
+         last_access,
+         SUM(POW(0.5, (last_access - scrobble_time) / half_life))
+  FROM (SELECT user_name,
+               mbid,
+               scrobble_time,
+               MAX(scrobble_time) OVER (PARTITION BY user_name, mbid)
+                 AS last_access
+        FROM (SELECT user_name, scrobble_id, scrobble_time, mbid
+              FROM scrobbles
+              WHERE rebuild_user IS NULL OR user_name = rebuild_user
+              UNION
+              SELECT user_name, scrobble_id, scrobble_time, tracks.artist
+              FROM scrobbles JOIN tracks USING (mbid)
+              WHERE rebuild_user IS NULL OR user_name = rebuild_user
+              UNION
+              SELECT user_name, scrobble_id, scrobble_time, tracks.album
+              FROM scrobbles JOIN tracks USING (mbid)
+              WHERE (rebuild_user IS NULL OR user_name = rebuild_user)
+                AND tracks.album IS NOT NULL
+             ) AS accesses
+       ) AS decayed
+  GROUP BY user_name, mbid, last_access;
+END !
+DELIMITER ;
+
+-- change the half-life of CRF scores and rebuild every score with it.
+DELIMITER !
+CREATE PROCEDURE sp_score_half_life_set(new_half_life INT)
+BEGIN
+  UPDATE score_settings SET half_life = new_half_life;
+  CALL sp_scores_rebuild(NULL);
+END !
+DELIMITER ;
+
+DELIMITER !
+CREATE TRIGGER trg_scores_insert BEFORE INSERT ON scores
+FOR EACH ROW
+BEGIN
+  SET NEW.log_crf = sf_score_log(NEW.last_access, NEW.last_crf);
+END !
+DELIMITER ;
+
+DELIMITER !
+CREATE TRIGGER trg_scores_update BEFORE UPDATE ON scores
+FOR EACH ROW
+BEGIN
+  SET NEW.log_crf = sf_score_log(NEW.last_access, NEW.last_crf);
+END !
+DELIMITER ;
+
+UPDATE scores SET log_crf = sf_score_log(last_access, last_crf);
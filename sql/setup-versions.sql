@@ -0,0 +1,82 @@
+-- VERSION NOTES
+-- 1. Every row of scrobbles and scores is tagged with the version of its user
+-- that last wrote it. A copy of a user's history (see ScrobbleStore in app.py)
+-- catches up by reading only the rows tagged after the version it last saw.
+-- 2. The triggers below take the next version from the user's row of
+-- user_versions, which stays locked until the writing transaction commits.
+-- Writers of the same user are ordered by it, so a version is only ever seen
+-- once every version before it is. scrobble_id can't be used for this, since
+-- AUTO_INCREMENT values are handed out before the transactions that take them
+-- commit, in any order.
+-- 3. This is applied after the snapshot is restored by bootstrap.py so the
+-- restored rows are loaded without firing the triggers. They all start at
+-- version 0.
+
+DROP TRIGGER IF EXISTS trg_scrobbles_version;
+DROP TRIGGER IF EXISTS trg_scores_version_insert;
+DROP TRIGGER IF EXISTS trg_scores_version_update;
+DROP FUNCTION IF EXISTS sf_user_version_next;
+DROP TABLE IF EXISTS user_versions;
+
+-- The latest version of each user's scrobbles and scores.
+CREATE TABLE user_versions
+  ( user_name    VARCHAR(16)  NOT NULL
+  , user_version INT UNSIGNED NOT NULL
+  , PRIMARY KEY (user_name)
+  , FOREIGN KEY (user_name)
+      REFERENCES users(user_name)
+      ON DELETE CASCADE
+  )
+;
+
+INSERT INTO user_versions SELECT user_name, 0 FROM users;
+
+ALTER TABLE scrobbles
+  -- INFO: The version of the user that wrote this scrobble.
+  ADD COLUMN IF NOT EXISTS scrobble_version INT UNSIGNED NOT NULL DEFAULT 0,
+  ADD KEY IF NOT EXISTS scrobbles_user_version (user_name, scrobble_version);
+
+ALTER TABLE scores
+  -- INFO: The version of the user that last wrote this score.
+  ADD COLUMN IF NOT EXISTS score_version INT UNSIGNED NOT NULL DEFAULT 0,
+  ADD KEY IF NOT EXISTS scores_user_version (user_name, score_version);
+
+-- hand out the next version of a user, locking it until the transaction ends.
+DELIMITER !
+CREATE FUNCTION sf_user_version_next(name VARCHAR(16))
+RETURNS INT UNSIGNED
+MODIFIES SQL DATA
+BEGIN
+  DECLARE version INT UNSIGNED;
+
+  INSERT INTO user_versions VALUES (name, 1)
+  ON DUPLICATE KEY UPDATE user_version = user_version + 1;
+
+  SELECT user_version INTO version FROM user_versions WHERE user_name = name;
+  RETURN version;
+END !
+DELIMITER ;
+
+DELIMITER !
+CREATE TRIGGER trg_scrobbles_version BEFORE INSERT ON scrobbles
+FOR EACH ROW
+BEGIN
+  SET NEW.scrobble_version = sf_user_version_next(NEW.user_name);
+END !
+DELIMITER ;
+
+DELIMITER !
+CREATE TRIGGER trg_scores_version_insert BEFORE INSERT ON scores
+FOR EACH ROW
+BEGIN
+  SET NEW.score_version = sf_user_version_next(NEW.user_name);
+END !
+DELIMITER ;
+
+DELIMITER !
+CREATE TRIGGER trg_scores_version_update BEFORE UPDATE ON scores
+FOR EACH ROW
+BEGIN
+  SET NEW.score_version = sf_user_version_next(NEW.user_name);
+END !
+DELIMITER ;
@@ -1,8 +1,29 @@
 -- DDL NOTES
--- 1. All MBIDs are 36 character long UUIDS. These are taken from MusicBrainz
--- and assumed to be globally unique. They are stable and guaranteed not to
--- change so we do not needs any cascading updates.
+-- 1. All MBIDs are UUIDS. These are taken from MusicBrainz and assumed to be
+-- globally unique. They are stable and guaranteed not to change so we do not
+-- needs any cascading updates.
+-- 2. MBIDs are stored as the 16 bytes of the UUID rather than its 36 character
+-- text, which under utf8mb4 takes up to 144 bytes in every key and index that
+-- holds it. The text form is only used outside the database: app.py converts
+-- at its edges and sf_uuid_to_bin and sf_bin_to_uuid do the same in SQL. The
+-- bytes of two UUIDs sort the same way as their lowercase text.
+-- 3. scrobbles is partitioned by the year of scrobble_time and clustered by
+-- user, see sql/setup-partitions.sql. Partitioned tables can't have foreign
+-- keys so the triggers there delete the scrobbles of deleted users and tracks.
 
+DROP TABLE IF EXISTS track_display;
+DROP TABLE IF EXISTS score_settings;
+DROP TABLE IF EXISTS user_recommendations;
+DROP TABLE IF EXISTS mbid_neighbours;
+DROP TABLE IF EXISTS recommendation_state;
+DROP TABLE IF EXISTS recommendation_changes;
+DROP TABLE IF EXISTS user_versions;
+DROP TABLE IF EXISTS import_pages;
+DROP TABLE IF EXISTS import_state;
+DROP TABLE IF EXISTS user_period_counts;
+DROP TABLE IF EXISTS user_track_counts;
+DROP TABLE IF EXISTS user_album_counts;
+DROP TABLE IF EXISTS user_artist_counts;
 DROP TABLE IF EXISTS scrobbles;
 DROP TABLE IF EXISTS scores;
 DROP TABLE IF EXISTS users;
@@ -13,8 +34,8 @@ DROP TABLE IF EXISTS mbids;
 
 -- A table of all known MBIDs alsongside their name and frecency.
 CREATE TABLE mbids
-    -- INFO: 36 character UUID given by MusicBrainz.
-  ( mbid      CHAR(36)
+    -- INFO: The bytes of the UUID given by MusicBrainz.
+  ( mbid      BINARY(16)
     -- INFO: UTF-8 encoded name as reported by MusicBrainz.
   , mbid_name VARCHAR(256) NOT NULL
     -- INFO: The type of the MBID entity.
@@ -26,7 +47,7 @@ CREATE TABLE mbids
 -- A restriction of mbids to just artists.
 CREATE TABLE artists
     -- INFO: The MBID assigned to this artist by MusicBrainz.
-  ( mbid CHAR(36)
+  ( mbid BINARY(16)
   , PRIMARY KEY (mbid)
   , FOREIGN KEY (mbid)
       REFERENCES mbids(mbid)
@@ -37,9 +58,9 @@ CREATE TABLE artists
 -- A linking table between artist MBIDs and album MBIDs.
 CREATE TABLE albums
     -- INFO: The MBID assigned to this album by MusicBrainz.
-  ( mbid   CHAR(36)
+  ( mbid   BINARY(16)
     -- INFO: The MBID assigned to this album's artist by MusicBrainz.
-  , artist CHAR(36)
+  , artist BINARY(16)
   , PRIMARY KEY (mbid, artist)
   , FOREIGN KEY (mbid)
       REFERENCES mbids(mbid)
@@ -54,12 +75,12 @@ CREATE TABLE albums
 -- are also recorded when they exist.
 CREATE TABLE tracks
     -- INFO: The MBID assigned to this track by MusicBrainz.
-  ( mbid    CHAR(36)
+  ( mbid    BINARY(16)
     -- INFO: The MBID assigned to this track's artist by MusicBrainz.
-  , artist  CHAR(36)
+  , artist  BINARY(16)
     -- INFO: The MBID assigned to this track's album by MusicBrainz.
     -- NOTE: May be NULL for songs not released on an album/EP.
-  , album   CHAR(36)
+  , album   BINARY(16)
   , length  TIME     NOT NULL
   , PRIMARY KEY (mbid, artist)
   , FOREIGN KEY (mbid)
@@ -98,7 +119,7 @@ CREATE TABLE scores
     -- INFO: The user that scrobbled this track.
   ( user_name   VARCHAR(16) NOT NULL
     -- INFO: The MDID entity that was scrobbled.
-  , mbid        CHAR(36)    NOT NULL
+  , mbid        BINARY(16)  NOT NULL
     -- INFO: The UNIX timestamp of the last time this entry was scrobbled.
   , last_access INT         NOT NULL
     -- INFO: A combined measure of frequency and recency used to find MBIDs that
@@ -115,7 +136,6 @@ CREATE TABLE scores
   )
 ;
 
--- Does using unique on username add an index.
 -- A table of recorded listening events
 CREATE TABLE scrobbles
     -- INFO: An unique identifier for this listening event.
@@ -127,17 +147,23 @@ CREATE TABLE scrobbles
     -- FROM_UNIXTIME in order to display the timestamp to users.
   , scrobble_time INT         NOT NULL
     -- INFO: The track that was listened to.
-  , mbid          CHAR(36)    NOT NULL
+  , mbid          BINARY(16)  NOT NULL
     -- INFO: The user that listened to this track.
   , user_name     VARCHAR(16) NOT NULL
-  , PRIMARY KEY (scrobble_id)
-  , FOREIGN KEY (mbid)
-      REFERENCES tracks(mbid)
-      ON DELETE CASCADE
-  , FOREIGN KEY (user_name)
-      REFERENCES users(user_name)
-      ON DELETE CASCADE
+    -- NOTE: a user's scrobbles are stored together in time order within each
+    -- partition, and every unique key has to include scrobble_time.
+  , PRIMARY KEY (user_name, scrobble_time, scrobble_id)
+    -- NOTE: an AUTO_INCREMENT column has to lead an index. it is also how
+    -- scrobbles added since a given one are found.
+  , KEY scrobbles_id (scrobble_id)
+  , KEY scrobbles_mbid (mbid)
+  )
+  -- INFO: p_start holds everything before 2003, when Last.FM started, and the
+  -- years after are split out of p_future by sp_scrobbles_partition.
+  PARTITION BY RANGE (scrobble_time)
+  ( PARTITION p_start  VALUES LESS THAN (1041379200)
+  , PARTITION p_future VALUES LESS THAN MAXVALUE
   )
 ;
 
--- TODO: CREATE INDEX
+-- NOTE: indexes for the queries in app.py are created by sql/setup-indexes.sql
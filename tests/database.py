@@ -0,0 +1,30 @@
+import unittest
+
+import mysql.connector
+
+import app
+import bench
+
+
+# NOTE: tests against the database named by DATABASE_NAME, as set up by
+# setup.sh, with the same admin connection and scenarios as bench.py. they are
+# skipped when it can't be reached.
+class DatabaseTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        try:
+            bench.db = bench.connect()
+        except mysql.connector.Error as e:
+            raise unittest.SkipTest(f"no database to test against: {e}")
+        cls.addClassCleanup(bench.db.close)
+
+        # NOTE: as in bench.py, reads go to MySQL rather than the result cache.
+        capacity = app.RESULT_CACHE.capacity
+        app.RESULT_CACHE.capacity = 0
+        cls.addClassCleanup(setattr, app.RESULT_CACHE, "capacity", capacity)
+        app.SCORE_HALF_LIFE = app.mysql_score_half_life()
+
+    def count(self, sql: str, params: tuple = ()) -> int:
+        with bench.db.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchone()[0]
@@ -0,0 +1,66 @@
+import os
+import subprocess
+import tempfile
+import unittest
+
+import app
+import bench
+import bootstrap
+from tests.database import DatabaseTest
+
+SCRATCH = f"{app.DATABSE_NAME}_bootstrap"
+
+
+def snapshot_counts(directory: str) -> dict[str, int]:
+    counts = {}
+    for table in bootstrap.SNAPSHOT_TABLES:
+        with open(bootstrap.snapshot_path(directory, table), encoding="utf-8") as f:
+            counts[table] = sum(1 for _ in f) - 1
+    return counts
+
+
+def recreate() -> None:
+    bootstrap.mysql(
+        None,
+        f"""
+        DROP DATABASE IF EXISTS `{SCRATCH}`;
+        CREATE DATABASE `{SCRATCH}`
+          DEFAULT CHARSET = utf8mb4 DEFAULT COLLATE = utf8mb4_unicode_ci;
+        """,
+    )
+
+
+# NOTE: the shipped snapshot, scaled up, restores into a scratch database with
+# every row, and a mysqldump of that database sources back to the same rows.
+class RestoreTest(DatabaseTest):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.addClassCleanup(
+            bootstrap.mysql, None, f"DROP DATABASE IF EXISTS `{SCRATCH}`"
+        )
+
+    def test_restore_and_dump(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot = os.path.join(directory, "x2")
+            bench.snapshot_scale(bootstrap.SNAPSHOT_DIR, snapshot, 2)
+
+            recreate()
+            bootstrap.mysql(
+                SCRATCH, f"SOURCE {os.path.join(bench.SQL_DIR, 'setup.sql')}"
+            )
+            bootstrap.restore(SCRATCH, snapshot, 4)
+            restored = bench.table_counts(SCRATCH)
+            self.assertEqual(restored, snapshot_counts(snapshot))
+
+            dump = os.path.join(directory, "x2.sql")
+            with open(dump, "w") as f:
+                subprocess.run([*bench.MYSQLDUMP, SCRATCH], stdout=f, check=True)
+            recreate()
+            with open(dump) as f:
+                subprocess.run([*bootstrap.MYSQL, SCRATCH], stdin=f, check=True)
+            self.assertEqual(bench.table_counts(SCRATCH), restored)
+
+
+if __name__ == "__main__":
+    unittest.main()
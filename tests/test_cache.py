@@ -0,0 +1,57 @@
+import unittest
+from unittest import mock
+
+import app
+import bench
+from tests.database import DatabaseTest
+
+SHAPES = ["", "+track:'^track 1'"]
+
+
+# NOTE: switching between the modes and two filters serves the same pages from
+# the result cache as from MySQL, before and after an import bumps the user's
+# generation, and the cache stays within its capacity, with and without the
+# in-memory store.
+class ResultCacheTest(DatabaseTest):
+    def switch(self, user: app.User) -> list:
+        pages = []
+        for _ in range(3):
+            for shape in SHAPES:
+                filters = app.Filter.parse(shape)
+                for load in bench.MODES.values():
+                    pages.append(load(user, filters))
+        return pages
+
+    def assertCachedMatch(self, user: app.User, capacity: int) -> None:
+        app.RESULT_CACHE.capacity = 0
+        expected = self.switch(user)
+        app.RESULT_CACHE.capacity = capacity
+        self.assertEqual(self.switch(user), expected)
+        self.assertLessEqual(app.RESULT_CACHE.size, capacity)
+
+    def test_matches_mysql(self) -> None:
+        added = 50
+        entries = bench.synthetic_feed(2000 + added, 200, 1)
+        for store in (False, True):
+            for capacity in (app.RESULT_CACHE_BYTES, 1 << 14):
+                with (
+                    self.subTest(store=store, capacity=capacity),
+                    mock.patch.object(app, "RESULT_CACHE", app.ResultCache(capacity)),
+                    bench.scenario(entries, entries[added:]) as user,
+                ):
+                    if store:
+                        user.store = app.ScrobbleStore(bench.BENCH_USER)
+                        user.store.refresh()
+                    self.assertCachedMatch(user, capacity)
+
+                    buffer = app.ImportBuffer(bench.BENCH_USER, store=user.store)
+                    for e in entries[:added]:
+                        buffer.add(e)
+                    buffer.flush()
+                    self.assertCachedMatch(user, capacity)
+                    newest = user.scrobble_page([], None, 1)
+                    self.assertEqual(newest[0][0][0], entries[0].time)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+
+import bench
+from tests.database import DatabaseTest
+
+
+class TrackDisplayTest(DatabaseTest):
+    def difference(self) -> int:
+        return self.count(
+            f"""
+            SELECT COUNT(*) FROM (
+              (SELECT {bench.DISPLAY_COLUMNS} FROM display_tracks
+               EXCEPT SELECT {bench.DISPLAY_COLUMNS} FROM track_display)
+              UNION ALL
+              (SELECT {bench.DISPLAY_COLUMNS} FROM track_display
+               EXCEPT SELECT {bench.DISPLAY_COLUMNS} FROM display_tracks)
+            ) AS difference
+            """
+        )
+
+    # NOTE: the triggers keep track_display the same as the display_tracks view
+    # as tracks are imported and deleted.
+    def test_matches_view(self) -> None:
+        entries = bench.synthetic_feed(500, 50, 1)
+        with bench.scenario(entries):
+            self.assertEqual(self.difference(), 0)
+        self.assertEqual(self.difference(), 0)
+
+    def test_rebuild_matches_view(self) -> None:
+        with bench.db.cursor() as cursor:
+            cursor.execute("CALL sp_track_display_rebuild()")
+        self.assertEqual(self.difference(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
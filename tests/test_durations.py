@@ -0,0 +1,164 @@
+import asyncio
+import time
+import unittest
+from datetime import timedelta
+from unittest import mock
+from xml.dom import minidom
+
+import pylast
+
+import app
+import bench
+from tests.database import DatabaseTest
+
+
+def track_info(duration: int) -> minidom.Document:
+    return minidom.parseString(
+        f"<lfm><track><duration>{duration}</duration></track></lfm>"
+    )
+
+
+# NOTE: stands in for track.getInfo, answering from a dict of track names to
+# durations in milliseconds or to the exception to raise, and counting calls.
+class FakeTrackInfo:
+    __name__ = "lastfm_track_info"
+
+    def __init__(self, answers: dict[str, int | Exception]) -> None:
+        self.answers = answers
+        self.calls = 0
+
+    def __call__(self, artist: str, track: str) -> minidom.Document:
+        self.calls += 1
+        answer = self.answers[track]
+        if isinstance(answer, Exception):
+            raise answer
+        return track_info(answer)
+
+
+def ws_error(status: int) -> pylast.WSError:
+    return pylast.WSError(None, str(status), "error")
+
+
+class DurationCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache = app.DurationCache()
+        fetcher = app.LastFMFetcher(retries=2, backoff_base=0)
+        self.addCleanup(fetcher.executor.shutdown)
+        patcher = mock.patch.object(app, "LASTFM_FETCHER", fetcher)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, info: FakeTrackInfo, *tracks: str) -> list:
+        async def run() -> list:
+            return await asyncio.gather(
+                *(self.cache.get(track, "artist", track) for track in tracks),
+                return_exceptions=True,
+            )
+
+        with mock.patch.object(app, "lastfm_track_info", info):
+            return asyncio.run(run())
+
+    def test_duration_is_cached(self) -> None:
+        info = FakeTrackInfo({"a": 240_000})
+        self.assertEqual(self.get(info, "a", "a"), [timedelta(seconds=240)] * 2)
+        self.assertEqual(self.get(info, "a"), [timedelta(seconds=240)])
+        self.assertEqual(info.calls, 1)
+
+    def test_no_duration_is_cached(self) -> None:
+        info = FakeTrackInfo(
+            {"zero": 0, "unknown": ws_error(pylast.STATUS_INVALID_PARAMS)}
+        )
+        self.assertEqual(self.get(info, "zero", "unknown"), [None, None])
+        self.assertEqual(self.get(info, "zero", "unknown"), [None, None])
+        self.assertEqual(info.calls, 2)
+
+    # NOTE: a lookup that failed has to fail every scrobble waiting on it, and
+    # be made again the next time the track comes up.
+    def test_failure_is_raised_and_not_cached(self) -> None:
+        for error in (ws_error(pylast.STATUS_RATE_LIMIT_EXCEEDED), OSError("down")):
+            with self.subTest(error=error):
+                info = FakeTrackInfo({"a": error})
+                for got in self.get(info, "a", "a"):
+                    self.assertIs(got, error)
+                self.assertNotIn("a", self.cache.recent)
+
+                info.answers["a"] = 240_000
+                self.assertEqual(self.get(info, "a"), [timedelta(seconds=240)])
+                self.assertEqual(info.calls, 3)
+                self.cache.recent.clear()
+
+
+# NOTE: an import looks each track up once, stores its length, and a restarted
+# cache finds every length stored without asking Last.FM again.
+class DurationImportTest(DatabaseTest):
+    def setUp(self) -> None:
+        self.entries = bench.synthetic_feed(300, 30, 1)
+        self.distinct = {e.track_mbid for e in self.entries}
+        # NOTE: lengths left behind by an earlier run would be found stored.
+        bench.mbids_delete(self.entries)
+
+        self.fake = bench.FakeLastFMUser(bench.BENCH_USER, self.entries, 0)
+        fetcher = app.LastFMFetcher(8, rate=1000)
+        self.addCleanup(fetcher.executor.shutdown)
+        for name, value in (
+            ("lastfm_track_info", self.fake.track_info),
+            ("LASTFM_FETCHER", fetcher),
+            ("TRACK_DURATIONS", app.DurationCache()),
+        ):
+            patcher = mock.patch.object(app, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def requested(self) -> int:
+        return sum(self.fake.track_requests.values())
+
+    def import_all(self) -> app.DurationCache:
+        async def noop(pages_done: int, total_pages: int) -> None:
+            pass
+
+        app.TRACK_DURATIONS = app.DurationCache()
+        app.TRACK_DURATIONS.load()
+        job = app.mysql_import_start(bench.BENCH_USER, int(time.time()))
+        asyncio.run(
+            app.lastfm_import_scrobbles(
+                self.fake, job, app.ImportBuffer(bench.BENCH_USER), noop
+            )
+        )
+        app.mysql_import_finish(job)
+        return app.TRACK_DURATIONS
+
+    def test_lookups_coalesce(self) -> None:
+        async def run(cache: app.DurationCache) -> None:
+            await asyncio.gather(
+                *(cache.get(e.track_mbid, e.artist, e.track) for e in self.entries)
+            )
+
+        with bench.scenario(self.entries, []):
+            cache = app.DurationCache()
+            cache.load()
+            asyncio.run(run(cache))
+        self.assertEqual(max(self.fake.track_requests.values()), 1)
+        self.assertEqual(cache.misses, len(self.distinct))
+
+    def test_restart_reads_stored_lengths(self) -> None:
+        with bench.scenario(self.entries, []):
+            cache = self.import_all()
+            self.assertEqual(cache.stored_hits, 0)
+            self.assertEqual(self.requested(), len(self.distinct))
+
+            bench.user_reset(bench.BENCH_USER)
+            cache = self.import_all()
+            self.assertLessEqual(self.distinct, cache.stored.keys())
+            self.assertEqual(self.requested(), len(self.distinct))
+            self.assertEqual(cache.misses, 0)
+            self.assertEqual(
+                self.count(
+                    "SELECT COUNT(*) FROM scrobbles WHERE user_name = %s",
+                    (bench.BENCH_USER,),
+                ),
+                len(self.entries),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
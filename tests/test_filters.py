@@ -0,0 +1,101 @@
+import re
+import unittest
+from unittest import mock
+
+import app
+
+# NOTE: filters and what they parse to, as (name, regex) pairs, or None if they
+# are invalid.
+PARSE_CASES = {
+    "": [],
+    "+artist:Beatles": [("artist", "Beatles")],
+    "+artist:'^The ' +track:\"love\"": [("artist", "^The "), ("track", "love")],
+    "  +album: 'a\\'b'  ": [("album", "a\\'b")],
+    '+track:"it""s"': [("track", 'it""s')],
+    "+track:love+album:x": [("track", "love"), ("album", "x")],
+    "+track:abc123": None,
+    "+genre:rock": None,
+    "+track:'unterminated": None,
+}
+
+# NOTE: regexes and whether they are read the same way by Python and by the
+# server's RLIKE, and so can be matched against names in Python.
+PORTABLE_CASES = {
+    "love": True,
+    "^the": True,
+    "e$": True,
+    "love|heart": True,
+    "[0-9]+": True,
+    "[^a-m]": True,
+    "a{2,3}": True,
+    "(ab)+": True,
+    "\\.": True,
+    "a.b?c*": True,
+    "(?i)x": False,
+    "\\d": False,
+    "\\bword": False,
+    "[[:alpha:]]": False,
+    "[]": False,
+    "[abc": False,
+    "a{,3}": False,
+    "é": False,
+}
+
+NAMES = ["The Love Song", "heart of gold", "1999", "Blue", "summer rain 7", "Kenny"]
+
+
+class FilterParseTest(unittest.TestCase):
+    def test_parse(self) -> None:
+        for case, expected in PARSE_CASES.items():
+            with self.subTest(case=case):
+                filters = app.Filter.parse(case)
+                got = None if filters is None else [(f.name, f.regex) for f in filters]
+                self.assertEqual(got, expected)
+
+    def test_key_ignores_order_and_repeats(self) -> None:
+        a = app.Filter.parse("+artist:x +track:y")
+        b = app.Filter.parse("+track:y +artist:x +track:y")
+        self.assertEqual(app.Filter.key(a), app.Filter.key(b))
+
+    def test_rlike_without_pushdown(self) -> None:
+        with mock.patch.object(app, "FILTER_PUSHDOWN", False):
+            (f,) = app.Filter.parse('+track:"it\'s"')
+            self.assertEqual(f.to_sql(), "track_name RLIKE 'it\\'s'")
+
+
+class RegexTest(unittest.TestCase):
+    def test_portable(self) -> None:
+        for regex, expected in PORTABLE_CASES.items():
+            with self.subTest(regex=regex):
+                self.assertEqual(app.regex_portable(regex), expected)
+
+    # NOTE: the store matches names itself, which has to agree with matching
+    # them case insensitively the way RLIKE does.
+    def test_store_match(self) -> None:
+        store = app.ScrobbleStore("test")
+        for i, name in enumerate(NAMES):
+            store.add_track(
+                {
+                    "track": bytes([i]),
+                    "album": None,
+                    "artist": b"a",
+                    "track_name": name,
+                    "album_name": None,
+                    "artist_name": "artist",
+                    "track_length": None,
+                }
+            )
+
+        for regex, portable in PORTABLE_CASES.items():
+            if not portable:
+                self.assertIsNone(store.match("track", regex))
+                continue
+            with self.subTest(regex=regex):
+                expected = [
+                    re.search(regex, n, re.IGNORECASE) is not None for n in NAMES
+                ]
+                self.assertEqual(list(store.match("track", regex)), expected + [False])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+import math
+import random
+import unittest
+import uuid
+from contextlib import nullcontext
+from dataclasses import replace
+from datetime import timedelta
+from unittest import mock
+
+import app
+
+
+# NOTE: stands in for the tables mysql_import_batch reads and writes. scores
+# are merged the way its INSERT ... ON DUPLICATE KEY UPDATE merges them.
+class FakeDatabase:
+    def __init__(self) -> None:
+        self.scrobbles = []
+        self.scores = {}
+        self.pages = set()
+        self.reads = []
+
+    def cursor(self, dictionary: bool = False) -> "FakeCursor":
+        return FakeCursor(self)
+
+    def commit(self) -> None:
+        pass
+
+    def rollback(self) -> None:
+        pass
+
+
+class FakeCursor:
+    def __init__(self, database: FakeDatabase) -> None:
+        self.database = database
+        self.rows = []
+
+    def __enter__(self) -> "FakeCursor":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        pass
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def fetchall(self) -> list[tuple]:
+        return self.rows
+
+    # NOTE: the only reads are of a user's row and of their scrobbles in a time
+    # range.
+    def execute(self, operation: str, params: tuple = ()) -> None:
+        self.database.reads.append(" ".join(operation.split()))
+        if "FROM users" in operation:
+            self.rows = [params]
+            return
+
+        username, low, high = params
+        self.rows = [
+            (time, mbid)
+            for time, mbid, user in self.database.scrobbles
+            if user == username and low <= time <= high
+        ]
+
+    def executemany(self, operation: str, rows: list[tuple]) -> None:
+        if "INTO scrobbles" in operation:
+            self.database.scrobbles.extend(rows)
+        elif "INTO import_pages" in operation:
+            if "IGNORE" not in operation and self.database.pages & set(rows):
+                raise app.mysql.connector.IntegrityError("duplicate page")
+            self.database.pages.update(rows)
+        elif "INTO scores" in operation:
+            for username, mbid, access, crf in rows:
+                last, stored = self.database.scores.get((username, mbid), (access, 0))
+                latest = max(last, access)
+                self.database.scores[username, mbid] = (
+                    latest,
+                    crf * app.score_F(latest - access)
+                    + stored * app.score_F(latest - last),
+                )
+
+
+def feed(count: int, seed: int) -> list[app.ImportEntry]:
+    rng = random.Random(seed)
+
+    def mbid() -> str:
+        return str(uuid.UUID(int=rng.getrandbits(128)))
+
+    artists = [(f"artist {i}", mbid()) for i in range(3)]
+    albums = [(f"album {i}", mbid()) for i in range(5)]
+    tracks = [
+        (*rng.choice(artists), *rng.choice(albums), f"track {i}", mbid())
+        for i in range(20)
+    ]
+    return [
+        app.ImportEntry(
+            1_700_000_000 - 180 * i, *rng.choice(tracks), timedelta(seconds=240)
+        )
+        for i in range(count)
+    ]
+
+
+class ImportReplayTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.database = FakeDatabase()
+        for name, value in (
+            ("mysql_read", None),
+            ("mysql_write", lambda: nullcontext(self.database)),
+            ("PREPARED_STATEMENTS", False),
+        ):
+            patcher = mock.patch.object(app, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write(self, entries: list[app.ImportEntry], pages: list[int] = ()) -> None:
+        app.mysql_import_batch("test", entries, list(pages))
+
+    def assertScoresEqual(self, expected: dict, got: dict) -> None:
+        self.assertEqual(expected.keys(), got.keys())
+        for key, (last, crf) in expected.items():
+            self.assertEqual(got[key][0], last)
+            self.assertTrue(math.isclose(got[key][1], crf, rel_tol=1e-9))
+
+    def test_replay_changes_nothing(self) -> None:
+        entries = feed(50, 1)
+        self.write(entries)
+        scrobbles = sorted(self.database.scrobbles)
+        scores = dict(self.database.scores)
+
+        self.write(entries)
+        self.assertEqual(sorted(self.database.scrobbles), scrobbles)
+        self.assertScoresEqual(scores, self.database.scores)
+
+    # NOTE: an import interrupted after writing a batch but before recording
+    # its pages refetches them, so the next batch overlaps the one written.
+    def test_overlapping_batches(self) -> None:
+        entries = feed(100, 2)
+        self.write(entries)
+        expected = sorted(self.database.scrobbles), dict(self.database.scores)
+
+        self.database = FakeDatabase()
+        self.write(entries[:60])
+        self.write(entries[40:])
+        self.assertEqual(sorted(self.database.scrobbles), expected[0])
+        self.assertScoresEqual(expected[1], self.database.scores)
+
+    # NOTE: a sync and an import writing the same scrobbles at once would both
+    # miss them unless the stored ones are read with locks, in the transaction
+    # that writes the batch, after the user's row is locked.
+    def test_seen_is_read_locked(self) -> None:
+        self.write(feed(10, 5))
+        lock, seen = self.database.reads
+        self.assertIn("FROM users", lock)
+        self.assertTrue(lock.endswith("FOR UPDATE"))
+        self.assertIn("FROM scrobbles", seen)
+        self.assertTrue(seen.endswith("FOR UPDATE"))
+
+    def test_pages_written_twice(self) -> None:
+        entries = feed(10, 6)
+        self.write(entries[:5], [1])
+        self.write(entries[5:], [1, 2])
+        self.assertEqual(self.database.pages, {("test", 1), ("test", 2)})
+        self.assertEqual(len(self.database.scrobbles), len(entries))
+
+    def test_repeats_within_a_batch(self) -> None:
+        entries = feed(10, 3)
+        self.write(entries + entries[:5])
+        self.assertEqual(len(self.database.scrobbles), len(entries))
+
+    # NOTE: an entry that isn't stored as a scrobble would be scored again on
+    # every replay, so it isn't scored at all.
+    def test_unstored_entries_add_no_scores(self) -> None:
+        entry = replace(feed(1, 4)[0], length=None)
+        self.write([entry])
+        self.write([entry])
+        self.assertEqual(self.database.scrobbles, [])
+        self.assertEqual(self.database.scores, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
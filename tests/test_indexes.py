@@ -0,0 +1,85 @@
+import unittest
+from contextlib import contextmanager
+from unittest import mock
+
+import app
+import bench
+from tests.database import DatabaseTest
+
+# NOTE: a user of the shipped data, whose history is enough for the optimizer to
+# pick the indexes it would for a real one.
+EXPLAIN_USER = "emekoi"
+
+# NOTE: queries whose order comes from an aggregate always need a sort.
+EXPLAIN_QUERIES = [
+    "scrobbles",
+    "scrobble_page",
+    "find_tracks",
+    "find_page",
+    "find_page stored",
+    "similar_page",
+]
+
+
+class RecordingConnection:
+    """Wraps a connection and records every statement executed through it."""
+
+    def __init__(self, connection: any, statements: list) -> None:
+        self.connection = connection
+        self.statements = statements
+
+    def cursor(self, *args: any, **kwargs: any) -> any:
+        cursor = self.connection.cursor(*args, **kwargs)
+        execute = cursor.execute
+
+        def record(operation: str, params: tuple = ()) -> any:
+            self.statements.append((operation, params))
+            return execute(operation, params)
+
+        cursor.execute = record
+        return cursor
+
+    def __getattr__(self, name: str) -> any:
+        return getattr(self.connection, name)
+
+
+class ExplainTest(DatabaseTest):
+    def setUp(self) -> None:
+        self.statements = []
+        read = app.mysql_read
+
+        @contextmanager
+        def recording_read() -> any:
+            with read() as connection:
+                yield RecordingConnection(connection, self.statements)
+
+        # NOTE: cursors prepared on an earlier checkout would not be recorded.
+        for name, value in (
+            ("mysql_read", recording_read),
+            ("PREPARED_STATEMENTS", False),
+        ):
+            patcher = mock.patch.object(app, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    # NOTE: the per-user queries read scrobbles and scores through their
+    # composite indexes, without falling back to a filesort or a full scan.
+    def test_no_sorts_or_scans(self) -> None:
+        user = app.User(EXPLAIN_USER)
+        for name in EXPLAIN_QUERIES:
+            with self.subTest(query=name):
+                self.statements.clear()
+                bench.QUERIES[name](user)
+                operation, params = self.statements[-1]
+
+                with bench.db.cursor(dictionary=True) as cursor:
+                    cursor.execute("EXPLAIN " + operation, params)
+                    plan = [r for r in cursor if r["table"] in bench.INDEXES]
+
+                for row in plan:
+                    self.assertNotEqual(row["type"], "ALL", row)
+                    self.assertNotIn("filesort", row["Extra"] or "", row)
+
+
+if __name__ == "__main__":
+    unittest.main()
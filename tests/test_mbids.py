@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+
+import bench
+import bootstrap
+from tests.database import DatabaseTest
+
+
+# NOTE: the shipped snapshot restored with MBIDs as CHAR(36) and as BINARY(16)
+# gives the same number of rows for each query.
+class MbidTypesTest(DatabaseTest):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.addClassCleanup(
+            bootstrap.mysql, None, f"DROP DATABASE IF EXISTS `{bench.MBID_SCRATCH}`"
+        )
+
+    def test_same_rows(self) -> None:
+        counts = {}
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot = os.path.join(directory, "x2")
+            bench.snapshot_scale(bootstrap.SNAPSHOT_DIR, snapshot, 2)
+            for label, sql in bench.mbid_schemas(directory).items():
+                # NOTE: closed before the next restore, whose DROP DATABASE
+                # would wait on the tables it read.
+                connection = bench.mbid_restore(sql, snapshot, 4)
+                try:
+                    with connection.cursor() as cursor:
+                        for name, query in bench.MBID_QUERIES.items():
+                            cursor.execute(query, ("emekoi",))
+                            counts[label, name] = len(cursor.fetchall())
+                finally:
+                    connection.close()
+
+        for name in bench.MBID_QUERIES:
+            with self.subTest(query=name):
+                self.assertGreater(counts["BINARY(16)", name], 0)
+                self.assertEqual(counts["CHAR(36)", name], counts["BINARY(16)", name])
+
+
+if __name__ == "__main__":
+    unittest.main()
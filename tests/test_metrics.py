@@ -0,0 +1,50 @@
+import re
+import unittest
+from unittest import mock
+
+import app
+import bench
+from tests.database import DatabaseTest
+
+PROMETHEUS_LINE = re.compile(
+    r'^(# TYPE \w+ (counter|summary)|\w+(\{\w+="([^"\\]|\\.)*"(,\w+="([^"\\]|\\.)*")*\})? \S+)$'
+)
+
+
+def enable_metrics(test: unittest.TestCase) -> app.Metrics:
+    patcher = mock.patch.object(app, "METRICS", app.Metrics())
+    test.addCleanup(patcher.stop)
+    return patcher.start()
+
+
+class RenderTest(unittest.TestCase):
+    # NOTE: labels are escaped so every line is in the Prometheus text format.
+    def test_prometheus_format(self) -> None:
+        enable_metrics(self)
+        app.metrics_count("lookups", source='quoted "label"')
+        app.metrics_count("lookups", source="back\\slash\nnewline")
+        with app.metrics_timer("db", statement="SELECT scrobbles"):
+            pass
+
+        for line in app.metrics_render().splitlines():
+            with self.subTest(line=line):
+                self.assertRegex(line, PROMETHEUS_LINE)
+
+
+class ScreensTest(DatabaseTest):
+    # NOTE: the screens' reads are timed by statement with metrics on.
+    def test_statements_timed(self) -> None:
+        metrics = enable_metrics(self)
+        entries = bench.synthetic_feed(500, 50, 1)
+        with bench.scenario(entries) as user:
+            for fetch in bench.MODES.values():
+                fetch(user, [])
+
+        self.assertIn("db", metrics.timers)
+        for line in app.metrics_render().splitlines():
+            with self.subTest(line=line):
+                self.assertRegex(line, PROMETHEUS_LINE)
+
+
+if __name__ == "__main__":
+    unittest.main()
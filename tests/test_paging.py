@@ -0,0 +1,196 @@
+import math
+import random
+import sqlite3
+import unittest
+
+import numpy as np
+
+import app
+
+
+# NOTE: every page of fetch walked from the top and from the end, each as a
+# flat list in display order. fetch(key, limit, reverse) returns a page in
+# display order and key_of gives the key of one of its rows. a walk that comes
+# back to a key it was at would go on forever.
+def walks(fetch: callable, key_of: callable, limit: int) -> tuple[list, list]:
+    def walk(reverse: bool) -> list:
+        rows, key, seen = [], None, set()
+        while page := fetch(key, limit, reverse):
+            rows = page + rows if reverse else rows + page
+            key = key_of(page[0] if reverse else page[-1])
+            if key in seen:
+                raise AssertionError(f"the walk came back to {key}")
+            seen.add(key)
+        return rows
+
+    return walk(False), walk(True)
+
+
+class KeysetTest(unittest.TestCase):
+    # NOTE: a few values of a with many rows each, as for scrobble counts, and
+    # values of b repeated within them, as for tracks with several artists.
+    def setUp(self) -> None:
+        rng = random.Random(1)
+        ids = list(range(500))
+        rng.shuffle(ids)
+        self.rows = [(rng.randint(0, 9), rng.randint(0, 20), c) for c in ids]
+        self.db = sqlite3.connect(":memory:")
+        self.db.execute("CREATE TABLE t (a INTEGER, b INTEGER, c INTEGER)")
+        self.db.executemany("INSERT INTO t VALUES (?, ?, ?)", self.rows)
+
+    def tearDown(self) -> None:
+        self.db.close()
+
+    def fetch(self, columns: tuple[str, ...], descending: bool) -> callable:
+        def fetch(key: tuple | None, limit: int, reverse: bool) -> list:
+            condition, params, order = app.keyset(columns, key, descending, reverse)
+            # NOTE: SQLite's placeholders are ? where MySQL's are %s.
+            condition = condition.replace("%s", "?")
+            page = self.db.execute(
+                f"SELECT {', '.join(columns)} FROM t WHERE {condition} "
+                f"ORDER BY {order} LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+            return page[::-1] if reverse else page
+
+        return fetch
+
+    def test_walks(self) -> None:
+        for columns in (("a", "c"), ("a", "b", "c")):
+            rows = [tuple(row["abc".index(c)] for c in columns) for row in self.rows]
+            for descending in (True, False):
+                expected = sorted(rows, reverse=descending)
+                for limit in (1, 7, 100, 1000):
+                    with self.subTest(
+                        columns=columns, descending=descending, limit=limit
+                    ):
+                        forward, backward = walks(
+                            self.fetch(columns, descending), lambda row: row, limit
+                        )
+                        self.assertEqual(forward, expected)
+                        self.assertEqual(backward, expected)
+
+
+class OrderingTest(unittest.TestCase):
+    def test_walks(self) -> None:
+        rng = random.Random(2)
+        a = np.array([rng.randint(0, 9) for _ in range(500)])
+        b = np.array(rng.sample(range(500), 500))
+        items = np.lexsort((b, a))
+        ordering = app.Ordering(items, a[items], b[items])
+
+        def fetch(key: tuple | None, limit: int, reverse: bool) -> list:
+            return list(ordering.page(key, limit, reverse))
+
+        for limit in (1, 7, 100, 1000):
+            with self.subTest(limit=limit):
+                forward, backward = walks(fetch, lambda i: (a[i], b[i]), limit)
+                self.assertEqual(forward, list(items))
+                self.assertEqual(backward, list(items))
+
+
+# NOTE: the store's decayed ranking reads log_crf, as the find screen's query
+# does, which has to put tracks in the order of their scores decayed to now.
+class LogCrfTest(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = random.Random(3)
+        self.now = 1_700_000_000
+        self.store = store = app.ScrobbleStore("test")
+        self.scores = {}
+        for i in range(300):
+            mbid = rng.randbytes(16)
+            store.add_track(
+                {
+                    "track": mbid,
+                    "album": None,
+                    "artist": b"a",
+                    "track_name": f"track {i}",
+                    "album_name": None,
+                    "artist_name": "artist",
+                    "track_length": None,
+                }
+            )
+            # NOTE: some tracks are scrobbled and never scored.
+            if i % 10 != 0:
+                access = self.now - rng.randint(0, 400 * 86400)
+                self.scores[mbid] = (access, rng.uniform(0.01, 50))
+
+        codes = len(store.tracks)
+        store.crf = np.full(codes, np.nan)
+        store.log_crf = np.full(codes, np.nan)
+        store.access = np.zeros(codes, dtype=np.int64)
+        for code, track in enumerate(store.tracks):
+            if track.mbid in self.scores:
+                access, crf = self.scores[track.mbid]
+                store.crf[code] = crf
+                store.log_crf[code] = math.log2(crf) + access / app.SCORE_HALF_LIFE
+                store.access[code] = access
+        store.rerank()
+
+    def test_order_is_decayed_score(self) -> None:
+        def decayed(mbid: bytes) -> float:
+            access, crf = self.scores[mbid]
+            return crf * app.score_F(self.now - access)
+
+        expected = sorted(self.scores, key=decayed)
+        for limit in (1, 13, 1000):
+            with self.subTest(limit=limit):
+                forward, backward = walks(
+                    lambda k, n, r: self.store.find_page([], k, n, r),
+                    lambda row: row[0],
+                    limit,
+                )
+                self.assertEqual([row[1].track.mbid for row in forward], expected)
+                self.assertEqual([row[1].track.mbid for row in backward], expected)
+
+    def test_stored_order_is_last_crf(self) -> None:
+        expected = sorted(self.scores, key=lambda mbid: (self.scores[mbid][1], mbid))
+        page = self.store.find_page([], None, len(expected), decayed=False)
+        self.assertEqual([row[1].track.mbid for row in page], expected)
+
+
+# NOTE: a track MBID has a row of track_display for each of its artists, which
+# tie on the track's scrobble count, so the report's rows are told apart by
+# their artist as well.
+class ReportTiesTest(unittest.TestCase):
+    def test_walks(self) -> None:
+        rng = random.Random(4)
+        store = app.ScrobbleStore("test")
+        pairs = [(bytes([i // 4]), bytes([i % 4])) for i in range(60)]
+        rng.shuffle(pairs)
+        for track, artist in pairs:
+            store.add_track(
+                {
+                    "track": track,
+                    "album": None,
+                    "artist": artist,
+                    "track_name": "track",
+                    "album_name": None,
+                    "artist_name": "artist",
+                    "track_length": None,
+                }
+            )
+        store.rerank()
+        store.track = np.array([rng.randrange(len(pairs)) for _ in range(200)])
+        store.times = np.arange(len(store.track), dtype=np.int64)
+        store.ids = np.arange(len(store.track), dtype=np.int64)
+
+        counts = np.bincount(store.track, minlength=len(pairs))
+        expected = sorted(
+            ((int(counts[code]), *pair) for code, pair in enumerate(pairs)),
+            reverse=True,
+        )
+        expected = [row for row in expected if row[0] > 0]
+        for limit in (1, 3, 1000):
+            with self.subTest(limit=limit):
+                forward, backward = walks(
+                    lambda k, n, r: store.report_page([], k, n, r),
+                    lambda row: row[0],
+                    limit,
+                )
+                self.assertEqual([row[0] for row in forward], expected)
+                self.assertEqual([row[0] for row in backward], expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import random
+import time
+import unittest
+
+import app
+import bench
+from tests.database import DatabaseTest
+
+
+# NOTE: over a history of three years, the queries bounded in time read no more
+# than the partitions of the years they cover, and the keyset of the middle
+# page prunes the partitions after it.
+class PruningTest(DatabaseTest):
+    def test_prunes_partitions(self) -> None:
+        rng = random.Random(1)
+        library = bench.synthetic_library(100, rng)
+        now = int(time.time())
+        times = sorted(rng.sample(range(3 * 365 * 86400), 2000))
+        entries = [app.ImportEntry(now - t, *rng.choice(library)) for t in times]
+
+        with bench.scenario(entries):
+            partitions = self.count(
+                """
+                SELECT COUNT(*) FROM information_schema.PARTITIONS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'scrobbles'
+                """
+            )
+            params = bench.partition_params(
+                bench.BENCH_USER, entries[-1].time, entries[0].time, entries[0].time
+            )
+            for name, (query, span) in bench.PARTITION_QUERIES.items():
+                with self.subTest(query=name):
+                    operation = bench.partition_statement(query, "scrobbles", params)
+                    read = bench.partitions_read(operation, params)
+                    # NOTE: a span of up to a year touches at most the
+                    # partitions of the two years on either side of a new year.
+                    if span is not None:
+                        self.assertLessEqual(read, 2)
+                    if name == "user middle page":
+                        self.assertLess(read, partitions)
+
+                        with bench.db.cursor() as cursor:
+                            cursor.execute(operation, params)
+                            page = [t for t, _, _ in cursor]
+                        expected = [
+                            e.time for e in entries if e.time < params["middle"]
+                        ]
+                        self.assertEqual(page, expected[:200])
+
+
+if __name__ == "__main__":
+    unittest.main()
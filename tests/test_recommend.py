@@ -0,0 +1,154 @@
+import random
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from unittest import mock
+
+import numpy as np
+
+import app
+import bench
+from tests.database import DatabaseTest
+
+
+class SimilaritiesTest(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(5)
+        counts = (rng.random((300, 12)) < 0.1) * rng.integers(1, 50, (300, 12))
+        counts[counts.sum(axis=1) == 0, 0] = 1
+        items, users = np.nonzero(counts)
+        x = np.log1p(counts.astype(np.float32))
+        x /= np.linalg.norm(x, axis=1, keepdims=True)
+        self.expected = x @ x.T
+
+        self.x = app.SparseRows.build(items, users, x[items, users], len(counts))
+        self.xt = self.x.transpose(counts.shape[1])
+
+    # NOTE: however the rows are split into pieces, their similarities are the
+    # cosine similarities of their rows, and only the zero ones are left out.
+    def test_matches_dense(self) -> None:
+        rows = np.arange(0, 300, 3)
+        for products in (1, 500, 1 << 20):
+            with (
+                self.subTest(products=products),
+                mock.patch.object(app, "SIMILAR_PRODUCTS", products),
+            ):
+                got = np.zeros_like(self.expected)
+                for row, column, sims in app.Recommender().similarities(
+                    self.x, self.xt, rows
+                ):
+                    self.assertTrue(np.all(sims > 0))
+                    got[row, column] = sims
+                np.testing.assert_allclose(got[rows], self.expected[rows], atol=1e-6)
+
+
+def neighbours_snapshot(mbids: set[str]) -> dict[str, list[float]]:
+    with bench.db.cursor() as cursor:
+        cursor.execute("SELECT mbid, similarity FROM mbid_neighbours")
+        snapshot = {}
+        for mbid, similarity in cursor:
+            mbid = app.mbid_text(mbid)
+            if mbid in mbids:
+                snapshot.setdefault(mbid, []).append(similarity)
+    return {mbid: sorted(s) for mbid, s in snapshot.items()}
+
+
+# NOTE: users who mostly play tracks from one of a few clusters of a library.
+class RefreshTest(DatabaseTest):
+    def setUp(self) -> None:
+        self.rng = random.Random(1)
+        self.library = bench.synthetic_library(500, self.rng)
+        self.clusters = [self.library[i::3] for i in range(3)]
+        self.users = [f"{bench.BENCH_USER}{i}" for i in range(6)]
+        self.now = int(time.time())
+        self.recommender = app.Recommender()
+        # NOTE: the neighbours go back to those of the rest of the database.
+        self.addCleanup(self.recommender.refresh, full=True)
+
+        stack = ExitStack()
+        self.addCleanup(stack.close)
+        self.stack = stack
+        self.histories = []
+        for i, username in enumerate(self.users):
+            history = self.feed(i, 1000, self.now - 86400)
+            stack.enter_context(bench.scenario(history, username=username))
+            self.histories.append(history)
+        self.recommender.refresh(full=True)
+
+    def feed(self, user: int, count: int, start: int) -> list[app.ImportEntry]:
+        cluster = self.clusters[user % len(self.clusters)]
+        return [
+            app.ImportEntry(
+                start - 180 * i,
+                *self.rng.choice(cluster if self.rng.random() < 0.9 else self.library),
+            )
+            for i in range(count)
+        ]
+
+    # NOTE: neighbour lists refreshed incrementally are those a full refresh
+    # computes.
+    def assertRefreshed(self) -> None:
+        mbids = {t[5] for t in self.library} | {t[1] for t in self.library}
+        incremental = neighbours_snapshot(mbids)
+        self.recommender.refresh(full=True)
+        rebuilt = neighbours_snapshot(mbids)
+
+        self.assertEqual(incremental.keys(), rebuilt.keys())
+        for mbid, similarities in rebuilt.items():
+            np.testing.assert_allclose(incremental[mbid], similarities, atol=1e-5)
+
+    def test_played_tracks_not_recommended(self) -> None:
+        for username, history in zip(self.users, self.histories):
+            played = {e.track_mbid for e in history}
+            page = app.User(username).similar_page([], None, 50)
+            self.assertTrue(page)
+            for _, (track, _) in page:
+                self.assertNotIn(app.mbid_text(track.mbid), played)
+
+    def test_incremental_refresh(self) -> None:
+        batch = self.feed(0, 500, self.now)
+        self.stack.callback(bench.mbids_delete, batch)
+        bench.ingest_batched(self.users[0], batch, app.IMPORT_BATCH_SIZE)
+        self.recommender.refresh()
+        self.assertRefreshed()
+
+    # NOTE: two writers whose transactions interleave. the first takes its
+    # scrobble ids before the second but only commits once a refresh is under
+    # way that has seen the second's, and its scrobbles still have to reach the
+    # neighbours.
+    def test_interleaved_writers(self) -> None:
+        entries = [e for history in self.histories for e in history]
+        writers = [bench.connect(), bench.connect()]
+        for writer, username in zip(writers, self.users[1:3]):
+            self.addCleanup(writer.close)
+            writer.autocommit = False
+            with writer.cursor() as cursor:
+                cursor.executemany(
+                    """
+                    INSERT INTO scrobbles (scrobble_time, mbid, user_name)
+                    VALUES (%s, %s, %s)
+                    """,
+                    [
+                        (
+                            self.now + 60 * (i + 1),
+                            app.mbid_bytes(e.track_mbid),
+                            username,
+                        )
+                        for i, e in enumerate(self.rng.sample(entries, 500))
+                    ],
+                )
+
+        writers[1].commit()
+        with ThreadPoolExecutor(1) as executor:
+            refreshing = executor.submit(self.recommender.refresh)
+            # NOTE: the refresh may wait on the rows the first writer holds.
+            time.sleep(0.5)
+            writers[0].commit()
+            refreshing.result()
+        self.recommender.refresh()
+        self.assertRefreshed()
+
+
+if __name__ == "__main__":
+    unittest.main()
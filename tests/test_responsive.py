@@ -0,0 +1,49 @@
+import asyncio
+import unittest
+from time import perf_counter
+
+import app
+import bench
+from tests.database import DatabaseTest
+
+SLEEP = 3
+
+
+# NOTE: reloading a screen part way through a slow query kills it rather than
+# waiting for it to finish, and the table shows what the reload fetched.
+class ReloadTest(DatabaseTest):
+    def test_kills_query(self) -> None:
+        finished = []
+
+        def slow(key: tuple | None, limit: int, reverse: bool) -> list:
+            start = perf_counter()
+            with (
+                app.mysql_read() as connection,
+                app.mysql_execute(connection, "SELECT SLEEP(%s)", (SLEEP,)) as cursor,
+            ):
+                cursor.fetchall()
+            finished.append(perf_counter() - start)
+            return [((0,), ("slow",))]
+
+        def fast(key: tuple | None, limit: int, reverse: bool) -> list:
+            return [((0,), ("fast",))]
+
+        async def run() -> list:
+            responsive = bench.ResponsiveApp(1 / 60)
+            async with responsive.run_test():
+                responsive.load(slow)
+                await asyncio.sleep(0.2)
+                responsive.load(fast)
+                start = perf_counter()
+                while len(finished) == 0 and perf_counter() - start < 2 * SLEEP:
+                    await asyncio.sleep(0.01)
+                return list(responsive.query_one(app.PagedTable).window)
+
+        shown = asyncio.run(run())
+        self.assertEqual(len(finished), 1)
+        self.assertLess(finished[0], SLEEP)
+        self.assertEqual([row for _, row in shown], [("fast",)])
+
+
+if __name__ == "__main__":
+    unittest.main()
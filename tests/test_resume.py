@@ -0,0 +1,68 @@
+import os
+import random
+import tempfile
+import unittest
+from time import perf_counter
+
+import app
+import bench
+from tests.database import DatabaseTest
+
+
+def import_snapshot(username: str) -> tuple[list[tuple], dict]:
+    with bench.db.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT scrobble_time, mbid FROM scrobbles
+            WHERE user_name = %s
+            ORDER BY scrobble_time, mbid
+            """,
+            (username,),
+        )
+        scrobbles = list(cursor)
+    return scrobbles, bench.scores_snapshot(username)
+
+
+# NOTE: an import killed at random points and resumed until it finishes ends up
+# where an uninterrupted import of the same feed does, without fetching a page
+# again once it was written.
+class ResumeTest(DatabaseTest):
+    def test_killed_import(self) -> None:
+        entries = bench.synthetic_feed(2000, 200, 1)
+        with bench.scenario(entries, []), tempfile.TemporaryDirectory() as directory:
+            start = perf_counter()
+            bench.resume_run(
+                entries,
+                0.05,
+                app.IMPORT_BATCH_SIZE,
+                os.path.join(directory, "reference"),
+                None,
+            )
+            elapsed = perf_counter() - start
+            scrobbles, scores = import_snapshot(bench.BENCH_USER)
+
+            bench.user_reset(bench.BENCH_USER)
+            _, _, refetched = bench.resume_until_finished(
+                entries,
+                0.05,
+                app.IMPORT_BATCH_SIZE,
+                5,
+                elapsed,
+                random.Random(1),
+                directory,
+            )
+            resumed_scrobbles, resumed_scores = import_snapshot(bench.BENCH_USER)
+
+        self.assertEqual(refetched, 0)
+        self.assertEqual(resumed_scrobbles, scrobbles)
+        self.assertEqual(resumed_scores.keys(), scores.keys())
+        for mbid, (last_access, last_crf, log_crf) in scores.items():
+            with self.subTest(mbid=mbid):
+                got = resumed_scores[mbid]
+                self.assertEqual(got[0], last_access)
+                self.assertAlmostEqual(got[1], last_crf, delta=1e-9 * abs(last_crf))
+                self.assertAlmostEqual(got[2], log_crf, delta=1e-9 * abs(log_crf))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import random
+import time
+import unittest
+
+import app
+import bench
+from tests.database import DatabaseTest
+
+ROLLUPS = {
+    "user_track_counts": """
+        SELECT user_name, mbid, COUNT(*)
+        FROM scrobbles
+        GROUP BY user_name, mbid
+    """,
+    "user_artist_counts": """
+        SELECT user_name, tracks.artist, COUNT(*)
+        FROM scrobbles JOIN tracks USING (mbid)
+        GROUP BY user_name, tracks.artist
+    """,
+    "user_album_counts": """
+        SELECT user_name, tracks.album, COUNT(*)
+        FROM scrobbles JOIN tracks USING (mbid)
+        WHERE tracks.album IS NOT NULL
+        GROUP BY user_name, tracks.album
+    """,
+    "user_period_counts": """
+        SELECT user_name, period, sf_period_bucket(period, scrobble_time) AS b,
+               mbid, COUNT(*)
+        FROM scrobbles
+          CROSS JOIN (SELECT 'day' AS period UNION ALL
+                      SELECT 'week' UNION ALL
+                      SELECT 'month') AS periods
+        GROUP BY user_name, period, b, mbid
+    """,
+}
+
+
+class RollupsTest(DatabaseTest):
+    # NOTE: scrobbles inserted through both the bulk path and the stored
+    # procedure over the last 400 days, then a few deleted directly, leave the
+    # rollups counting what the scrobbles do.
+    def test_match_scrobbles(self) -> None:
+        rng = random.Random(1)
+        library = bench.synthetic_library(100, rng)
+        now = int(time.time())
+        entries = [
+            app.ImportEntry(now - t, *rng.choice(library))
+            for t in rng.sample(range(400 * 86400), 1000)
+        ]
+
+        with bench.scenario(entries, entries[:500]):
+            for e in entries[500:]:
+                app.mysql_scrobble_add(bench.BENCH_USER, e.time, e.track_mbid)
+            with bench.db.cursor() as cursor:
+                cursor.execute(
+                    """
+                    DELETE FROM scrobbles WHERE user_name = %s ORDER BY RAND() LIMIT 100
+                    """,
+                    (bench.BENCH_USER,),
+                )
+
+            for table, raw in ROLLUPS.items():
+                with self.subTest(table=table):
+                    difference = self.count(
+                        f"""
+                        SELECT COUNT(*) FROM (
+                          ({raw} EXCEPT
+                           SELECT * FROM {table} WHERE scrobble_count > 0)
+                          UNION ALL
+                          (SELECT * FROM {table} WHERE scrobble_count > 0
+                           EXCEPT {raw})
+                        ) AS difference
+                        """
+                    )
+                    self.assertEqual(difference, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
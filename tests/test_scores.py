@@ -0,0 +1,37 @@
+import unittest
+
+import app
+import bench
+from tests.database import DatabaseTest
+
+
+# NOTE: the scores written as scrobbles are imported, a row at a time or in
+# batches, agree with rebuilding them from the scrobbles. the per-row procedure
+# leaves each score relative to the last access it saw, which depends on the
+# order of the feed, while a rebuild is relative to the latest access, so they
+# are compared by log_crf, which depends on neither.
+class ScoresRebuildTest(DatabaseTest):
+    def assertRebuildAgrees(self) -> None:
+        written = bench.scores_snapshot(bench.BENCH_USER)
+        app.mysql_scores_rebuild(bench.BENCH_USER)
+        rebuilt = bench.scores_snapshot(bench.BENCH_USER)
+
+        self.assertEqual(written.keys(), rebuilt.keys())
+        for mbid, (_, _, log_crf) in written.items():
+            self.assertAlmostEqual(log_crf, rebuilt[mbid][2], delta=1e-9)
+
+    def test_per_row(self) -> None:
+        entries = bench.synthetic_feed(1000, 100, 1)
+        with bench.scenario(entries, []):
+            bench.ingest_per_row(bench.BENCH_USER, entries)
+            self.assertRebuildAgrees()
+
+    def test_batched(self) -> None:
+        entries = bench.synthetic_feed(1000, 100, 2)
+        with bench.scenario(entries, []):
+            bench.ingest_batched(bench.BENCH_USER, entries, 300)
+            self.assertRebuildAgrees()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+import unittest
+
+import bench
+
+# NOTE: modules app defers until first use, which starting up mustn't import.
+DEFERRED_MODULES = ["pylast", "numpy"]
+
+
+# NOTE: reads -X importtime rather than sys.modules, which holds the deferred
+# modules from the start without them having been loaded.
+class StartupTest(unittest.TestCase):
+    def test_defers_modules(self) -> None:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", bench.STARTUP_SCRIPT],
+            cwd=os.path.dirname(os.path.abspath(bench.__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        imported = {
+            match.group(4)
+            for line in result.stderr.splitlines()
+            if (match := bench.IMPORT_TIME.match(line)) is not None
+        }
+        for module in DEFERRED_MODULES:
+            with self.subTest(module=module):
+                self.assertNotIn(module, imported)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+import app
+import bench
+from tests.database import DatabaseTest
+from tests.test_paging import walks
+
+# NOTE: the screens as fetch(user) giving fetch(filters, key, limit, reverse).
+FETCHES = {
+    "view": lambda u: u.scrobble_page,
+    "report": lambda u: u.report_page,
+    "find": lambda u: u.find_page,
+    "find stored": lambda u: lambda f, k, n, r: u.find_page(f, k, n, r, False),
+} | {
+    f"report {period}": lambda u, p=period: lambda f, k, n, r: u.report_page(
+        f, k, n, r, p
+    )
+    for period in app.REPORT_PERIODS[1:]
+}
+
+
+# NOTE: every screen walked through the store pages the same as through MySQL,
+# with filters the store matches itself and ones it leaves to MySQL.
+class StoreTest(DatabaseTest):
+    def test_matches_mysql(self) -> None:
+        entries = bench.synthetic_feed(2000, 200, 1)
+        shapes = [""] + bench.FILTER_SHAPES + ["+track:'^track 1'", "+artist:'[0-4]$'"]
+        with bench.scenario(entries) as sql:
+            memory = app.User(
+                bench.BENCH_USER, store=app.ScrobbleStore(bench.BENCH_USER)
+            )
+            memory.store.refresh()
+
+            for shape in shapes:
+                filters = app.Filter.parse(shape)
+                for mode, fetch in FETCHES.items():
+                    with self.subTest(mode=mode, filters=shape):
+                        expected = walks(
+                            lambda k, n, r: fetch(sql)(filters, k, n, r),
+                            lambda row: row[0],
+                            app.PAGE_SIZE,
+                        )
+                        actual = walks(
+                            lambda k, n, r: fetch(memory)(filters, k, n, r),
+                            lambda row: row[0],
+                            app.PAGE_SIZE,
+                        )
+                        self.assertEqual(actual, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
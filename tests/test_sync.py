@@ -0,0 +1,38 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import app
+import bench
+from tests.database import DatabaseTest
+
+
+# NOTE: a backlog waiting on Last.FM is synced after the first screen is up,
+# which is then patched with the newest scrobble.
+class SyncTest(DatabaseTest):
+    def test_patches_screen(self) -> None:
+        entries = bench.synthetic_feed(500, 50, 1)
+        fake = bench.FakeLastFMUser(bench.BENCH_USER, entries, 0.01)
+        for name, value in (
+            ("RESULT_CACHE", app.ResultCache()),
+            ("lastfm_track_info", fake.track_info),
+            ("LASTFM_FETCHER", app.LastFMFetcher(app.LASTFM_CONCURRENCY, rate=1000)),
+            ("TRACK_DURATIONS", app.DurationCache()),
+        ):
+            patcher = mock.patch.object(app, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(app.User, "lastfm", lambda self: fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        with bench.scenario(entries, []):
+            first, synced, shown = asyncio.run(bench.sync_run(entries, 60))
+
+        self.assertIsNotNone(first)
+        self.assertIsNotNone(synced)
+        self.assertEqual(shown[0][0][0], max(e.time for e in entries))
+
+
+if __name__ == "__main__":
+    unittest.main()